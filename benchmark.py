@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from array import array
+
+# Where generated inputs are kept between runs (reused when size and seed match)
+DATA_DIR = '.benchmark_data'
+
+# Row counts accepted by --sizes, e.g. --sizes 10k,100k,1M
+SIZE_SUFFIXES = {'k': 1000, 'M': 1000000}
+DEFAULT_SIZES = '10k,100k'
+
+# Columns of the synthetic geonames CSV, a subset of the real export in the same order
+CSV_HEADER = ['Geoname ID', 'Name', 'ASCII Name', 'Alternate Names', 'Feature Class', 'Feature Code',
+              'Country Code', 'Country name EN', 'Population', 'Timezone', 'Coordinates']
+
+# (country name, ISO code, min_lon, min_lat, max_lon, max_lat, weight) used to place
+# synthetic cities; the mix of European, non-European and unknown countries exercises
+# every branch of the country check
+COUNTRIES = [
+    ('Germany', 'DE', 6.0, 47.5, 15.0, 55.0, 8),
+    ('France', 'FR', -4.5, 43.0, 7.5, 51.0, 8),
+    ('Italy', 'IT', 7.0, 37.0, 18.5, 46.5, 6),
+    ('Spain', 'ES', -9.0, 36.0, 3.0, 43.5, 6),
+    ('Poland', 'PL', 14.5, 49.5, 23.5, 54.5, 5),
+    ('United Kingdom', 'GB', -5.5, 50.0, 1.5, 58.5, 5),
+    ('Romania', 'RO', 21.0, 44.0, 29.0, 48.0, 3),
+    ('Sweden', 'SE', 11.5, 55.5, 23.5, 68.5, 2),
+    ('Russia', 'RU', 28.0, 45.0, 60.0, 68.0, 6),
+    ('Ukraine', 'UA', 23.0, 45.5, 40.0, 52.0, 4),
+    ('Croatia', 'HR', 13.5, 42.5, 19.0, 46.5, 2),
+    ('United States', 'US', -124.0, 25.0, -67.0, 49.0, 15),
+    ('India', 'IN', 68.0, 8.0, 97.0, 35.0, 10),
+    ('Brazil', 'BR', -73.0, -33.0, -35.0, 5.0, 8),
+    ('China', 'CN', 75.0, 20.0, 134.0, 53.0, 8),
+    ('Turkey', 'TR', 26.0, 36.0, 45.0, 42.0, 3),
+    ('Morocco', 'MA', -13.0, 28.0, -1.0, 36.0, 2),
+    ('', '', -25.0, 34.0, 45.0, 72.0, 3)
+]
+
+def parse_size(text):
+    """Parse a row count such as '100k' or '1M'."""
+    suffix = text[-1:]
+    if suffix in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[suffix])
+    return int(text)
+
+def format_size(rows):
+    for suffix, factor in sorted(SIZE_SUFFIXES.items(), key=lambda item: -item[1]):
+        if rows >= factor and rows % factor == 0:
+            return f"{rows // factor}{suffix}"
+    return str(rows)
+
+def _synthetic_cities(rows, seed):
+    """Yield (id, name, country, code, population, lon, lat) tuples for synthetic cities."""
+    rng = random.Random(seed)
+    weights = [country[6] for country in COUNTRIES]
+    for i in range(rows):
+        name, code, min_lon, min_lat, max_lon, max_lat, _ = rng.choices(COUNTRIES, weights)[0]
+        lon = round(rng.uniform(min_lon, max_lon), 5)
+        lat = round(rng.uniform(min_lat, max_lat), 5)
+        population = int(rng.paretovariate(1.2) * 1000)
+        yield i + 1, f"City {i + 1}", name, code, population, lon, lat
+
+def generate_csv(path, rows, seed=0):
+    """Write a semicolon-separated CSV shaped like the geonames cities export."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(CSV_HEADER)
+        for geoname_id, name, country, code, population, lon, lat in _synthetic_cities(rows, seed):
+            alternate = f"{name} Alt,{name.upper()}" if geoname_id % 3 == 0 else ''
+            writer.writerow([geoname_id, name, name, alternate, 'P', 'PPL', code, country,
+                             population, 'Europe/Berlin', f"{lat}, {lon}"])
+
+def generate_geojson(path, rows, seed=0):
+    """Write a FeatureCollection of Point cities shaped like the CSV extractor's output."""
+    from geojson_stream import FeatureCollectionWriter
+
+    def features():
+        for geoname_id, name, country, code, population, lon, lat in _synthetic_cities(rows, seed):
+            yield {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                'properties': {'name': name, 'country_name': country, 'alternate_names': '',
+                               'population': population, 'country_code': code}
+            }
+
+    with open(path, 'w', encoding='utf-8') as f, FeatureCollectionWriter(f, ensure_ascii=False) as writer:
+        writer.write_all(features())
+
+def ensure_inputs(data_dir, rows, seed):
+    """Generate the CSV and GeoJSON inputs for a size unless they already exist."""
+    os.makedirs(data_dir, exist_ok=True)
+    stem = os.path.join(data_dir, f"cities-{format_size(rows)}-seed{seed}")
+    inputs = {'csv': stem + '.csv', 'geojson': stem + '.geojson'}
+    for kind, generate in (('csv', generate_csv), ('geojson', generate_geojson)):
+        if not os.path.exists(inputs[kind]):
+            print(f"Generating {inputs[kind]}...")
+            tmp_file = inputs[kind] + '.tmp'
+            generate(tmp_file, rows, seed)
+            os.replace(tmp_file, inputs[kind])
+    return inputs
+
+def _iter_features(path):
+    from geojson_stream import iter_features
+    with open(path, 'rb') as f:
+        yield from iter_features(f)
+
+def _load_features(path):
+    return list(_iter_features(path))
+
+def _load_points(path):
+    # Streamed, so only the two coordinate arrays are ever held
+    lons, lats = array('d'), array('d')
+    for feature in _iter_features(path):
+        lon, lat = feature['geometry']['coordinates']
+        lons.append(lon)
+        lats.append(lat)
+    return lons, lats
+
+# Each stage is (setup, run). setup(inputs) prepares what the stage needs,
+# including importing the modules it calls (some, like europe, build geometry
+# on import), and is not timed; run(state) does the measured work and returns
+# the number of items it processed.
+
+def _setup_parse_csv(inputs):
+    from extract_european_cities_csv import parse_coordinates, resolve_columns
+    return parse_coordinates, resolve_columns, inputs['csv']
+
+def _run_parse_csv(state):
+    parse_coordinates, resolve_columns, path = state
+    count = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=';')
+        columns = resolve_columns(next(reader))
+        coord_index = columns['Coordinates']
+        for row in reader:
+            parse_coordinates(row[coord_index])
+            count += 1
+    return count
+
+def _setup_parse_geojson(inputs):
+    from geojson_stream import iter_features
+    return iter_features, inputs['geojson']
+
+def _run_parse_geojson(state):
+    iter_features, path = state
+    count = 0
+    with open(path, 'rb') as f:
+        for _ in iter_features(f):
+            count += 1
+    return count
+
+def _setup_country_check(inputs):
+    from europe import classify_country
+    pairs = [(feature['properties']['country_name'], feature['properties']['country_code'])
+             for feature in _iter_features(inputs['geojson'])]
+    return classify_country, pairs
+
+def _run_country_check(state):
+    classify_country, pairs = state
+    for name, code in pairs:
+        classify_country(name, code)
+    return len(pairs)
+
+def _setup_point_in_polygon(inputs):
+    from europe import europe_polygon
+    from polygon_engine import point_in_polygon
+    return point_in_polygon, europe_polygon, _load_points(inputs['geojson'])
+
+def _run_point_in_polygon(state):
+    point_in_polygon, europe_polygon, (lons, lats) = state
+    for lon, lat in zip(lons, lats):
+        point_in_polygon((lon, lat), europe_polygon)
+    return len(lons)
+
+def _setup_batched_point_in_polygon(inputs):
+    from europe import are_in_europe
+    from polygon_engine import BATCH_SIZE
+    return are_in_europe, BATCH_SIZE, _load_points(inputs['geojson'])
+
+def _run_batched_point_in_polygon(state):
+    are_in_europe, batch_size, (lons, lats) = state
+    for start in range(0, len(lons), batch_size):
+        are_in_europe(lons[start:start + batch_size], lats[start:start + batch_size])
+    return len(lons)
+
+def _setup_grouping(inputs):
+    from create_europe_regional_map import group_by_region
+    return group_by_region, _load_features(inputs['geojson'])
+
+def _run_grouping(state):
+    group_by_region, features = state
+    group_by_region({'features': features})
+    return len(features)
+
+def _setup_polygons(hull):
+    def setup(inputs):
+        from create_europe_regional_map import create_region_polygons, group_by_region
+        city_points = group_by_region({'features': _iter_features(inputs['geojson'])})
+        return create_region_polygons, hull, city_points
+    return setup
+
+def _run_polygons(state):
+    create_region_polygons, hull, city_points = state
+    create_region_polygons(city_points, hull=hull)
+    return sum(len(points) for points in city_points.values())
+
+def _setup_serialization(inputs):
+    from geojson_stream import FeatureCollectionWriter
+    return FeatureCollectionWriter, _load_features(inputs['geojson'])
+
+def _run_serialization(state):
+    FeatureCollectionWriter, features = state
+    with open(os.devnull, 'w', encoding='utf-8') as f, FeatureCollectionWriter(f, ensure_ascii=False) as writer:
+        writer.write_all(features)
+    return len(features)
+
+STAGES = {
+    'parse_csv': (_setup_parse_csv, _run_parse_csv),
+    'parse_geojson': (_setup_parse_geojson, _run_parse_geojson),
+    'country_check': (_setup_country_check, _run_country_check),
+    'point_in_polygon': (_setup_point_in_polygon, _run_point_in_polygon),
+    'batched_point_in_polygon': (_setup_batched_point_in_polygon, _run_batched_point_in_polygon),
+    'grouping': (_setup_grouping, _run_grouping),
+    'convex_polygons': (_setup_polygons('convex'), _run_polygons),
+    'concave_polygons': (_setup_polygons('concave'), _run_polygons),
+    'serialization': (_setup_serialization, _run_serialization)
+}
+
+def _max_rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _stage_memory_mb(run, state):
+    """
+    Peak memory a stage allocates on top of its setup, in MB.
+
+    The process peak RSS mostly reflects the setup (loaded inputs), so the
+    stage is run once more, untimed, under tracemalloc, which counts only
+    what is allocated during the run.
+    """
+    tracemalloc.start()
+    try:
+        run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+def _measure(task):
+    """Run one stage in this (fresh) process and return its measurements."""
+    stage, inputs, repeat = task
+    setup, run = STAGES[stage]
+    state = setup(inputs)
+    setup_rss = _max_rss_mb()
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = run(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        'items': items,
+        'seconds': round(best, 6),
+        'items_per_second': round(items / best, 1) if best > 0 else None,
+        'setup_rss_mb': round(setup_rss, 1),
+        'peak_rss_mb': round(_max_rss_mb(), 1),
+        'stage_memory_mb': round(_stage_memory_mb(run, state), 1)
+    }
+
+def run_stage(stage, inputs, repeat):
+    """
+    Measure a stage in its own process, so its peak RSS is not inflated by
+    earlier stages or sizes.
+    """
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(_measure, ((stage, inputs, repeat),))
+
+def git_version():
+    """Short commit hash of the working tree, or None outside a git checkout."""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+def compare(results, previous):
+    """Print the throughput change of every stage and size against an earlier result file."""
+    before = {(r['stage'], r['rows']): r for r in previous['results']}
+    print(f"\nCompared with {previous.get('version') or 'previous run'}:")
+    for result in results:
+        old = before.get((result['stage'], result['rows']))
+        if not old or not old.get('items_per_second') or not result.get('items_per_second'):
+            continue
+        ratio = result['items_per_second'] / old['items_per_second']
+        flag = "  <-- slower" if ratio < 0.9 else ""
+        print(f"  {result['stage']:<26} {format_size(result['rows']):>5}  {ratio:6.2f}x{flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the extraction, filtering and region stages on synthetic data.")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                        help="Comma-separated row counts, e.g. 10k,100k,1M,10M (default: %(default)s)")
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help="Comma-separated stages to run (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage; the fastest counts (default: %(default)s)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the synthetic data (default: %(default)s)")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Where generated inputs are kept (default: %(default)s)")
+    parser.add_argument('--output', help="JSON file for the results (default: benchmark-<version>.json)")
+    parser.add_argument('--compare', metavar='FILE', help="Earlier result file to compare throughput against")
+    args = parser.parse_args()
+
+    try:
+        sizes = [parse_size(size) for size in args.sizes.split(',')]
+    except ValueError:
+        print(f"Error: invalid --sizes '{args.sizes}'")
+        sys.exit(1)
+    stages = args.stages.split(',')
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        print(f"Error: unknown stages {', '.join(unknown)}; choose from {', '.join(STAGES)}")
+        sys.exit(1)
+    if args.compare and not os.path.exists(args.compare):
+        print(f"Error: Input file '{args.compare}' not found.")
+        sys.exit(1)
+
+    has_numpy = importlib.util.find_spec('numpy') is not None
+    import json_codec
+
+    version = git_version()
+    report = {
+        'version': version,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': has_numpy,
+        'json': {'parser': json_codec.PARSER, 'serializer': json_codec.SERIALIZER},
+        'results': []
+    }
+
+    for rows in sizes:
+        inputs = ensure_inputs(args.data_dir, rows, args.seed)
+        for stage in stages:
+            measured = run_stage(stage, inputs, args.repeat)
+            result = {'stage': stage, 'rows': rows}
+            result.update(measured)
+            report['results'].append(result)
+            print(f"{stage:<26} {format_size(rows):>5}  {measured['seconds']:9.3f} s  "
+                  f"{measured['items_per_second'] or 0:>12,.0f} items/s  {measured['stage_memory_mb']:8.1f} MB stage  "
+                  f"{measured['peak_rss_mb']:8.1f} MB peak")
+
+    output_file = args.output or f"benchmark-{version or 'unversioned'}.json"
+    with open(output_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {output_file}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(report['results'], json.load(f))
+
+if __name__ == "__main__":
+    main()
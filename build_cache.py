@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import shutil
+
+# Directory holding cached artifacts, relative to the working directory
+CACHE_DIR = '.build_cache'
+
+# Memo of file digests keyed by path, size and modification time
+DIGESTS_FILE = 'digests.json'
+
+# Bytes hashed at a time
+HASH_BLOCK_SIZE = 1 << 20
+
+def file_digest(path, cache_dir=CACHE_DIR):
+    """
+    SHA-256 of a file's contents.
+
+    Digests are remembered per (path, size, mtime), so an unchanged multi-GB
+    input is only hashed once.
+    """
+    stat = os.stat(path)
+    memo_key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    memo_file = os.path.join(cache_dir, DIGESTS_FILE)
+
+    memo = {}
+    if os.path.exists(memo_file):
+        try:
+            with open(memo_file, 'r') as f:
+                memo = json.load(f)
+        except (OSError, ValueError):
+            memo = {}
+    if memo_key in memo:
+        return memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    memo[memo_key] = digest.hexdigest()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_file = memo_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(memo, f)
+    os.replace(tmp_file, memo_file)
+    return memo[memo_key]
+
+def cache_key(generator, inputs=(), sources=(), definition=None, params=None, cache_dir=CACHE_DIR):
+    """
+    Content-addressed key for a generated artifact.
+
+    Args:
+        generator: Name of the generator (keeps different scripts apart)
+        inputs: Paths of the input data files
+        sources: Paths of the source files whose code shapes the output
+        definition: JSON-serializable definition the output is built from (e.g. REGIONS)
+        params: JSON-serializable parameters that change the output
+
+    Returns:
+        str: Hex digest identifying the artifact
+    """
+    digest = hashlib.sha256()
+    digest.update(generator.encode('utf-8'))
+    for path in list(inputs) + list(sources):
+        digest.update(b'\0' + file_digest(path, cache_dir).encode('ascii'))
+    digest.update(b'\0' + json.dumps(definition, sort_keys=True).encode('utf-8'))
+    digest.update(b'\0' + json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def cached_build(generator, key, output_file, build, cache_dir=CACHE_DIR):
+    """
+    Produce output_file from the cache, or build it and cache the result.
+
+    Args:
+        generator: Name of the generator, used in the cached file name
+        key: Key from cache_key
+        output_file: Where the artifact should end up
+        build: Function taking a path and writing the artifact there
+        cache_dir: Cache directory
+
+    Returns:
+        bool: True if the artifact came from the cache
+    """
+    extension = os.path.splitext(output_file)[1]
+    artifact = os.path.join(cache_dir, f"{generator}-{key}{extension}")
+
+    hit = os.path.exists(artifact)
+    if not hit:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = artifact + '.tmp'
+        build(tmp_file)
+        os.replace(tmp_file, artifact)
+
+    if os.path.abspath(artifact) != os.path.abspath(output_file):
+        shutil.copyfile(artifact, output_file)
+    return hit
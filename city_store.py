@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import json_codec
+
+MAGIC = b'GEOCITY1'
+HEADER = struct.Struct('<8sQQ')  # magic, directory offset, directory length
+
+# Geometry type codes
+GEOMETRY_TYPES = {None: 0, 'Point': 1, 'Polygon': 2, 'MultiPolygon': 3}
+GEOMETRY_NAMES = {code: name for name, code in GEOMETRY_TYPES.items()}
+
+# String column value for a feature without that property
+MISSING = 0xFFFFFFFF
+# String column value for a property that is present with a JSON null value
+NULL = 0xFFFFFFFE
+
+# Stands for a missing property while columns are collected, as None is a valid value
+_ABSENT = object()
+
+NAN = float('nan')
+
+# File extension used for store files, e.g.
+#     python city_store.py european_cities.json european_cities.cities
+STORE_EXTENSION = '.cities'
+
+def _geometry_polygons(geometry):
+    """Return the geometry type code and its coordinates as a list of polygons (lists of rings)."""
+    if geometry is None:
+        return 0, []
+    geom_type = geometry.get('type')
+    coords = geometry.get('coordinates')
+    if geom_type == 'Point':
+        return 1, [[[coords]]] if coords else []
+    if geom_type == 'Polygon':
+        return 2, [coords]
+    if geom_type == 'MultiPolygon':
+        return 3, coords
+    raise ValueError(f"Unsupported geometry type for the city store: {geom_type}")
+
+def export_store(features, path):
+    """
+    Write features to a columnar binary store file.
+
+    Loading a multi-megabyte GeoJSON file with json.load parses every number
+    and builds every dict up front. A store file keeps the same data as flat
+    arrays that CityStore memory-maps and decodes on demand:
+
+        - one geometry type byte per feature
+        - ring offsets per feature and coordinate offsets per ring (int64)
+        - all coordinates as one interleaved float64 array
+        - an interned string table shared by all string properties (NAME,
+          country_name, ...), so repeated values are stored once
+        - one column per property key: string table indexes for string
+          properties, JSON snippets for everything else. A property that is
+          present with a null value is kept apart from a missing one.
+          Column sections are named by the column's position in the schema,
+          so no property key can collide with another section.
+
+    Args:
+        features: Iterable of GeoJSON Feature dicts (Point, Polygon,
+            MultiPolygon or null geometries; only lon/lat are kept)
+        path: Output file path
+
+    Returns:
+        int: Number of features written
+    """
+    geom_types = bytearray()
+    feature_rings = array('q', [0])
+    ring_flags = bytearray()  # 1 where a ring starts a new polygon
+    ring_coords = array('q', [0])
+    coords = array('d')
+
+    strings = {}
+    columns = {}  # key -> list of raw values (_ABSENT when missing)
+    count = 0
+
+    for feature in features:
+        type_code, polygons = _geometry_polygons(feature.get('geometry'))
+        geom_types.append(type_code)
+        for polygon in polygons:
+            for ring_index, ring in enumerate(polygon):
+                ring_flags.append(1 if ring_index == 0 else 0)
+                for point in ring:
+                    # Missing coordinates (e.g. [None, None] from CSV rows without them) are stored as NaN
+                    coords.append(NAN if point[0] is None else point[0])
+                    coords.append(NAN if point[1] is None else point[1])
+                ring_coords.append(len(coords) // 2)
+        feature_rings.append(len(ring_flags))
+
+        properties = feature.get('properties') or {}
+        for key, value in properties.items():
+            if key not in columns:
+                columns[key] = [_ABSENT] * count
+            columns[key].append(value)
+        count += 1
+        for values in columns.values():
+            if len(values) < count:
+                values.append(_ABSENT)
+
+    sections = []
+
+    def add_section(name, data, typecode):
+        sections.append((name, bytes(data), typecode))
+
+    add_section('geom_types', geom_types, 'B')
+    add_section('feature_rings', feature_rings, 'q')
+    add_section('ring_flags', ring_flags, 'B')
+    add_section('ring_coords', ring_coords, 'q')
+    add_section('coords', coords, 'd')
+
+    schema = []
+    for position, (key, values) in enumerate(columns.items()):
+        name = f'column:{position}'
+        if all(value is _ABSENT or value is None or isinstance(value, str) for value in values):
+            indexes = array('I')
+            for value in values:
+                if value is _ABSENT:
+                    indexes.append(MISSING)
+                elif value is None:
+                    indexes.append(NULL)
+                else:
+                    indexes.append(strings.setdefault(value, len(strings)))
+            schema.append({'name': key, 'kind': 'str', 'sections': [name]})
+            add_section(name, indexes, 'I')
+        else:
+            # Non-string values are kept as JSON snippets (null included); an empty snippet means missing
+            offsets = array('q', [0])
+            blob = bytearray()
+            for value in values:
+                if value is not _ABSENT:
+                    blob += json_codec.dumps(value, ensure_ascii=False).encode('utf-8')
+                offsets.append(len(blob))
+            schema.append({'name': key, 'kind': 'json', 'sections': [f'{name}:offsets', f'{name}:data']})
+            add_section(f'{name}:offsets', offsets, 'q')
+            add_section(f'{name}:data', blob, 'B')
+
+    string_offsets = array('q', [0])
+    string_data = bytearray()
+    for value in strings:  # dicts keep insertion order, which is the index order
+        string_data += value.encode('utf-8')
+        string_offsets.append(len(string_data))
+    add_section('string_offsets', string_offsets, 'q')
+    add_section('string_data', string_data, 'B')
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+        directory = {'feature_count': count, 'schema': schema, 'sections': {}}
+        for name, data, typecode in sections:
+            # Align every section to 8 bytes so it can be cast in place
+            f.write(b'\0' * (-f.tell() % 8))
+            directory['sections'][name] = [f.tell(), len(data), typecode]
+            f.write(data)
+        directory_offset = f.tell()
+        directory_bytes = json_codec.dumps(directory).encode('utf-8')
+        f.write(directory_bytes)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, directory_offset, len(directory_bytes)))
+
+    return count
+
+class CityStore:
+    """
+    Read-only, memory-mapped view of a store written by export_store.
+
+    Opening a store only reads its small directory; the arrays are mapped,
+    not parsed. The store behaves like a list of Feature dicts, each built on
+    access, and also offers column-level access that avoids building dicts.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, directory_offset, directory_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a city store file")
+        directory = json_codec.loads(self._mmap[directory_offset:directory_offset + directory_length])
+        self._count = directory['feature_count']
+        self._sections = directory['sections']
+        self.schema = directory['schema']
+
+        self._geom_types = self._section('geom_types')
+        self._feature_rings = self._section('feature_rings')
+        self._ring_flags = self._section('ring_flags')
+        self._ring_coords = self._section('ring_coords')
+        self._coords = self._section('coords')
+        self._string_offsets = self._section('string_offsets')
+        self._string_data = self._section('string_data')
+        self._strings = {}
+
+        self._columns = {}
+        for column in self.schema:
+            key = column['name']
+            # Stores written before the sections were listed name them after the key
+            if column['kind'] == 'str':
+                name, = column.get('sections', [f'column:{key}'])
+                self._columns[key] = ('str', self._section(name), None)
+            else:
+                offsets, data = column.get('sections', [f'column:{key}:offsets', f'column:{key}:data'])
+                self._columns[key] = ('json', self._section(offsets), self._section(data))
+
+    def _section(self, name):
+        offset, length, typecode = self._sections[name]
+        return self._view[offset:offset + length].cast(typecode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        """Release the memory map and the file."""
+        # Views into the map must be released before it can be closed
+        for name in list(vars(self)):
+            value = getattr(self, name)
+            if isinstance(value, memoryview):
+                value.release()
+        for kind, first, second in self._columns.values():
+            first.release()
+            if second is not None:
+                second.release()
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError('feature index out of range')
+        return {
+            'type': 'Feature',
+            'geometry': self.geometry(i),
+            'properties': self.properties(i)
+        }
+
+    def string(self, index):
+        """Return an entry of the interned string table, decoding it once."""
+        value = self._strings.get(index)
+        if value is None:
+            start = self._string_offsets[index]
+            end = self._string_offsets[index + 1]
+            value = bytes(self._string_data[start:end]).decode('utf-8')
+            self._strings[index] = value
+        return value
+
+    def geometry_type(self, i):
+        """GeoJSON geometry type name of feature i (None for null geometries)."""
+        return GEOMETRY_NAMES[self._geom_types[i]]
+
+    def _ring(self, r):
+        coords = self._coords
+        ring = [[coords[2 * c], coords[2 * c + 1]]
+                for c in range(self._ring_coords[r], self._ring_coords[r + 1])]
+        # NaN never equals itself; it stands for a missing coordinate
+        return [[x if x == x else None, y if y == y else None] for x, y in ring]
+
+    def geometry(self, i):
+        """Build the GeoJSON geometry dict of feature i."""
+        type_code = self._geom_types[i]
+        if type_code == 0:
+            return None
+        first = self._feature_rings[i]
+        last = self._feature_rings[i + 1]
+        if type_code == 1:
+            return {'type': 'Point', 'coordinates': self._ring(first)[0] if last > first else []}
+
+        polygons = []
+        for r in range(first, last):
+            if self._ring_flags[r]:
+                polygons.append([])
+            polygons[-1].append(self._ring(r))
+        if type_code == 2:
+            return {'type': 'Polygon', 'coordinates': polygons[0] if polygons else []}
+        return {'type': 'MultiPolygon', 'coordinates': polygons}
+
+    def point(self, i):
+        """
+        Return (lon, lat) of a Point feature without building its geometry.
+
+        Missing coordinates come back as NaN, and (None, None) is returned for
+        features with no coordinates at all.
+        """
+        first = self._feature_rings[i]
+        if first == self._feature_rings[i + 1]:
+            return None, None
+        c = self._ring_coords[first]
+        return self._coords[2 * c], self._coords[2 * c + 1]
+
+    def property(self, i, key, default=None):
+        """Return one property of feature i."""
+        column = self._columns.get(key)
+        if column is None:
+            return default
+        kind, first, second = column
+        if kind == 'str':
+            index = first[i]
+            if index == MISSING:
+                return default
+            return None if index == NULL else self.string(index)
+        start, end = first[i], first[i + 1]
+        if start == end:
+            return default
+        return json_codec.loads(bytes(second[start:end]))
+
+    def properties(self, i):
+        """Build the properties dict of feature i (keys in column order)."""
+        properties = {}
+        for key, (kind, first, second) in self._columns.items():
+            if kind == 'str':
+                index = first[i]
+                if index != MISSING:
+                    properties[key] = None if index == NULL else self.string(index)
+            else:
+                start, end = first[i], first[i + 1]
+                if start != end:
+                    properties[key] = json_codec.loads(bytes(second[start:end]))
+        return properties
+
+    def string_column(self, key):
+        """
+        Return the raw string-table indexes of a string property column.
+
+        Equal values share an index, so callers can resolve each distinct value
+        once with string() instead of once per feature. Features without the
+        property hold MISSING, and those with a null value hold NULL.
+        """
+        kind, first, _ = self._columns[key]
+        if kind != 'str':
+            raise ValueError(f"Property '{key}' is not a string column")
+        return first
+
+    def as_feature_collection(self):
+        """Return a FeatureCollection dict whose 'features' is this lazy store."""
+        return {'type': 'FeatureCollection', 'features': self}
+
+def is_store_file(path):
+    """Check whether a path names a city store file."""
+    return path.endswith(STORE_EXTENSION)
+
+def main():
+    if len(sys.argv) != 3:
+        print(f"Usage: {sys.argv[0]} INPUT.geojson OUTPUT{STORE_EXTENSION}")
+        sys.exit(1)
+    input_file, output_file = sys.argv[1], sys.argv[2]
+
+    if not os.path.exists(input_file):
+        print(f"Error: Input file '{input_file}' not found.")
+        sys.exit(1)
+
+    print(f"Loading {input_file}...")
+    with open(input_file, 'r') as f:
+        data = json_codec.load(f)
+
+    count = export_store(data['features'], output_file)
+    input_size = os.path.getsize(input_file) / (1024 * 1024)
+    output_size = os.path.getsize(output_file) / (1024 * 1024)
+    print(f"Saved {count} features to {output_file} ({input_size:.2f} MB -> {output_size:.2f} MB)")
+
+if __name__ == "__main__":
+    main()
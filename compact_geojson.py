@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+import json_codec
+from geojson_stream import FeatureCollectionWriter, iter_features
+
+# Default number of decimal places kept; 5 digits is about 1 m
+DEFAULT_PRECISION = 5
+
+def _map_positions(geometry, position_fn, line_fn):
+    """
+    Rebuild a geometry with its coordinates transformed.
+
+    position_fn is applied to single positions (Point, MultiPoint) and
+    line_fn to whole position lists (LineString and polygon rings).
+    """
+    if not geometry:
+        return geometry
+    geom_type = geometry.get('type')
+    coords = geometry.get('coordinates')
+    if not coords:
+        return geometry
+    if geom_type == 'Point':
+        coords = position_fn(coords)
+    elif geom_type == 'MultiPoint':
+        coords = [position_fn(position) for position in coords]
+    elif geom_type == 'LineString':
+        coords = line_fn(coords)
+    elif geom_type in ('Polygon', 'MultiLineString'):
+        coords = [line_fn(ring) for ring in coords]
+    elif geom_type == 'MultiPolygon':
+        coords = [[line_fn(ring) for ring in polygon] for polygon in coords]
+    else:
+        return geometry
+    return {'type': geom_type, 'coordinates': coords}
+
+def quantize_geometry(geometry, precision=DEFAULT_PRECISION):
+    """Return a copy of a geometry with every coordinate rounded to precision decimal places."""
+    def position(p):
+        return [None if value is None else round(value, precision) for value in p[:2]]
+
+    def line(positions):
+        return [position(p) for p in positions]
+
+    return _map_positions(geometry, position, line)
+
+def quantize_features(features, precision=DEFAULT_PRECISION):
+    """Pipeline stage: yield features with coordinates rounded to precision decimal places."""
+    for feature in features:
+        yield dict(feature, geometry=quantize_geometry(feature.get('geometry'), precision))
+
+def features_bbox(features):
+    """Return (min_lon, min_lat, max_lon, max_lat) over all coordinates of the features, or None."""
+    bbox = [float('inf'), float('inf'), float('-inf'), float('-inf')]
+
+    def position(p):
+        if p[0] is not None and p[1] is not None:
+            bbox[0] = min(bbox[0], p[0])
+            bbox[1] = min(bbox[1], p[1])
+            bbox[2] = max(bbox[2], p[0])
+            bbox[3] = max(bbox[3], p[1])
+        return p
+
+    def line(positions):
+        for p in positions:
+            position(p)
+        return positions
+
+    for feature in features:
+        _map_positions(feature.get('geometry'), position, line)
+    return tuple(bbox) if bbox[0] <= bbox[2] else None
+
+def make_transform(bbox, precision=DEFAULT_PRECISION):
+    """
+    Build a TopoJSON-style transform for a bounding box.
+
+    Coordinates are stored as integers q with x = q * scale + translate, so
+    translating to the box corner keeps the integers small and scale fixes the
+    precision.
+    """
+    scale = 10.0 ** -precision
+    translate = [round(bbox[0], precision), round(bbox[1], precision)] if bbox else [0, 0]
+    return {'scale': [scale, scale], 'translate': translate}
+
+def _transform_digits(transform):
+    """Decimal places implied by a transform's scale, used to round decoded values."""
+    scale = min(transform['scale'])
+    digits = 0
+    while digits < 15 and round(scale * 10 ** digits, 9) < 1:
+        digits += 1
+    return digits
+
+def encode_geometry(geometry, transform):
+    """
+    Quantize a geometry to integers with a transform and delta-encode its lines.
+
+    As in TopoJSON, the first position of every LineString and ring is stored
+    relative to the translate and each following position as the difference
+    from the one before it. Points are quantized but not delta-encoded.
+    Missing coordinates (null) are kept as null.
+    """
+    (sx, sy), (tx, ty) = transform['scale'], transform['translate']
+
+    def position(p):
+        if p[0] is None or p[1] is None:
+            return [None, None]
+        return [round((p[0] - tx) / sx), round((p[1] - ty) / sy)]
+
+    def line(positions):
+        encoded = []
+        last_x = last_y = 0
+        for p in positions:
+            x, y = position(p)
+            if x is None:
+                encoded.append([None, None])
+                continue
+            encoded.append([x - last_x, y - last_y])
+            last_x, last_y = x, y
+        return encoded
+
+    return _map_positions(geometry, position, line)
+
+def decode_geometry(geometry, transform):
+    """Inverse of encode_geometry: restore float longitudes and latitudes."""
+    (sx, sy), (tx, ty) = transform['scale'], transform['translate']
+    digits = _transform_digits(transform)
+
+    def position(p):
+        if p[0] is None or p[1] is None:
+            return [None, None]
+        return [round(p[0] * sx + tx, digits), round(p[1] * sy + ty, digits)]
+
+    def line(positions):
+        decoded = []
+        x = y = 0
+        for p in positions:
+            if p[0] is None:
+                decoded.append([None, None])
+                continue
+            x += p[0]
+            y += p[1]
+            decoded.append(position((x, y)))
+        return decoded
+
+    return _map_positions(geometry, position, line)
+
+def encode_features(features, transform):
+    """Pipeline stage: yield features with delta-encoded geometries."""
+    for feature in features:
+        yield dict(feature, geometry=encode_geometry(feature.get('geometry'), transform))
+
+def decode_features(features, transform):
+    """Pipeline stage: yield features with decoded geometries."""
+    for feature in features:
+        yield dict(feature, geometry=decode_geometry(feature.get('geometry'), transform))
+
+def decode_collection(collection):
+    """
+    Turn a collection written by write_compact back into plain GeoJSON.
+
+    Collections without a "transform" member are plain GeoJSON already and
+    are returned unchanged.
+    """
+    transform = collection.get('transform')
+    if transform is None:
+        return collection
+    decoded = {key: value for key, value in collection.items() if key != 'transform'}
+    decoded['features'] = list(decode_features(collection['features'], transform))
+    return decoded
+
+def load_compact(path):
+    """Load a compact FeatureCollection file and decode it to plain GeoJSON."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return decode_collection(json_codec.load(f))
+
+def write_compact(features, f, precision=DEFAULT_PRECISION, delta=False, bbox=None):
+    """
+    Write features as a compact FeatureCollection.
+
+    Without delta the result is plain GeoJSON with rounded coordinates and no
+    whitespace. With delta, coordinates become small integers under a
+    top-level "transform" member and must be read back with decode_collection
+    or load_compact.
+
+    Args:
+        features: Iterable of GeoJSON Feature dicts
+        f: A file object opened in text mode for writing
+        precision: Number of decimal places kept
+        delta: Quantize to integers and delta-encode lines
+        bbox: Bounding box for the transform; computed from features when
+            omitted (features must then be a sequence, as they are read twice)
+
+    Returns:
+        int: Number of features written
+    """
+    if not delta:
+        with FeatureCollectionWriter(f, ensure_ascii=False, compact=True) as writer:
+            writer.write_all(quantize_features(features, precision))
+        return writer.count
+
+    if bbox is None:
+        bbox = features_bbox(features)
+    transform = make_transform(bbox, precision)
+    with FeatureCollectionWriter(f, ensure_ascii=False, compact=True,
+                                 members={'transform': transform}) as writer:
+        writer.write_all(encode_features(features, transform))
+    return writer.count
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a GeoJSON FeatureCollection in a compact form, or decode one.")
+    parser.add_argument('input', help="Input FeatureCollection")
+    parser.add_argument('output', help="Output FeatureCollection")
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION,
+                        help="Decimal places kept (default: %(default)s)")
+    parser.add_argument('--delta', action='store_true',
+                        help="Quantize to integers with a transform and delta-encode lines")
+    parser.add_argument('--decode', action='store_true',
+                        help="Decode a compact file back to plain GeoJSON")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: Input file '{args.input}' not found.")
+        sys.exit(1)
+
+    if args.decode:
+        print(f"Decoding {args.input}...")
+        data = load_compact(args.input)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            with FeatureCollectionWriter(f, ensure_ascii=False) as writer:
+                writer.write_all(data['features'])
+        count = writer.count
+    else:
+        mode = "delta-encoded" if args.delta else "quantized"
+        print(f"Writing {mode} coordinates with {args.precision} decimal places...")
+        bbox = None
+        if args.delta:
+            # First pass only finds the bounding box, so features are never all in memory
+            with open(args.input, 'rb') as f:
+                bbox = features_bbox(iter_features(f))
+        with open(args.input, 'rb') as f, open(args.output, 'w', encoding='utf-8') as out:
+            count = write_compact(iter_features(f), out, args.precision, args.delta, bbox)
+
+    input_size = os.path.getsize(args.input) / (1024 * 1024)
+    output_size = os.path.getsize(args.output) / (1024 * 1024)
+    print(f"Saved {count} features to {args.output} ({input_size:.2f} MB -> {output_size:.2f} MB)")
+
+if __name__ == "__main__":
+    main()
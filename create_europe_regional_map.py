@@ -1,9 +1,17 @@
 #!/usr/bin/env python3
-import json
+import argparse
+import inspect
+import multiprocessing
 import os
 import sys
+from array import array
 from collections import defaultdict
 
+import json_codec
+from build_cache import cache_key, cached_build
+from city_store import MISSING, NULL, STORE_EXTENSION, CityStore, is_store_file
+from hull import CONCAVE_K, concave_hull, convex_hull
+
 # European regions grouping
 REGIONS = {
     "Western Europe": ["France", "Belgium", "Netherlands", "Luxembourg", "Germany", "Switzerland", "Austria", "Liechtenstein", "Monaco"],
@@ -14,6 +22,11 @@ REGIONS = {
     "Northeastern Europe": ["Belarus", "Ukraine", "Moldova", "Russia"]
 }
 
+# Modules whose code shapes the region polygons, besides this script: the
+# hulls, the enclosure check concave_hull runs through polygon_engine and
+# spatial_index, the city store reader and the JSON serializer
+SOURCE_MODULES = ('hull', 'polygon_engine', 'spatial_index', 'city_store', 'json_codec')
+
 # Flatten country to region mapping
 COUNTRY_TO_REGION = {}
 for region, countries in REGIONS.items():
@@ -21,13 +34,45 @@ for region, countries in REGIONS.items():
         COUNTRY_TO_REGION[country] = region
 
 def load_cities(filepath):
-    """Load cities from GeoJSON file"""
+    """Load cities from GeoJSON file, or memory-map them from a city store file"""
     print(f"Loading data from {filepath}...")
+    if is_store_file(filepath):
+        return CityStore(filepath).as_feature_collection()
     with open(filepath, 'r') as f:
-        return json.load(f)
+        return json_codec.load(f)
+
+def group_store_by_region(store):
+    """Group the Point cities of a CityStore by region without building feature dicts"""
+    city_points = defaultdict(list)
+    if 'country_name' not in {column['name'] for column in store.schema}:
+        return city_points
+    
+    countries = store.string_column('country_name')
+    # Equal country names share a string index, so each is resolved only once
+    regions = {MISSING: None, NULL: None}
+    
+    for i in range(len(store)):
+        if store.geometry_type(i) != "Point":
+            continue
+        
+        index = countries[i]
+        if index not in regions:
+            regions[index] = COUNTRY_TO_REGION.get(store.string(index))
+        region = regions[index]
+        if region:
+            lon, lat = store.point(i)
+            # Skip cities whose coordinates are missing (stored as NaN)
+            if lon is None or lon != lon or lat != lat:
+                continue
+            city_points[region].append([lon, lat])
+    
+    return city_points
 
 def group_by_region(cities_data):
     """Group cities by region"""
+    if isinstance(cities_data["features"], CityStore):
+        return group_store_by_region(cities_data["features"])
+    
     city_points = defaultdict(list)
     
     for feature in cities_data["features"]:
@@ -45,55 +90,61 @@ def group_by_region(cities_data):
         region = COUNTRY_TO_REGION.get(country)
         if region:
             coords = feature["geometry"]["coordinates"]
+            # Skip cities whose coordinates are missing (the CSV extractor keeps them as nulls)
+            if None in coords:
+                continue
             city_points[region].append(coords)
     
     return city_points
 
-def create_region_polygons(city_points):
-    """Create simplified polygons for each region"""
+def pack_points(points):
+    """Pack [longitude, latitude] points into one flat array('d') buffer, which pickles compactly"""
+    buffer = array('d')
+    for point in points:
+        buffer.append(point[0])
+        buffer.append(point[1])
+    return buffer
+
+def region_outline(task):
+    """
+    Compute one region's outline ring; runs in a worker process with --jobs
+    
+    Args:
+        task: (packed coordinate buffer, hull kind, concavity)
+    """
+    buffer, hull, concavity = task
+    points = zip(buffer[0::2], buffer[1::2])
+    if hull == "concave":
+        return concave_hull(points, concavity)
+    return convex_hull(points)
+
+def create_region_polygons(city_points, hull="convex", concavity=CONCAVE_K, jobs=1):
+    """
+    Create an outline polygon for each region from its city points
+    
+    Args:
+        city_points: Mapping of region name to [longitude, latitude] points
+        hull: "convex" for the convex hull, "concave" for a k-nearest-neighbours
+            concave hull that follows the city cloud more closely
+        concavity: Number of neighbours for the concave hull (smaller is tighter)
+        jobs: Number of worker processes computing hulls in parallel
+    """
+    # Features always come out in REGIONS order, however the work is scheduled
+    regions = [region for region in REGIONS if region in city_points]
+    tasks = [(pack_points(city_points[region]), hull, concavity) for region in regions]
+    
+    if jobs > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(jobs, len(tasks))) as pool:
+            outlines = pool.map(region_outline, tasks, chunksize=1)
+    else:
+        outlines = [region_outline(task) for task in tasks]
+    
     region_features = []
     
-    for region, points in city_points.items():
-        if len(points) < 3:
+    for region, polygon in zip(regions, outlines):
+        # Regions whose cities do not span an area get no polygon
+        if polygon is None:
             continue
-            
-        # Select a subset of points to create a simplified convex hull-like polygon
-        # For simplicity, we'll just take points from different extremes 
-        # This is a very simplified approach - in practice you'd use a proper convex hull algorithm
-        points.sort(key=lambda p: p[0])  # Sort by longitude
-        west_points = points[:min(5, len(points))]
-        east_points = points[-min(5, len(points)):]
-        
-        all_selected = west_points + east_points
-        all_selected.sort(key=lambda p: p[1])  # Sort by latitude
-        south_points = all_selected[:min(5, len(all_selected))]
-        north_points = all_selected[-min(5, len(all_selected)):]
-        
-        # Convert points to tuples of tuples for deduplication
-        unique_points = {}
-        for point in west_points + east_points + south_points + north_points:
-            point_tuple = tuple(point)
-            unique_points[point_tuple] = point
-        
-        boundary_points = list(unique_points.values())
-        
-        # Sort the points to form a rough polygon (this is simplified)
-        # A proper implementation would use a convex hull algorithm
-        central_point = [sum(p[0] for p in boundary_points)/len(boundary_points), 
-                        sum(p[1] for p in boundary_points)/len(boundary_points)]
-        
-        # Sort points by angle to create a rough polygon
-        def get_angle(point):
-            return (point[0] - central_point[0], point[1] - central_point[1])
-            
-        boundary_points.sort(key=lambda p: (
-            # Sort counterclockwise by quadrant and angle
-            (1 if p[1] > central_point[1] else 0) * 2 + (1 if p[0] > central_point[0] else 0),
-            (p[1] - central_point[1]) / (p[0] - central_point[0] + 0.0001)
-        ))
-        
-        # Close the polygon
-        polygon = boundary_points + [boundary_points[0]]
         
         feature = {
             "type": "Feature",
@@ -110,15 +161,24 @@ def create_region_polygons(city_points):
     
     return region_features
 
-def main():
-    # Use the european cities data file
-    input_file = 'european_cities.geojson'
-    output_file = 'europe_cities.json'
-    
-    if not os.path.exists(input_file):
-        print(f"Error: Input file '{input_file}' not found.")
-        sys.exit(1)
-    
+def parse_args():
+    parser = argparse.ArgumentParser(description="Build region polygons from European city points.")
+    parser.add_argument('--input', default='european_cities.geojson',
+                        help=f"European cities as GeoJSON or a city store ({STORE_EXTENSION}) file")
+    parser.add_argument('--output', default='europe_regions.json',
+                        help="Output FeatureCollection of region polygons")
+    parser.add_argument('--hull', choices=['convex', 'concave'], default='convex',
+                        help="Outline each region with its convex hull or a concave hull")
+    parser.add_argument('--concavity', type=int, default=CONCAVE_K,
+                        help="Neighbours considered by the concave hull (smaller is tighter)")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="Number of worker processes computing region polygons")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Rebuild the output even if a cached copy exists")
+    return parser.parse_args()
+
+def build_region_map(input_file, output_file, hull, concavity, jobs):
+    """Load the cities, build the region polygons and write them to output_file"""
     # Load cities data
     cities_data = load_cities(input_file)
     print(f"Loaded {len(cities_data['features'])} features")
@@ -128,7 +188,7 @@ def main():
     print(f"Grouped cities into {len(city_points)} regions")
     
     # Create region polygons
-    region_features = create_region_polygons(city_points)
+    region_features = create_region_polygons(city_points, hull, concavity, jobs)
     print(f"Created {len(region_features)} region polygons")
     
     # Create GeoJSON output
@@ -139,10 +199,35 @@ def main():
     
     # Save the output file
     with open(output_file, 'w') as f:
-        json.dump(output_data, f, indent=2)
+        json_codec.dump(output_data, f, indent=2)
+
+def main():
+    args = parse_args()
+    # Use the european cities data file
+    input_file = args.input
+    output_file = args.output
+    
+    if not os.path.exists(input_file):
+        print(f"Error: Input file '{input_file}' not found.")
+        sys.exit(1)
+    
+    def build(path):
+        build_region_map(input_file, path, args.hull, args.concavity, args.jobs)
+    
+    if args.no_cache:
+        build(output_file)
+    else:
+        # The number of jobs does not change the output, so it is not part of the key;
+        # the JSON backend does, as it spells some floats differently
+        sources = [__file__] + [inspect.getfile(sys.modules[name]) for name in SOURCE_MODULES]
+        key = cache_key('regional_map', inputs=[input_file], sources=sources, definition=REGIONS,
+                        params={'hull': args.hull, 'concavity': args.concavity,
+                                'json_serializer': json_codec.SERIALIZER})
+        if cached_build('regional_map', key, output_file, build):
+            print("Inputs unchanged, reused cached region polygons")
     
     file_size = os.path.getsize(output_file) / (1024 * 1024)
     print(f"Saved output to {output_file} ({file_size:.2f} MB)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
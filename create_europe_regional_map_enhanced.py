@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
-import json
+import argparse
 import os
 import sys
 import math
 from collections import defaultdict
 
+import json_codec
+from build_cache import cache_key, cached_build
+from city_store import CityStore, is_store_file
+from topojson import write_topology
+
 # Define European regions with more precise boundaries
 REGIONS = {
     "Western Europe": {
@@ -100,10 +105,12 @@ for region, data in REGIONS.items():
         COUNTRY_TO_REGION[country] = region
 
 def load_cities(filepath):
-    """Load cities from GeoJSON file"""
+    """Load cities from GeoJSON file, or memory-map them from a city store file"""
     print(f"Loading data from {filepath}...")
+    if is_store_file(filepath):
+        return CityStore(filepath).as_feature_collection()
     with open(filepath, 'r') as f:
-        return json.load(f)
+        return json_codec.load(f)
 
 def create_region_features():
     """Create region features from predefined polygons"""
@@ -124,9 +131,18 @@ def create_region_features():
     
     return region_features
 
-def main():
-    output_file = 'europe_cities.json'
-    
+def parse_args():
+    parser = argparse.ArgumentParser(description="Write the predefined European region polygons.")
+    parser.add_argument('--output', default='europe_regions_enhanced.json',
+                        help="Output FeatureCollection of region polygons")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Rebuild the output even if a cached copy exists")
+    parser.add_argument('--topojson', metavar='FILE',
+                        help="Also write the features as TopoJSON with shared borders stored once")
+    return parser.parse_args()
+
+def build_region_map(output_file):
+    """Build the region features and write them to output_file"""
     # Create region features
     region_features = create_region_features()
     print(f"Created {len(region_features)} region features")
@@ -139,10 +155,29 @@ def main():
     
     # Save the output file
     with open(output_file, 'w') as f:
-        json.dump(output_data, f, indent=2)
+        json_codec.dump(output_data, f, indent=2)
+
+def main():
+    args = parse_args()
+    output_file = args.output
+    
+    if args.no_cache:
+        build_region_map(output_file)
+    else:
+        key = cache_key('regional_map_enhanced', sources=[__file__], definition=REGIONS,
+                        params={'json_serializer': json_codec.SERIALIZER})
+        if cached_build('regional_map_enhanced', key, output_file, build_region_map):
+            print("Regions unchanged, reused cached region features")
     
     file_size = os.path.getsize(output_file) / (1024 * 1024)
     print(f"Saved output to {output_file} ({file_size:.2f} MB)")
+    
+    if args.topojson:
+        with open(output_file, 'r') as f:
+            features = json_codec.load(f)['features']
+        topology = write_topology(features, args.topojson)
+        file_size = os.path.getsize(args.topojson) / (1024 * 1024)
+        print(f"Saved TopoJSON with {len(topology['arcs'])} arcs to {args.topojson} ({file_size:.2f} MB)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
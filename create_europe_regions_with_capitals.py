@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
-import json
+import argparse
 import os
 import sys
 from collections import defaultdict
 
+import json_codec
+from build_cache import cache_key, cached_build
+from topojson import write_topology
+
 # Define European regions with their major cities/capitals
 REGIONS = {
     "Western Europe": {
@@ -193,19 +197,47 @@ def create_geojson():
     
     return geojson
 
-def main():
-    output_file = 'europe_cities.json'
-    
+def parse_args():
+    parser = argparse.ArgumentParser(description="Write the European region polygons with their capital cities.")
+    parser.add_argument('--output', default='europe_cities.json',
+                        help="Output FeatureCollection of regions and capitals")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Rebuild the output even if a cached copy exists")
+    parser.add_argument('--topojson', metavar='FILE',
+                        help="Also write the features as TopoJSON with shared borders stored once")
+    return parser.parse_args()
+
+def build_geojson(output_file):
+    """Create the regions and capitals GeoJSON and write it to output_file"""
     # Create GeoJSON
     europe_geojson = create_geojson()
     
     # Save to file
     with open(output_file, 'w') as f:
-        json.dump(europe_geojson, f, indent=2)
+        json_codec.dump(europe_geojson, f, indent=2)
+    print(f"Created {len(europe_geojson['features'])} features ({len(REGIONS)} regions with capitals)")
+
+def main():
+    args = parse_args()
+    output_file = args.output
+    
+    if args.no_cache:
+        build_geojson(output_file)
+    else:
+        key = cache_key('regions_with_capitals', sources=[__file__], definition=REGIONS,
+                        params={'json_serializer': json_codec.SERIALIZER})
+        if cached_build('regions_with_capitals', key, output_file, build_geojson):
+            print("Regions unchanged, reused cached regions and capitals")
     
     file_size = os.path.getsize(output_file) / (1024 * 1024)
     print(f"Saved output to {output_file} ({file_size:.2f} MB)")
-    print(f"Created {len(europe_geojson['features'])} features ({len(REGIONS)} regions with capitals)")
+    
+    if args.topojson:
+        with open(output_file, 'r') as f:
+            features = json_codec.load(f)['features']
+        topology = write_topology(features, args.topojson)
+        file_size = os.path.getsize(args.topojson) / (1024 * 1024)
+        print(f"Saved TopoJSON with {len(topology['arcs'])} arcs to {args.topojson} ({file_size:.2f} MB)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
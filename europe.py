@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+import json_codec
+from polygon_engine import prepare_geometry
+
+# Define European countries
+european_countries = {
+    'Albania', 'Andorra', 'Austria', 'Belarus', 'Belgium', 'Bosnia and Herzegovina',
+    'Bulgaria', 'Croatia', 'Cyprus', 'Czech Republic', 'Denmark', 'Estonia',
+    'Finland', 'France', 'Germany', 'Greece', 'Hungary', 'Iceland', 'Ireland',
+    'Italy', 'Kosovo', 'Latvia', 'Liechtenstein', 'Lithuania', 'Luxembourg',
+    'Malta', 'Moldova', 'Monaco', 'Montenegro', 'Netherlands', 'North Macedonia',
+    'Norway', 'Poland', 'Portugal', 'Romania', 'Russia', 'San Marino', 'Serbia',
+    'Slovakia', 'Slovenia', 'Spain', 'Sweden', 'Switzerland', 'Ukraine',
+    'United Kingdom', 'Vatican City'
+}
+
+# ISO 3166-1 alpha-2 codes of the European countries above ('XK' is the
+# user-assigned code geonames uses for Kosovo)
+european_country_codes = {
+    'AL', 'AD', 'AT', 'BY', 'BE', 'BA',
+    'BG', 'HR', 'CY', 'CZ', 'DK', 'EE',
+    'FI', 'FR', 'DE', 'GR', 'HU', 'IS', 'IE',
+    'IT', 'XK', 'LV', 'LI', 'LT', 'LU',
+    'MT', 'MD', 'MC', 'ME', 'NL', 'MK',
+    'NO', 'PL', 'PT', 'RO', 'RU', 'SM', 'RS',
+    'SK', 'SI', 'ES', 'SE', 'CH', 'UA',
+    'GB', 'VA'
+}
+
+# Countries whose whole territory lies outside the Europe polygon, so a city
+# with one of these codes can never pass the polygon test. Countries that
+# straddle the polygon (e.g. Turkey, Syria, Georgia) and
+# European territories missing from the list above (e.g. Faroe Islands,
+# Gibraltar) are deliberately left out, so they still get the polygon test.
+non_european_country_codes = {
+    # Americas
+    'US', 'CA', 'MX', 'GT', 'BZ', 'SV', 'HN', 'NI', 'CR', 'PA', 'CU', 'JM',
+    'HT', 'DO', 'PR', 'BS', 'TT', 'BB', 'AG', 'DM', 'GD', 'KN', 'LC', 'VC',
+    'CO', 'VE', 'GY', 'SR', 'EC', 'PE', 'BO', 'BR', 'PY', 'UY', 'AR', 'CL',
+    # Africa
+    'MA', 'DZ', 'TN', 'EG', 'LY', 'SD', 'SS', 'ET', 'ER', 'DJ', 'SO', 'KE',
+    'UG', 'TZ', 'RW', 'BI', 'CD', 'CG', 'GA', 'GQ', 'CM', 'CF', 'TD', 'NE',
+    'NG', 'BJ', 'TG', 'GH', 'CI', 'LR', 'SL', 'GN', 'GW', 'GM', 'SN', 'MR',
+    'ML', 'BF', 'CV', 'AO', 'ZM', 'ZW', 'MW', 'MZ', 'NA', 'BW', 'ZA', 'LS',
+    'SZ', 'MG', 'MU', 'SC', 'KM', 'EH',
+    # Middle East and the Caucasus east of 40E
+    'SA', 'YE', 'OM', 'AE', 'QA', 'BH', 'KW', 'JO', 'IL', 'PS', 'IR', 'AZ', 'AM',
+    # Rest of Asia
+    'AF', 'PK', 'IN', 'NP', 'BT', 'BD', 'LK', 'MV', 'MM', 'TH', 'LA', 'KH',
+    'VN', 'MY', 'SG', 'BN', 'ID', 'TL', 'PH', 'CN', 'HK', 'MO', 'TW', 'MN',
+    'KP', 'KR', 'JP', 'KZ', 'UZ', 'TM', 'KG', 'TJ',
+    # Oceania
+    'AU', 'NZ', 'PG', 'FJ', 'SB', 'VU', 'NC', 'PF', 'WS', 'TO', 'KI', 'FM',
+    'MH', 'PW', 'NR', 'TV'
+}
+
+# Define Europe's borders as a polygon (longitude, latitude pairs)
+# This is a simplified polygon of Europe's mainland; its southern edge runs
+# through the Mediterranean so that North Africa stays outside
+europe_polygon = [
+    # Western Europe (Atlantic)
+    (-10.0, 35.95), # Southwest corner, north of the Moroccan coast
+    (-10.0, 50.5),
+    (-11.0, 51.2),  # West of Ireland
+    (-11.0, 56.0),
+    (-10.0, 60.0),  # Northwest corner
+    # Northern Europe
+    (-5.0, 65.0),   # North of the Faroe Islands
+    (0.0, 70.0),    # Northern Norway
+    (30.0, 72.0),   # Northern Russia
+    # Eastern Europe
+    (40.0, 65.0),   # Eastern Russia
+    (40.0, 45.0),   # Black Sea area
+    # Southern Europe
+    (35.0, 34.4),   # East of Cyprus
+    (26.5, 34.6),   # South of Crete
+    (12.2, 35.2),   # South of Malta and Lampedusa
+    (12.2, 36.3),   # Between Tunisia and Pantelleria
+    (11.3, 37.2),   # Off Cap Bon
+    (9.8, 37.6),    # North of Bizerte
+    (5.0, 37.5),    # Off the Algerian coast
+    (0.5, 37.0),
+    (-1.5, 36.4),   # Alboran Sea
+    (-5.6, 35.95),  # Strait of Gibraltar, between Tarifa and Ceuta
+    (-10.0, 35.95)  # Back to start
+]
+
+iceland_polygon = [
+    (-25.0, 63.0),
+    (-12.5, 63.0),
+    (-12.5, 67.0),
+    (-25.0, 67.0),
+    (-25.0, 63.0)
+]
+
+europe_geometry = {
+    'type': 'MultiPolygon',
+    'coordinates': [[europe_polygon], [iceland_polygon]]
+}
+
+# Prepared once at import and shared by all the extraction scripts; a
+# detailed border from load_boundary is passed to the checks explicitly
+EUROPE = prepare_geometry(europe_geometry)
+
+def load_boundary(path):
+    """
+    Use a detailed Europe border from a GeoJSON file instead of the built-in outline.
+
+    The file may hold a Polygon or MultiPolygon geometry, a Feature, or a
+    FeatureCollection whose polygonal features are merged. A border with
+    PREPARED_MIN_VERTICES (see polygon_engine) or more vertices is prepared
+    into a quadtree once, so thousands of vertices cost about as much per
+    point as a simple outline.
+
+    Args:
+        path: Path to the GeoJSON file
+
+    Returns:
+        CompiledGeometry or PreparedGeometry: The prepared border, to pass
+            as the border argument of is_in_europe and are_in_europe
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json_codec.load(f)
+    if data.get('type') == 'FeatureCollection':
+        geometries = [feature.get('geometry') for feature in data['features']]
+    elif data.get('type') == 'Feature':
+        geometries = [data.get('geometry')]
+    else:
+        geometries = [data]
+
+    polygons = []
+    for geometry in geometries:
+        if not geometry:
+            continue
+        if geometry['type'] == 'Polygon':
+            polygons.append(geometry['coordinates'])
+        elif geometry['type'] == 'MultiPolygon':
+            polygons.extend(geometry['coordinates'])
+    if not polygons:
+        raise ValueError(f"No Polygon or MultiPolygon geometry in {path}")
+    return prepare_geometry({'type': 'MultiPolygon', 'coordinates': polygons})
+
+def is_in_europe(lon, lat, border=None):
+    """Check if a point is in Europe using the polygon (or a border from load_boundary)."""
+    if border is None:
+        border = EUROPE
+    try:
+        return border.contains(float(lon), float(lat))
+    except (TypeError, ValueError):
+        return False
+
+def are_in_europe(lons, lats, border=None):
+    """Check a batch of points against the Europe polygon (or a border from load_boundary), one bool per point."""
+    if border is None:
+        border = EUROPE
+    return border.contains_many(lons, lats)
+
+def classify_country(country_name, country_code):
+    """
+    Decide from the country alone whether a city is in Europe.
+
+    Returns:
+        True if the country name or code is European, False if the code is
+        known to be outside Europe, or None if the polygon test is needed
+    """
+    if country_name in european_countries or country_code in european_country_codes:
+        return True
+    if country_code in non_european_country_codes:
+        return False
+    return None
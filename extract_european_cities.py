@@ -1,195 +1,182 @@
 #!/usr/bin/env python3
-import json
+import argparse
 import sys
 import os
-import re
+from itertools import islice
 
-# Define European countries
-european_countries = {
-    'Albania', 'Andorra', 'Austria', 'Belarus', 'Belgium', 'Bosnia and Herzegovina',
-    'Bulgaria', 'Croatia', 'Cyprus', 'Czech Republic', 'Denmark', 'Estonia',
-    'Finland', 'France', 'Germany', 'Greece', 'Hungary', 'Iceland', 'Ireland',
-    'Italy', 'Kosovo', 'Latvia', 'Liechtenstein', 'Lithuania', 'Luxembourg',
-    'Malta', 'Moldova', 'Monaco', 'Montenegro', 'Netherlands', 'North Macedonia',
-    'Norway', 'Poland', 'Portugal', 'Romania', 'Russia', 'San Marino', 'Serbia',
-    'Slovakia', 'Slovenia', 'Spain', 'Sweden', 'Switzerland', 'Ukraine',
-    'United Kingdom', 'Vatican City'
-}
+import json_codec
+from geojson_stream import FeatureCollectionWriter, iter_feature_spans
+from europe import are_in_europe, classify_country
+from polygon_engine import BATCH_SIZE, to_float_array
 
-# Define Europe's borders as a polygon (longitude, latitude pairs)
-# This is a simplified polygon of Europe's borders
-europe_polygon = [
-    # Western Europe (Atlantic)
-    (-10.0, 35.0),  # Southwest corner
-    (-10.0, 60.0),  # Northwest corner
-    # Northern Europe
-    (-5.0, 65.0),   # Iceland area
-    (0.0, 70.0),    # Northern Norway
-    (30.0, 72.0),   # Northern Russia
-    # Eastern Europe
-    (40.0, 65.0),   # Eastern Russia
-    (40.0, 45.0),   # Black Sea area
-    # Southern Europe
-    (35.0, 35.0),   # Turkey/Cyprus
-    (25.0, 35.0),   # Mediterranean
-    (10.0, 35.0),   # North Africa coast
-    (-10.0, 35.0)   # Back to start
-]
-
-def point_in_polygon(point, polygon):
+def european_flags(features):
     """
-    Determine if a point is inside a polygon using the ray casting algorithm.
+    Decide for a batch of geonames features which ones are in Europe.
+    
+    Features are first classified by country name and code; features from
+    countries outside Europe are dropped, and the remaining Point features are
+    tested against the Europe polygon together in one batched pass.
     
-    Args:
-        point: A tuple of (longitude, latitude)
-        polygon: A list of (longitude, latitude) tuples forming a polygon
-        
     Returns:
-        bool: True if the point is inside the polygon, False otherwise
+        list: One bool per feature, in the same order
     """
-    x, y = point
-    n = len(polygon)
-    inside = False
+    flags = [False] * len(features)
+    candidates = []
+    lons = []
+    lats = []
     
-    p1x, p1y = polygon[0]
-    for i in range(1, n + 1):
-        p2x, p2y = polygon[i % n]
-        if y > min(p1y, p2y):
-            if y <= max(p1y, p2y):
-                if x <= max(p1x, p2x):
-                    if p1y != p2y:
-                        xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                    if p1x == p2x or x <= xinters:
-                        inside = not inside
-        p1x, p1y = p2x, p2y
+    for i, feature in enumerate(features):
+        # Check by country name and code; only unknown countries need the polygon
+        if 'properties' in feature and feature['properties']:
+            properties = feature['properties']
+            decision = classify_country(properties.get('cou_name_en'), properties.get('country_code'))
+            if decision:
+                flags[i] = True
+                continue
+            if decision is False:
+                continue
+        
+        # Otherwise queue Point geometries (city centers) for the polygon test
+        if 'geometry' in feature and feature['geometry']:
+            geom_type = feature['geometry'].get('type', '').lower()
+            coords = feature['geometry'].get('coordinates', [])
+            
+            if geom_type == 'point' and coords and len(coords) == 2:
+                candidates.append(i)
+                lons.append(coords[0])
+                lats.append(coords[1])
     
-    return inside
+    if candidates:
+        inside = are_in_europe(to_float_array(lons), to_float_array(lats))
+        for i, is_inside in zip(candidates, inside):
+            flags[i] = is_inside
+    
+    return flags
+
+def shard_path(output_file, index):
+    """Path of the partial output shard with the given index."""
+    return f"{output_file}.part{index:05d}"
 
-def is_in_europe(lon, lat):
-    """Check if a point is in Europe using the polygon."""
-    try:
-        lon_val = float(lon)
-        lat_val = float(lat)
-        return point_in_polygon((lon_val, lat_val), europe_polygon)
-    except (TypeError, ValueError):
-        return False
+def load_checkpoint(checkpoint_file):
+    """Load a checkpoint written by save_checkpoint, or None if there is none."""
+    if not os.path.exists(checkpoint_file):
+        return None
+    with open(checkpoint_file, 'r') as f:
+        return json_codec.load(f)
+
+def save_checkpoint(checkpoint_file, output_file, state, features):
+    """
+    Write the features found since the last checkpoint to a new shard, then
+    record the new state.
+    
+    The shard is written before the checkpoint, and the checkpoint is replaced
+    atomically, so an interruption at any point leaves a consistent state.
+    """
+    path = shard_path(output_file, len(state['shards']))
+    with open(path, 'w') as f:
+        json_codec.dump(features, f)
+    
+    state['shards'].append(path)
+    tmp_file = checkpoint_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json_codec.dump(state, f)
+    os.replace(tmp_file, checkpoint_file)
 
-def is_european_country(country_name):
-    """Check if a country name is in the list of European countries."""
-    return country_name in european_countries
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract European cities from the geonames GeoJSON dump.")
+    parser.add_argument('--input', default='geonames-all-cities-with-a-population-1000@public (1).geojson',
+                        help="Input FeatureCollection")
+    parser.add_argument('--output', default='european_cities_geonames.geojson',
+                        help="Output FeatureCollection")
+    parser.add_argument('--checkpoint-every', type=int, default=50000,
+                        help="Write a checkpoint after this many input features (0 disables checkpoints)")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore any existing checkpoint and start from the beginning")
+    parser.add_argument('--limit', type=int, default=None,
+                        help="Stop after this many input features (for quick test runs)")
+    return parser.parse_args()
 
 def main():
-    input_file = 'geonames-all-cities-with-a-population-1000@public (1).geojson'
-    output_file = 'european_cities_geonames.geojson'
+    args = parse_args()
+    input_file = args.input
+    output_file = args.output
+    checkpoint_file = output_file + '.checkpoint'
     
     if not os.path.exists(input_file):
         print(f"Error: Input file '{input_file}' not found.")
         sys.exit(1)
     
-    print(f"Processing {input_file}...")
+    state = None if args.restart else load_checkpoint(checkpoint_file)
+    if state and state.get('input_file') == input_file:
+        print(f"Resuming {input_file} from byte {state['offset']} "
+              f"({state['processed_count']} features processed, {state['feature_count']} European cities found)...")
+    else:
+        state = {
+            'input_file': input_file,
+            'offset': None,
+            'processed_count': 0,
+            'feature_count': 0,
+            'shards': []
+        }
+        print(f"Processing {input_file}...")
     
-    # Process the file in chunks to handle large files
+    # Stream features one at a time so memory stays flat on the full dump.
+    # Only the features found since the last checkpoint are held in memory.
     european_features = []
     
-    # Open the file and read line by line
-    with open(input_file, 'r') as f:
-        line_count = 0
-        feature_count = 0
+    with open(input_file, 'rb') as f:
+        since_checkpoint = 0
+        spans = iter_feature_spans(f, start_offset=state['offset'])
         
-        # Read the file line by line
-        buffer = ""
-        in_feature = False
-        
-        for line in f:
-            line_count += 1
+        while True:
+            batch_size = BATCH_SIZE
+            if args.limit:
+                batch_size = min(batch_size, args.limit - state['processed_count'])
+                if batch_size <= 0:
+                    print(f"Reached feature limit of {args.limit}. Stopping processing.")
+                    break
             
-            # Add the line to our buffer
-            buffer += line
+            batch = list(islice(spans, batch_size))
+            if not batch:
+                break
+            flags = european_flags([feature for feature, _ in batch])
             
-            # Check if we have a complete feature
-            if '"type":"Feature"' in buffer and ('},' in buffer or '}}' in buffer):
-                # Try to extract a complete feature
-                try:
-                    # Find the start of the feature
-                    start_idx = buffer.find('"type":"Feature"')
-                    if start_idx > 0:
-                        # Move back to find the opening brace
-                        while start_idx > 0 and buffer[start_idx] != '{':
-                            start_idx -= 1
-                    
-                    # Find the end of the feature
-                    end_idx = buffer.find('},', start_idx)
-                    if end_idx == -1:
-                        end_idx = buffer.find('}}', start_idx)
-                        if end_idx != -1:
-                            end_idx += 2  # Include the closing braces
-                    else:
-                        end_idx += 1  # Include the closing brace
+            for (feature, offset), is_european in zip(batch, flags):
+                state['processed_count'] += 1
+                since_checkpoint += 1
+                
+                # If the city is in Europe, add it to our list
+                if is_european:
+                    european_features.append(feature)
+                    state['feature_count'] += 1
                     
-                    if start_idx >= 0 and end_idx > start_idx:
-                        # Extract the feature
-                        feature_str = buffer[start_idx:end_idx]
-                        
-                        # Parse the feature
-                        try:
-                            feature = json.loads(feature_str)
-                            
-                            # Check if the city is in Europe
-                            is_european = False
-                            
-                            # Check by country name
-                            if 'properties' in feature and feature['properties']:
-                                country_name = feature['properties'].get('cou_name_en')
-                                if country_name and is_european_country(country_name):
-                                    is_european = True
-                            
-                            # Check by coordinates if not already determined to be European
-                            if not is_european and 'geometry' in feature and feature['geometry']:
-                                geom_type = feature['geometry'].get('type', '').lower()
-                                coords = feature['geometry'].get('coordinates', [])
-                                
-                                # For Point geometries (city centers)
-                                if geom_type == 'point' and coords and len(coords) == 2:
-                                    lon, lat = coords
-                                    if is_in_europe(lon, lat):
-                                        is_european = True
-                            
-                            # If the city is in Europe, add it to our list
-                            if is_european:
-                                european_features.append(feature)
-                                feature_count += 1
-                                
-                                # Print progress every 1000 features
-                                if feature_count % 1000 == 0:
-                                    print(f"Processed {line_count} lines, found {feature_count} European cities so far...")
-                        
-                        except json.JSONDecodeError as e:
-                            print(f"Error parsing feature at line {line_count}: {e}")
-                        
-                        # Remove the processed feature from the buffer
-                        buffer = buffer[end_idx:]
+                    # Print progress every 1000 features
+                    if state['feature_count'] % 1000 == 0:
+                        print(f"Processed {state['processed_count']} features, "
+                              f"found {state['feature_count']} European cities so far...")
                 
-                except Exception as e:
-                    print(f"Error processing buffer at line {line_count}: {e}")
-                    buffer = ""  # Reset buffer on error
-            
-            # Limit processing to first 100,000 lines for testing
-            if line_count >= 100000:
-                print(f"Reached line limit of 100,000. Stopping processing.")
-                break
+                if args.checkpoint_every and since_checkpoint >= args.checkpoint_every:
+                    state['offset'] = offset
+                    save_checkpoint(checkpoint_file, output_file, state, european_features)
+                    european_features = []
+                    since_checkpoint = 0
     
-    # Create new GeoJSON with only European cities
-    european_data = {
-        'type': 'FeatureCollection',
-        'features': european_features
-    }
+    # Stream the shards written so far plus the features since the last
+    # checkpoint into the output, holding only one shard in memory at a time
+    print(f"Saving {state['feature_count']} European cities to {output_file}...")
+    with open(output_file, 'w') as f, FeatureCollectionWriter(f) as writer:
+        for path in state['shards']:
+            with open(path, 'r') as shard:
+                writer.write_all(json_codec.load(shard))
+        writer.write_all(european_features)
     
-    # Save the filtered data
-    print(f"Saving {len(european_features)} European cities to {output_file}...")
-    with open(output_file, 'w') as f:
-        json.dump(european_data, f)
+    # The output is complete, so the checkpoint and shards are no longer needed
+    for path in state['shards']:
+        os.remove(path)
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
     
     print(f"Done! European cities have been saved to {output_file}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
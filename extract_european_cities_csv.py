@@ -1,99 +1,311 @@
 #!/usr/bin/env python3
+import argparse
 import csv
-import json
+import io
+import multiprocessing
 import sys
 import os
+from array import array
+from itertools import islice
 
-# Define European countries
-european_countries = {
-    'Albania', 'Andorra', 'Austria', 'Belarus', 'Belgium', 'Bosnia and Herzegovina',
-    'Bulgaria', 'Croatia', 'Cyprus', 'Czech Republic', 'Denmark', 'Estonia',
-    'Finland', 'France', 'Germany', 'Greece', 'Hungary', 'Iceland', 'Ireland',
-    'Italy', 'Kosovo', 'Latvia', 'Liechtenstein', 'Lithuania', 'Luxembourg',
-    'Malta', 'Moldova', 'Monaco', 'Montenegro', 'Netherlands', 'North Macedonia',
-    'Norway', 'Poland', 'Portugal', 'Romania', 'Russia', 'San Marino', 'Serbia',
-    'Slovakia', 'Slovenia', 'Spain', 'Sweden', 'Switzerland', 'Ukraine',
-    'United Kingdom', 'Vatican City'
-}
-
-# Define Europe's borders as a polygon (longitude, latitude pairs)
-# This is a simplified polygon of Europe's borders
-europe_polygon = [
-    # Western Europe (Atlantic)
-    (-10.0, 35.0),  # Southwest corner
-    (-10.0, 60.0),  # Northwest corner
-    # Northern Europe
-    (-5.0, 65.0),   # Iceland area
-    (0.0, 70.0),    # Northern Norway
-    (30.0, 72.0),   # Northern Russia
-    # Eastern Europe
-    (40.0, 65.0),   # Eastern Russia
-    (40.0, 45.0),   # Black Sea area
-    # Southern Europe
-    (35.0, 35.0),   # Turkey/Cyprus
-    (25.0, 35.0),   # Mediterranean
-    (10.0, 35.0),   # North Africa coast
-    (-10.0, 35.0)   # Back to start
-]
-
-def point_in_polygon(point, polygon):
+from europe import are_in_europe, classify_country
+from geojson_stream import FeatureCollectionWriter
+from polygon_engine import BATCH_SIZE
+
+# Bytes read at a time when scanning for shard boundaries
+SCAN_BLOCK_SIZE = 1 << 20
+# Upper bound on the size of one shard handed to a worker
+MAX_SHARD_SIZE = 16 << 20
+
+# Columns of the geonames CSV that the extractor reads
+CSV_COLUMNS = ('Name', 'Alternate Names', 'Country Code', 'Country name EN', 'Population', 'Coordinates')
+
+def parse_coordinates(coord_str):
+    """Parse coordinates from string format."""
+    if coord_str:
+        lat_str, comma, lon_str = coord_str.partition(',')
+        if comma and ',' not in lon_str:
+            try:
+                # float() ignores surrounding whitespace itself
+                return float(lon_str), float(lat_str)  # GeoJSON uses [longitude, latitude] order
+            except ValueError:
+                pass
+    return None, None
+
+def resolve_columns(fieldnames):
+    """
+    Look up the index of every column we use once, from the CSV header.
+    
+    Returns:
+        dict: Column name -> index, or None for columns missing from the header
     """
-    Determine if a point is inside a polygon using the ray casting algorithm.
+    return {name: fieldnames.index(name) if name in fieldnames else None for name in CSV_COLUMNS}
+
+def row_to_feature(row, columns, lon, lat):
+    """Build a GeoJSON Point feature from a geonames CSV row."""
+    def field(name, default=''):
+        index = columns[name]
+        return default if index is None else row[index]
+    
+    # Extract the fields we want
+    name = field('Name')
+    country_name = field('Country name EN')
+    alternate_names = field('Alternate Names')
+    population = field('Population', '0') or '0'
+    country_code = field('Country Code')
+    
+    # Create a GeoJSON feature
+    return {
+        'type': 'Feature',
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [lon, lat]
+        },
+        'properties': {
+            'name': name,
+            'country_name': country_name,
+            'alternate_names': alternate_names,
+            'population': int(population) if population.isdigit() else 0,
+            'country_code': country_code
+        }
+    }
+
+def european_features_from_rows(rows, columns, border=None):
+    """
+    Filter a batch of CSV rows down to European cities.
+    
+    Rows are plain lists from csv.reader. Rows are first classified by country
+    name and code; rows from countries outside Europe are dropped, and the
+    remaining ones are tested against the Europe polygon together in one
+    batched pass. Only accepted rows are turned into feature dicts, so a
+    rejected row costs little more than the two field lookups.
     
     Args:
-        point: A tuple of (longitude, latitude)
-        polygon: A list of (longitude, latitude) tuples forming a polygon
+        border: Prepared border from europe.load_boundary (default: the built-in outline)
+    
+    Returns:
+        list: GeoJSON features for the European rows, in input order
+    """
+    country_index = columns['Country name EN']
+    code_index = columns['Country Code']
+    coord_index = columns['Coordinates']
+    width = max((index for index in columns.values() if index is not None), default=-1) + 1
+    
+    accepted = []
+    candidates = []
+    lons = array('d')
+    lats = array('d')
+    
+    for i, row in enumerate(rows):
+        # Short rows are padded like csv.DictReader does
+        if len(row) < width:
+            row.extend([None] * (width - len(row)))
+        
+        # Check by country name and code; only unknown countries need the polygon
+        country_name = row[country_index] if country_index is not None else ''
+        country_code = row[code_index] if code_index is not None else ''
+        decision = classify_country(country_name, country_code)
+        if decision:
+            accepted.append(i)
+            continue
+        if decision is False:
+            continue
         
+        # If coordinates are available, queue the row for the polygon test
+        if coord_index is not None:
+            lon, lat = parse_coordinates(row[coord_index])
+            if lon is not None and lat is not None:
+                candidates.append(i)
+                lons.append(lon)
+                lats.append(lat)
+    
+    if candidates:
+        accepted.extend(i for i, is_inside in zip(candidates, are_in_europe(lons, lats, border)) if is_inside)
+        accepted.sort()
+    
+    features = []
+    for i in accepted:
+        row = rows[i]
+        lon, lat = parse_coordinates(row[coord_index]) if coord_index is not None else (None, None)
+        features.append(row_to_feature(row, columns, lon, lat))
+    return features
+
+def iter_european_batches(reader, columns, border=None):
+    """
+    Read a csv.reader in batches and filter each batch.
+    
+    Args:
+        border: Prepared border from europe.load_boundary (default: the built-in outline)
+    
+    Yields:
+        tuple: (number of rows read, list of European features) per batch
+    """
+    # Test rows against the polygon in batches rather than one at a time
+    while True:
+        rows = list(islice(reader, BATCH_SIZE))
+        if not rows:
+            break
+        # Blank lines are skipped, as csv.DictReader does
+        rows = [row for row in rows if row]
+        yield len(rows), european_features_from_rows(rows, columns, border)
+
+def find_record_boundaries(input_file, targets):
+    """
+    Find safe places to split the CSV file.
+    
+    For each target byte offset, returns the offset just past the first newline
+    at or after it that ends a record. A newline only ends a record when it is
+    preceded by an even number of quote characters, so newlines embedded in
+    quoted fields (e.g. in 'Alternate Names') are never used as split points.
+    Doubled quotes inside quoted fields keep the count even, so they do not
+    need special handling. A stray quote inside an unquoted field, which
+    csv accepts as text, throws the count off; process_shard detects the
+    resulting bad split and the rest of the file is then parsed serially.
+    
+    Args:
+        input_file: Path of the CSV file
+        targets: Byte offsets in ascending order
+    
     Returns:
-        bool: True if the point is inside the polygon, False otherwise
+        list: One offset per target (the file size if no newline follows it)
     """
-    x, y = point
-    n = len(polygon)
-    inside = False
-    
-    p1x, p1y = polygon[0]
-    for i in range(1, n + 1):
-        p2x, p2y = polygon[i % n]
-        if y > min(p1y, p2y):
-            if y <= max(p1y, p2y):
-                if x <= max(p1x, p2x):
-                    if p1y != p2y:
-                        xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                    if p1x == p2x or x <= xinters:
-                        inside = not inside
-        p1x, p1y = p2x, p2y
-    
-    return inside
-
-def is_in_europe(lon, lat):
-    """Check if a point is in Europe using the polygon."""
-    try:
-        lon_val = float(lon)
-        lat_val = float(lat)
-        return point_in_polygon((lon_val, lat_val), europe_polygon)
-    except (TypeError, ValueError):
-        return False
+    boundaries = []
+    file_size = os.path.getsize(input_file)
+    
+    with open(input_file, 'rb') as f:
+        block = f.read(SCAN_BLOCK_SIZE)
+        base = 0
+        quotes_before_block = 0
+        
+        for target in targets:
+            pos = max(target - base, 0)
+            found = None
+            
+            while found is None and block:
+                if pos >= len(block):
+                    # Move on to the next block
+                    quotes_before_block += block.count(b'"')
+                    pos -= len(block)
+                    base += len(block)
+                    block = f.read(SCAN_BLOCK_SIZE)
+                    continue
+                
+                newline = block.find(b'\n', pos)
+                if newline == -1:
+                    pos = len(block)
+                elif (quotes_before_block + block.count(b'"', 0, newline)) % 2 == 0:
+                    found = base + newline + 1
+                else:
+                    pos = newline + 1
+            
+            boundaries.append(file_size if found is None else found)
+    
+    return boundaries
 
-def is_european_country(country_name):
-    """Check if a country name is in the list of European countries."""
-    return country_name in european_countries
+def plan_shards(input_file, workers):
+    """
+    Split the CSV file into byte ranges that each hold whole records.
+    
+    Returns:
+        tuple: (header field names, list of (start, end) byte ranges in file order)
+    """
+    header_end = find_record_boundaries(input_file, [0])[0]
+    with open(input_file, 'rb') as f:
+        header = f.read(header_end)
+    text = io.TextIOWrapper(io.BytesIO(header), encoding='utf-8')
+    fieldnames = next(csv.reader(text, delimiter=';'), [])
+    
+    # Use more shards than workers to keep them all busy and memory per shard bounded
+    data_size = os.path.getsize(input_file) - header_end
+    shard_count = max(workers, -(-data_size // MAX_SHARD_SIZE))
+    step = max(1, data_size // shard_count)
+    targets = [header_end + i * step for i in range(1, shard_count)]
+    
+    edges = [header_end] + find_record_boundaries(input_file, targets) + [header_end + data_size]
+    shards = [(start, end) for start, end in zip(edges, edges[1:]) if end > start]
+    return fieldnames, shards
 
-def parse_coordinates(coord_str):
-    """Parse coordinates from string format."""
+def process_shard(task):
+    """
+    Parse and filter one byte range of the CSV file in a worker process.
+    
+    The range is parsed in strict mode, so a range that ends inside a quoted
+    field, because its end was not a record end after all, raises instead of
+    swallowing the start of the next range.
+    
+    Returns:
+        tuple: (number of rows read, list of European features), or None when
+        the range does not end at a record end
+    """
+    input_file, fieldnames, start, end = task
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    
+    # Decode the same way as the serial reader, including newline translation
+    text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')
+    reader = csv.reader(text, delimiter=';', strict=True)
+    
+    row_count = 0
+    features = []
     try:
-        if coord_str:
-            parts = coord_str.split(',')
-            if len(parts) == 2:
-                lat = float(parts[0].strip())
-                lon = float(parts[1].strip())
-                return lon, lat  # GeoJSON uses [longitude, latitude] order
-    except (ValueError, TypeError):
-        pass
-    return None, None
+        for batch_rows, batch_features in iter_european_batches(reader, resolve_columns(fieldnames)):
+            row_count += batch_rows
+            features.extend(batch_features)
+    except csv.Error:
+        return None
+    return row_count, features
+
+def iter_european_batches_from(input_file, fieldnames, start):
+    """Serially parse and filter the CSV file from a record boundary to its end."""
+    with open(input_file, 'rb') as f:
+        f.seek(start)
+        reader = csv.reader(io.TextIOWrapper(f, encoding='utf-8'), delimiter=';')
+        yield from iter_european_batches(reader, resolve_columns(fieldnames))
+
+def iter_european_results(input_file, workers):
+    """
+    Yield (rows read, European features) in file order, serially or from a
+    process pool over newline-aligned shards.
+    """
+    if workers <= 1:
+        with open(input_file, 'r', encoding='utf-8') as csvfile:
+            # CSV file uses semicolon as delimiter
+            reader = csv.reader(csvfile, delimiter=';')
+            fieldnames = next(reader, [])
+            yield from iter_european_batches(reader, resolve_columns(fieldnames))
+        return
+    
+    fieldnames, shards = plan_shards(input_file, workers)
+    print(f"Split {input_file} into {len(shards)} shards for {workers} workers...")
+    tasks = [(input_file, fieldnames, start, end) for start, end in shards]
+    with multiprocessing.Pool(workers) as pool:
+        # imap returns results in task order, so the output matches the serial run
+        for (start, _), result in zip(shards, pool.imap(process_shard, tasks)):
+            if result is None:
+                # Every earlier shard ended at a record end, so this one starts
+                # at one; only the splits from here on are in doubt
+                print(f"Shard at byte {start} does not end at a record end, parsing the rest serially...")
+                break
+            yield result
+        else:
+            return
+    yield from iter_european_batches_from(input_file, fieldnames, start)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract European cities from the geonames CSV export.")
+    parser.add_argument('--input', default='geonames-all-cities-with-a-population-1000@public.csv',
+                        help="Semicolon-separated geonames CSV")
+    parser.add_argument('--output', default='european_cities.geojson',
+                        help="Output FeatureCollection")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of worker processes (1 processes the file serially)")
+    return parser.parse_args()
 
 def main():
-    input_file = 'geonames-all-cities-with-a-population-1000@public.csv'
-    output_file = 'european_cities.geojson'
+    args = parse_args()
+    input_file = args.input
+    output_file = args.output
     
     if not os.path.exists(input_file):
         print(f"Error: Input file '{input_file}' not found.")
@@ -101,81 +313,22 @@ def main():
     
     print(f"Processing {input_file}...")
     
-    # Create a list to store European city features
-    european_features = []
+    row_count = 0
+    european_count = 0
     
-    # Process the CSV file
-    with open(input_file, 'r', encoding='utf-8') as csvfile:
-        # CSV file uses semicolon as delimiter
-        reader = csv.DictReader(csvfile, delimiter=';')
-        
-        row_count = 0
-        european_count = 0
-        
-        for row in reader:
-            row_count += 1
-            
-            # Extract coordinates
-            lon, lat = parse_coordinates(row.get('Coordinates', ''))
+    # Stream features to the output as they are produced instead of collecting them
+    with open(output_file, 'w', encoding='utf-8') as f, FeatureCollectionWriter(f, ensure_ascii=False) as writer:
+        for batch_rows, batch_features in iter_european_results(input_file, args.workers):
+            row_count += batch_rows
             
-            # Check if the city is in Europe
-            is_european = False
-            
-            # Check by country name
-            country_name = row.get('Country name EN', '')
-            if country_name and is_european_country(country_name):
-                is_european = True
-            
-            # If coordinates are available and not already determined to be European,
-            # check by coordinates
-            if not is_european and lon is not None and lat is not None:
-                if is_in_europe(lon, lat):
-                    is_european = True
-            
-            # If the city is in Europe, create a GeoJSON feature
-            if is_european:
+            for feature in batch_features:
+                writer.write(feature)
                 european_count += 1
                 
-                # Extract the fields we want
-                name = row.get('Name', '')
-                country_name = row.get('Country name EN', '')
-                alternate_names = row.get('Alternate Names', '')
-                population = row.get('Population', '0')
-                country_code = row.get('Country Code', '')
-                
-                # Create a GeoJSON feature
-                feature = {
-                    'type': 'Feature',
-                    'geometry': {
-                        'type': 'Point',
-                        'coordinates': [lon, lat]
-                    },
-                    'properties': {
-                        'name': name,
-                        'country_name': country_name,
-                        'alternate_names': alternate_names,
-                        'population': int(population) if population.isdigit() else 0,
-                        'country_code': country_code
-                    }
-                }
-                
-                european_features.append(feature)
-                
                 # Print progress every 1000 features
                 if european_count % 1000 == 0:
                     print(f"Processed {row_count} rows, found {european_count} European cities so far...")
     
-    # Create the GeoJSON structure
-    geojson = {
-        'type': 'FeatureCollection',
-        'features': european_features
-    }
-    
-    # Save the GeoJSON file
-    print(f"Saving {european_count} European cities to {output_file}...")
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(geojson, f, ensure_ascii=False, indent=2)
-    
     print(f"Done! Processed {row_count} rows and saved {european_count} European cities to {output_file}")
 
 if __name__ == "__main__":
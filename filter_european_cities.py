@@ -1,18 +1,11 @@
 #!/usr/bin/env python3
-import json
+import argparse
 import sys
 
-# Define European countries
-european_countries = {
-    'Albania', 'Andorra', 'Austria', 'Belarus', 'Belgium', 'Bosnia and Herzegovina',
-    'Bulgaria', 'Croatia', 'Cyprus', 'Czech Republic', 'Denmark', 'Estonia',
-    'Finland', 'France', 'Germany', 'Greece', 'Hungary', 'Iceland', 'Ireland',
-    'Italy', 'Kosovo', 'Latvia', 'Liechtenstein', 'Lithuania', 'Luxembourg',
-    'Malta', 'Moldova', 'Monaco', 'Montenegro', 'Netherlands', 'North Macedonia',
-    'Norway', 'Poland', 'Portugal', 'Romania', 'Russia', 'San Marino', 'Serbia',
-    'Slovakia', 'Slovenia', 'Spain', 'Sweden', 'Switzerland', 'Ukraine',
-    'United Kingdom', 'Vatican City'
-}
+import json_codec
+from europe import are_in_europe, load_boundary
+from geojson_stream import FeatureCollectionWriter
+from polygon_engine import BATCH_SIZE, REPRESENTATIVE_METHODS, representative_cache, to_float_array
 
 # Define European cities by name (based on the sample we've seen)
 european_city_names = {
@@ -21,116 +14,79 @@ european_city_names = {
     'KROKVIK', 'VITTANGI'
 }
 
-# Define Europe's borders as a polygon (longitude, latitude pairs)
-# This is a simplified polygon of Europe's borders
-europe_polygon = [
-    # Western Europe (Atlantic)
-    (-10.0, 35.0),  # Southwest corner
-    (-10.0, 60.0),  # Northwest corner
-    # Northern Europe
-    (-5.0, 65.0),   # Iceland area
-    (0.0, 70.0),    # Northern Norway
-    (30.0, 72.0),   # Northern Russia
-    # Eastern Europe
-    (40.0, 65.0),   # Eastern Russia
-    (40.0, 45.0),   # Black Sea area
-    # Southern Europe
-    (35.0, 35.0),   # Turkey/Cyprus
-    (25.0, 35.0),   # Mediterranean
-    (10.0, 35.0),   # North Africa coast
-    (-10.0, 35.0)   # Back to start
-]
-
-def point_in_polygon(point, polygon):
+def european_flags(features, method='centroid', border=None):
     """
-    Determine if a point is inside a polygon using the ray casting algorithm.
-    
+    Decide for each feature whether it lies in Europe.
+
+    Known European city names decide first. Every other feature is located
+    by its representative point (a polygon's centroid or pole of
+    inaccessibility, the largest polygon's for MultiPolygons), and the points
+    are tested against the Europe polygon in batches. Polygon points come
+    from the shared representative_cache, so filtering the same features
+    again does not locate them again. Malformed features and geometries are
+    not located and count as outside Europe.
+
     Args:
-        point: A tuple of (longitude, latitude)
-        polygon: A list of (longitude, latitude) tuples forming a polygon
-        
+        features: List of GeoJSON Feature dicts
+        method: One of REPRESENTATIVE_METHODS
+        border: Prepared border from load_boundary (default: the built-in outline)
+
     Returns:
-        bool: True if the point is inside the polygon, False otherwise
+        list: One bool per feature
     """
-    x, y = point
-    n = len(polygon)
-    inside = False
-    
-    p1x, p1y = polygon[0]
-    for i in range(1, n + 1):
-        p2x, p2y = polygon[i % n]
-        if y > min(p1y, p2y):
-            if y <= max(p1y, p2y):
-                if x <= max(p1x, p2x):
-                    if p1y != p2y:
-                        xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                    if p1x == p2x or x <= xinters:
-                        inside = not inside
-        p1x, p1y = p2x, p2y
+    flags = [False] * len(features)
+    candidates = []
+    geometries = [None] * len(features)
+    for i, feature in enumerate(features):
+        if not isinstance(feature, dict):
+            continue
+        properties = feature.get('properties')
+        # Check if the city is in Europe by name
+        if isinstance(properties, dict) and properties.get('NAME') in european_city_names:
+            flags[i] = True
+        else:
+            geometries[i] = feature.get('geometry')
+            candidates.append(i)
     
-    return inside
-
-def is_in_europe(lon, lat):
-    """Check if a point is in Europe using the polygon."""
-    try:
-        lon_val = float(lon)
-        lat_val = float(lat)
-        return point_in_polygon((lon_val, lat_val), europe_polygon)
-    except (TypeError, ValueError):
-        return False
+    cache = representative_cache(method)
+    for start in range(0, len(candidates), BATCH_SIZE):
+        batch = candidates[start:start + BATCH_SIZE]
+        points = cache.get_many([geometries[i] for i in batch])
+        located = [(i, point) for i, point in zip(batch, points) if point is not None]
+        inside = are_in_europe(to_float_array(point[0] for _, point in located),
+                               to_float_array(point[1] for _, point in located), border)
+        for (i, _), is_inside in zip(located, inside):
+            flags[i] = is_inside
+    return flags
 
 def main():
+    parser = argparse.ArgumentParser(description="Filter cities.geojson down to the cities in Europe.")
+    parser.add_argument('--point', choices=REPRESENTATIVE_METHODS, default='centroid',
+                        help="Point polygons are located by (default: %(default)s)")
+    parser.add_argument('--boundary', help="GeoJSON file with a detailed Europe border to test against")
+    args = parser.parse_args()
+    
+    border = None
+    if args.boundary:
+        print(f"Preparing the Europe border from {args.boundary}...")
+        border = load_boundary(args.boundary)
+    
     print("Loading cities.geojson file...")
     try:
         with open('cities.geojson', 'r') as f:
-            data = json.load(f)
+            data = json_codec.load(f)
         
         print(f"Loaded GeoJSON with {len(data['features'])} cities.")
         
-        european_features = []
-        for i, feature in enumerate(data['features']):
-            try:
-                # Check if the city name is in our list of European cities
-                city_name = None
-                if 'properties' in feature and feature['properties']:
-                    city_name = feature['properties'].get('NAME')
-                
-                # Check if the city is in Europe by name
-                if city_name and city_name in european_city_names:
-                    european_features.append(feature)
-                    continue
-                
-                # Check if the city is in Europe by coordinates
-                if 'geometry' in feature and feature['geometry']:
-                    geom_type = feature['geometry'].get('type', '').lower()
-                    coords = feature['geometry'].get('coordinates', [])
-                    
-                    # For Point geometries (city centers)
-                    if geom_type == 'point' and coords and len(coords) == 2:
-                        lon, lat = coords
-                        if is_in_europe(lon, lat):
-                            european_features.append(feature)
-                    
-                    # For Polygon geometries, just use the first coordinate as an approximation
-                    elif geom_type == 'polygon' and coords and coords[0]:
-                        # Just take the first point as a simple approximation
-                        lon, lat = coords[0][0]
-                        if is_in_europe(lon, lat):
-                            european_features.append(feature)
-            except Exception as e:
-                print(f"Error processing feature {i}: {e}")
-                continue
+        features = data['features']
+        flags = european_flags(features, args.point, border)
         
-        # Create new GeoJSON with only European cities
-        european_data = {
-            'type': 'FeatureCollection',
-            'features': european_features
-        }
+        european_features = (feature for feature, flag in zip(features, flags) if flag)
         
         # Save the filtered data
-        print(f"Saving {len(european_features)} European cities to european_cities.geojson...")
-        with open('european_cities.geojson', 'w') as f:
-            json.dump(european_data, f)
+        print(f"Saving {sum(flags)} European cities to european_cities.geojson...")
+        with open('european_cities.geojson', 'w') as f, FeatureCollectionWriter(f) as writer:
+            writer.write_all(european_features)
         
         print("Done! European cities have been saved to european_cities.geojson")
         
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+import re
+
+import json_codec
+
+# Size of each read from the input file (bytes)
+CHUNK_SIZE = 1 << 20
+
+# Structural characters we care about outside of strings
+STRUCTURAL_RE = re.compile(rb'[{}\[\]"]')
+# Characters that end or escape a run inside a string
+STRING_RE = re.compile(rb'["\\]')
+
+def iter_feature_spans(f, start_offset=None, chunk_size=CHUNK_SIZE):
+    """
+    Incrementally parse a GeoJSON FeatureCollection, one Feature at a time.
+
+    The file is scanned exactly once and only the bytes of the feature
+    currently being read are kept in memory, so this works for files of any
+    size. Layout does not matter: pretty-printed, one feature per line and
+    minified input are all handled the same way.
+
+    Args:
+        f: A file object opened in binary mode ('rb')
+        start_offset: Byte offset just after a previously yielded feature.
+            When given, the file is seeked there and parsing resumes inside
+            the "features" array.
+        chunk_size: Number of bytes to read at a time
+
+    Yields:
+        tuple: (feature, end_offset) where feature is the decoded dict and
+        end_offset is the byte offset just past its closing brace
+    """
+    if start_offset is None:
+        base = 0
+        stack = []
+        in_features = False
+    else:
+        f.seek(start_offset)
+        base = start_offset
+        stack = [b'{', b'[']
+        in_features = True
+
+    buf = bytearray()
+    pos = 0
+    eof = False
+    in_string = False
+    string_start = 0
+    last_string = None
+    feature_start = None
+
+    while True:
+        if in_string:
+            match = STRING_RE.search(buf, pos)
+        else:
+            match = STRUCTURAL_RE.search(buf, pos)
+
+        # An escape needs the following byte to be in the buffer as well
+        if match is None or (in_string and match.group() == b'\\' and match.end() >= len(buf)):
+            if eof:
+                break
+            pos = len(buf) if match is None else match.start()
+            # Drop everything we no longer need before reading more
+            keep = pos
+            if feature_start is not None:
+                keep = feature_start
+            elif in_string:
+                keep = string_start
+            if keep:
+                del buf[:keep]
+                base += keep
+                pos -= keep
+                string_start -= keep
+                if feature_start is not None:
+                    feature_start -= keep
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            else:
+                buf += chunk
+            continue
+
+        char = match.group()
+        pos = match.end()
+
+        if in_string:
+            if char == b'\\':
+                pos += 1  # Skip the escaped character
+            else:
+                in_string = False
+                if len(stack) == 1:
+                    last_string = bytes(buf[string_start:pos - 1])
+            continue
+
+        if char == b'"':
+            in_string = True
+            string_start = pos
+        elif char == b'{':
+            if in_features and len(stack) == 2:
+                feature_start = pos - 1
+            stack.append(char)
+        elif char == b'[':
+            if len(stack) == 1 and last_string == b'features':
+                in_features = True
+            stack.append(char)
+        else:
+            if not stack:
+                raise ValueError(f"Unbalanced '{char.decode()}' at byte {base + pos - 1}")
+            stack.pop()
+            if in_features and len(stack) == 2 and feature_start is not None:
+                feature = json_codec.loads(bytes(buf[feature_start:pos]))
+                feature_start = None
+                yield feature, base + pos
+            elif in_features and len(stack) == 1:
+                # End of the "features" array
+                in_features = False
+                last_string = None
+
+    # An open object or array means the file ended inside the collection,
+    # e.g. a partly downloaded dump cut off between two features
+    if feature_start is not None or in_string or stack:
+        raise ValueError(f"Truncated GeoJSON: unexpected end of file at byte {base + len(buf)}")
+
+def iter_features(f, chunk_size=CHUNK_SIZE):
+    """Yield each Feature dict of a FeatureCollection file opened in binary mode."""
+    for feature, _ in iter_feature_spans(f, chunk_size=chunk_size):
+        yield feature
+
+class FeatureCollectionWriter:
+    """
+    Write a GeoJSON FeatureCollection one feature at a time.
+
+    The header is written on entry and each feature is serialized as soon as it
+    is passed to write(), so memory use does not grow with the number of
+    features. The collection is closed on exit, also when an error interrupts
+    the run, so whatever was written is still valid GeoJSON.
+
+    The output is byte-for-byte what json.dump would write for the whole
+    collection with the same options (compact=True matches
+    separators=(',', ':')). Features go through json_codec, so both layouts
+    are serialized by the fastest installed JSON backend, which may spell a
+    few floats differently (see json_codec.dumps).
+
+    Usage:
+        with open(path, 'w') as f, FeatureCollectionWriter(f) as writer:
+            for feature in features:
+                writer.write(feature)
+    """
+
+    def __init__(self, f, ensure_ascii=True, compact=False, members=None):
+        """
+        Args:
+            f: A file object opened in text mode for writing
+            ensure_ascii: Passed on to json_codec.dumps for every feature
+            compact: Leave out the spaces after ',' and ':'
+            members: Optional dict of extra top-level members (e.g. a
+                "transform"), written between "type" and "features"
+        """
+        self.f = f
+        self.ensure_ascii = ensure_ascii
+        self.separators = (',', ':') if compact else (', ', ': ')
+        self.members = members or {}
+        self.count = 0
+        self.closed = False
+
+    def _dumps(self, value):
+        return json_codec.dumps(value, ensure_ascii=self.ensure_ascii, separators=self.separators)
+
+    def __enter__(self):
+        item, key = self.separators
+        header = '{' + self._dumps('type') + key + self._dumps('FeatureCollection')
+        for name, value in self.members.items():
+            header += item + self._dumps(name) + key + self._dumps(value)
+        self.f.write(header + item + self._dumps('features') + key + '[')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def write(self, feature):
+        """Serialize one feature and append it to the collection."""
+        if self.count:
+            self.f.write(self.separators[0])
+        self.f.write(self._dumps(feature))
+        self.count += 1
+
+    def write_all(self, features):
+        """Write every feature from an iterable."""
+        for feature in features:
+            self.write(feature)
+
+    def close(self):
+        """Terminate the features array and the collection."""
+        if not self.closed:
+            self.f.write(']}')
+            self.closed = True
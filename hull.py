@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+import math
+from collections import defaultdict
+
+from polygon_engine import CompiledPolygon
+from spatial_index import segments_intersect
+
+# Default number of nearest neighbours considered by concave_hull
+CONCAVE_K = 8
+
+# Average number of points per grid cell when thinning the input of concave_hull
+THIN_CELL_POINTS = 8
+# Cells within this many cells of an empty one are kept as the rim
+RIM_CELLS = 2
+
+def _cross(o, a, b):
+    """Z component of (a - o) x (b - o); positive for a counter-clockwise turn."""
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+def convex_hull(points):
+    """
+    Compute the convex hull with Andrew's monotone chain algorithm in O(n log n).
+
+    Args:
+        points: Iterable of [longitude, latitude] pairs
+
+    Returns:
+        list: Closed counter-clockwise ring of [longitude, latitude] pairs, or
+        None if the points do not span an area (fewer than 3 distinct points
+        or all collinear)
+    """
+    pts = sorted(set((p[0], p[1]) for p in points))
+    if len(pts) < 3:
+        return None
+
+    lower = []
+    for p in pts:
+        while len(lower) >= 2 and _cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+
+    upper = []
+    for p in reversed(pts):
+        while len(upper) >= 2 and _cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+
+    hull = lower[:-1] + upper[:-1]
+    if len(hull) < 3:
+        return None
+    return [list(p) for p in hull] + [list(hull[0])]
+
+class _PointGrid:
+    """Uniform grid over a point set for k-nearest-neighbour lookups with removal."""
+
+    def __init__(self, points):
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        self.min_x, self.min_y = min(xs), min(ys)
+        span = max(max(xs) - self.min_x, max(ys) - self.min_y) or 1.0
+        # Aim for a few points per cell
+        self.cell = span / max(1, int(math.sqrt(len(points) / 2)))
+        self.max_ring = int(span / self.cell) + 2
+        self.cells = defaultdict(set)
+        for p in points:
+            self.cells[self._key(p)].add(p)
+
+    def _key(self, p):
+        return int((p[0] - self.min_x) / self.cell), int((p[1] - self.min_y) / self.cell)
+
+    def add(self, p):
+        self.cells[self._key(p)].add(p)
+
+    def remove(self, p):
+        self.cells[self._key(p)].discard(p)
+
+    def nearest(self, p, k):
+        """The k points closest to p, searching outward ring by ring of cells."""
+        cx, cy = self._key(p)
+        found = []
+        for ring in range(self.max_ring + 1):
+            for x in range(cx - ring, cx + ring + 1):
+                for y in range(cy - ring, cy + ring + 1):
+                    if max(abs(x - cx), abs(y - cy)) != ring:
+                        continue
+                    for q in self.cells.get((x, y), ()):
+                        found.append(((q[0] - p[0]) ** 2 + (q[1] - p[1]) ** 2, q))
+            # Any point beyond this ring is at least ring * cell away
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= (ring * self.cell) ** 2:
+                    break
+        found.sort()
+        return [q for _, q in found[:k]]
+
+def _rim_points(points):
+    """
+    Points in grid cells on the rim of the point cloud.
+
+    The points are bucketed into cells holding THIN_CELL_POINTS on average.
+    A cell with no empty cell within RIM_CELLS cells of it lies inside the
+    cloud, away from any boundary the k-NN walk follows, so its points are
+    dropped; the walk then only searches among the points near an edge.
+    """
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    min_x, min_y = min(xs), min(ys)
+    span = max(max(xs) - min_x, max(ys) - min_y) or 1.0
+    cell = span / max(1, int(math.sqrt(len(points) / THIN_CELL_POINTS)))
+    cells = defaultdict(list)
+    for p in points:
+        cells[int((p[0] - min_x) / cell), int((p[1] - min_y) / cell)].append(p)
+    rim = []
+    reach = range(-RIM_CELLS, RIM_CELLS + 1)
+    for (cx, cy), members in cells.items():
+        if any((cx + dx, cy + dy) not in cells for dx in reach for dy in reach):
+            rim.extend(members)
+    return rim
+
+def _knn_walk(points, k):
+    """
+    One attempt of the k-nearest-neighbours concave hull (Moreira & Santos, 2007).
+
+    Walks the boundary counter-clockwise from the lowest point, at each step
+    taking the neighbour that makes the sharpest right turn without crossing
+    the hull built so far.
+
+    Returns:
+        list: Open ring of points, or None if the walk got stuck
+    """
+    first = min(points, key=lambda p: (p[1], p[0]))
+    grid = _PointGrid(points)
+    grid.remove(first)
+    hull = [first]
+    edges = []  # (min_x, min_y, max_x, max_y, a, b) for each hull edge so far
+    current = first
+    heading = 0.0  # Arriving at the lowest point heading east
+
+    while True:
+        if len(hull) == 4:
+            # Allow the walk to close once it has left the start
+            grid.add(first)
+
+        candidates = grid.nearest(current, k)
+        if not candidates:
+            return None
+
+        def turn(q):
+            # Counter-clockwise turn from the current heading, in [-pi, pi);
+            # going straight back is treated as the widest left turn
+            angle = (math.atan2(q[1] - current[1], q[0] - current[0]) - heading + math.pi) % (2 * math.pi) - math.pi
+            return math.pi if angle <= -math.pi else angle
+
+        chosen = None
+        for q in sorted(candidates, key=turn):
+            closing = q == first
+            min_x, max_x = min(current[0], q[0]), max(current[0], q[0])
+            min_y, max_y = min(current[1], q[1]), max(current[1], q[1])
+            # The new edge must not cross any earlier, non-adjacent edge
+            crosses = False
+            for i in range(1 if closing else 0, len(edges) - 1):
+                e_min_x, e_min_y, e_max_x, e_max_y, a, b = edges[i]
+                if e_min_x > max_x or e_max_x < min_x or e_min_y > max_y or e_max_y < min_y:
+                    continue
+                if segments_intersect(current[0], current[1], q[0], q[1], a[0], a[1], b[0], b[1]):
+                    crosses = True
+                    break
+            if not crosses:
+                chosen = q
+                break
+
+        if chosen is None:
+            return None
+        if chosen == first:
+            return hull
+
+        heading = math.atan2(chosen[1] - current[1], chosen[0] - current[0])
+        edges.append((min(current[0], chosen[0]), min(current[1], chosen[1]),
+                      max(current[0], chosen[0]), max(current[1], chosen[1]), current, chosen))
+        hull.append(chosen)
+        grid.remove(chosen)
+        current = chosen
+
+def concave_hull(points, k=CONCAVE_K):
+    """
+    Compute a concave hull with the k-nearest-neighbours algorithm.
+
+    Smaller k follows the point cloud more tightly; k is raised automatically
+    until the walk succeeds and encloses every point. If k reaches the number
+    of points, the convex hull is returned instead.
+
+    The walk only runs over the points on the rim of the cloud (see
+    _rim_points), and the interior points are only tested for enclosure once
+    a hull encloses the rim. Without NumPy a region of 20-40k cities takes
+    0.15-1 s, 2-9 times the convex hull. Point sets the walk cannot bridge,
+    such as far-apart clusters, raise k until the convex fallback, about 2 s
+    for 17k points; pass such sets to convex_hull directly.
+
+    Args:
+        points: Iterable of [longitude, latitude] pairs
+        k: Initial number of neighbours considered at each step (at least 3)
+
+    Returns:
+        list: Closed counter-clockwise ring of [longitude, latitude] pairs, or
+        None if the points do not span an area
+    """
+    pts = list(set((p[0], p[1]) for p in points))
+    if len(pts) < 3:
+        return None
+
+    rim = _rim_points(pts)
+    rim_set = set(rim)
+    interior = [p for p in pts if p not in rim_set]
+
+    def encloses(polygon, rest):
+        return all(polygon.contains_many([p[0] for p in rest], [p[1] for p in rest]))
+
+    k = max(3, k)
+    while k < len(rim):
+        ring = _knn_walk(rim, k)
+        if ring is not None and len(ring) >= 3:
+            polygon = CompiledPolygon(ring + [ring[0]])
+            on_boundary = set(ring)
+            if encloses(polygon, [p for p in rim if p not in on_boundary]) and encloses(polygon, interior):
+                return [list(p) for p in ring] + [list(ring[0])]
+        k = max(k + 1, int(k * 1.5))
+
+    return convex_hull(pts)
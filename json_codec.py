@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+import argparse
+import gc
+import json
+import math
+import os
+import re
+import sys
+import time
+
+# Optional faster JSON libraries; whichever are installed are used, and the
+# standard library covers everything they lack
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# Separators of the two layouts the fast serializers produce
+COMPACT_SEPARATORS = (',', ':')
+INDENT_SEPARATORS = (',', ': ')
+# json.dumps' default single-line layout, derived from the compact one
+SPACED_SEPARATORS = (', ', ': ')
+
+# Non-ASCII characters, escaped after fast serialization when ensure_ascii is set
+NON_ASCII_RE = re.compile('[^\x00-\x7f]')
+
+def _json_dumps(value, indent):
+    separators = INDENT_SEPARATORS if indent else COMPACT_SEPARATORS
+    return json.dumps(value, ensure_ascii=False, indent=indent, separators=separators)
+
+def _has_non_finite(value):
+    """Check whether a value holds a NaN or infinite float anywhere."""
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_has_non_finite(item) for item in value)
+    return False
+
+def _orjson_dumps(value, indent):
+    text = orjson.dumps(value, option=orjson.OPT_INDENT_2 if indent else 0).decode('utf-8')
+    # orjson writes NaN and infinities as null; only then is the value walked
+    if 'null' in text and _has_non_finite(value):
+        raise ValueError("Out of range float values are written as null by orjson")
+    return text
+
+def _ujson_dumps(value, indent):
+    if indent:
+        # ujson lays out indented output differently from json.dumps
+        return _json_dumps(value, indent)
+    return ujson.dumps(value, ensure_ascii=False, escape_forward_slashes=False)
+
+# Backend name -> loads(str or bytes), fastest first
+PARSERS = {}
+# Backend name -> dumps(value, indent) returning what json.dumps gives with
+# ensure_ascii=False and compact (indent None) or 2-space indented layout
+SERIALIZERS = {}
+if orjson is not None:
+    PARSERS['orjson'] = orjson.loads
+    SERIALIZERS['orjson'] = _orjson_dumps
+if simdjson is not None:
+    PARSERS['simdjson'] = simdjson.loads
+if ujson is not None:
+    PARSERS['ujson'] = ujson.loads
+    SERIALIZERS['ujson'] = _ujson_dumps
+PARSERS['json'] = json.loads
+SERIALIZERS['json'] = _json_dumps
+
+# Backends picked at import: the fastest one installed
+PARSER = next(iter(PARSERS))
+SERIALIZER = next(iter(SERIALIZERS))
+
+def _space_separators(text):
+    """
+    Turn compact JSON text into json.dumps' default (', ', ': ') layout.
+
+    Separators are only spaced outside strings, which are found by splitting
+    at quotes. Escaped backslashes and quotes are first swapped for control
+    characters, which JSON text never holds unescaped, and put back after.
+    """
+    escaped = '\\"' in text
+    if escaped:
+        text = text.replace('\\\\', '\x00').replace('\\"', '\x01')
+    parts = text.split('"')
+    strings = '"'.join(parts[1::2])
+    if ',' not in strings and ':' not in strings:
+        text = text.replace(',', ', ').replace(':', ': ')
+    else:
+        parts[::2] = [part.replace(',', ', ').replace(':', ': ') for part in parts[::2]]
+        text = '"'.join(parts)
+    if escaped:
+        text = text.replace('\x01', '\\"').replace('\x00', '\\\\')
+    return text
+
+def _escape_non_ascii(match):
+    """The \\uXXXX escape json.dumps writes for a character (a surrogate pair above U+FFFF)."""
+    code = ord(match.group())
+    if code < 0x10000:
+        return '\\u%04x' % code
+    code -= 0x10000
+    return '\\u%04x\\u%04x' % (0xd800 | (code >> 10), 0xdc00 | (code & 0x3ff))
+
+def loads(data):
+    """
+    Parse JSON text or bytes with the fastest installed backend.
+
+    Objects keep their key order. Input the backend rejects, such as the NaN
+    and Infinity literals json.dumps writes, is handed to the standard
+    library, which parses it or raises its usual json.JSONDecodeError.
+    """
+    try:
+        return PARSERS[PARSER](data)
+    except ValueError:
+        return json.loads(data)
+
+def load(f):
+    """Parse a JSON file opened in text or binary mode (see loads)."""
+    return loads(f.read())
+
+def dumps(value, ensure_ascii=True, indent=None, separators=None):
+    """
+    Serialize a value like json.dumps, with the fastest installed backend when it can.
+
+    The fast backends write the compact layout (separators (',', ':')),
+    json.dumps' default one (', ', ': ') and the 2-space indented one; other
+    layouts, and values a backend cannot encode (integers beyond 64 bits,
+    non-string keys, lone surrogates, NaN and infinities), go through the
+    standard library. Key order is kept, and with ensure_ascii non-ASCII
+    characters are escaped exactly as json.dumps escapes them. Some floats
+    are spelled differently with the same value (orjson writes 0.00001 and
+    1e-7 where json.dumps writes 1e-05 and 1e-07).
+
+    Args:
+        value: The value to serialize
+        ensure_ascii: Escape every non-ASCII character
+        indent: None for a single line, or the number of spaces to indent by
+        separators: (item separator, key separator) as in json.dumps
+
+    Returns:
+        str: The JSON text
+    """
+    spaced = indent is None and separators in (None, SPACED_SEPARATORS)
+    if indent is None:
+        fast_layout = spaced or separators == COMPACT_SEPARATORS
+    else:
+        fast_layout = indent == 2 and separators in (None, INDENT_SEPARATORS)
+    if fast_layout and SERIALIZER != 'json':
+        try:
+            text = SERIALIZERS[SERIALIZER](value, indent)
+        except (TypeError, ValueError, OverflowError):
+            text = None
+        if spaced and text is not None:
+            text = _space_separators(text)
+        if text is not None:
+            if ensure_ascii and not text.isascii():
+                text = NON_ASCII_RE.sub(_escape_non_ascii, text)
+            return text
+    return json.dumps(value, ensure_ascii=ensure_ascii, indent=indent, separators=separators)
+
+def dump(value, f, ensure_ascii=True, indent=None, separators=None):
+    """Serialize a value to a file opened in text mode (see dumps)."""
+    f.write(dumps(value, ensure_ascii=ensure_ascii, indent=indent, separators=separators))
+
+def _best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def _report(title, timings, expected, what):
+    """Print (seconds, result) per backend with the speedup over the standard library."""
+    print(f"\n{title}:")
+    baseline = timings['json'][0]
+    for name, (seconds, result) in timings.items():
+        note = '' if result == expected else f"  ({what} differs from json)"
+        print(f"  {name:<10} {seconds:8.3f} s  {baseline / seconds:5.1f}x{note}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the installed JSON backends on a GeoJSON file.")
+    parser.add_argument('input', nargs='?', default='european_cities.json',
+                        help="JSON file to parse and serialize (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement; the best is kept")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: Input file '{args.input}' not found.")
+        sys.exit(1)
+
+    with open(args.input, 'rb') as f:
+        data = f.read()
+    print(f"{args.input}: {len(data) / (1024 * 1024):.2f} MB")
+    print(f"Backends in use: parse with {PARSER}, serialize with {SERIALIZER}")
+
+    reference = json.loads(data)
+    _report("Parse", {name: _best_time(lambda: parse(data), args.repeat) for name, parse in PARSERS.items()},
+            reference, "result")
+    for label, indent in (("compact", None), ("indent=2", 2)):
+        timings = {name: _best_time(lambda: serialize(reference, indent), args.repeat)
+                   for name, serialize in SERIALIZERS.items()}
+        _report(f"Serialize ({label}, ensure_ascii=False)", timings, timings['json'][1], "output")
+    if SERIALIZER != 'json':
+        # The default layout goes through dumps, which spaces the compact output
+        timings = {'json': _best_time(lambda: json.dumps(reference, ensure_ascii=False), args.repeat),
+                   SERIALIZER: _best_time(lambda: dumps(reference, ensure_ascii=False), args.repeat)}
+        _report("Serialize (default separators, ensure_ascii=False)", timings, timings['json'][1], "output")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import os
+import sys
+import time
+from itertools import islice
+
+from city_store import CityStore, export_store, is_store_file
+from create_europe_regional_map import REGIONS, group_by_region
+from europe import are_in_europe, classify_country, load_boundary
+from extract_european_cities_csv import (iter_european_batches, parse_coordinates, resolve_columns,
+                                         row_to_feature)
+from filter_european_cities import european_city_names
+from geojson_stream import FeatureCollectionWriter, iter_features
+from hull import CONCAVE_K, concave_hull, convex_hull
+from polygon_engine import BATCH_SIZE, REPRESENTATIVE_METHODS, representative_cache, to_float_array
+from simplify import DEFAULT_TOLERANCE, SIMPLIFIERS, simplify_features
+
+# Separates the stages on the command line
+STAGE_SEPARATOR = '+'
+
+USAGE = f"""usage: pipeline.py STAGE [OPTIONS] [{STAGE_SEPARATOR} STAGE [OPTIONS] ...]
+
+Run processing stages chained as generators in one process. Features stream
+from stage to stage, so every input is read once and nothing is written
+until the final write stage. Use 'pipeline.py STAGE --help' for the options
+of a stage.
+
+example:
+  pipeline.py read-csv --input geonames.csv {STAGE_SEPARATOR} filter-europe {STAGE_SEPARATOR} group-region \\
+      {STAGE_SEPARATOR} hull --kind concave {STAGE_SEPARATOR} write --output europe_regions.json
+
+stages:
+"""
+
+def _check_input(path):
+    if not os.path.exists(path):
+        print(f"Error: Input file '{path}' not found.")
+        sys.exit(1)
+
+def read_csv(stream, args):
+    """Yield upstream features, then one Point feature per row of a geonames CSV file."""
+    yield from stream
+    with open(args.input, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=';')
+        columns = resolve_columns(next(reader, []))
+        coord_index = columns['Coordinates']
+        width = max((index for index in columns.values() if index is not None), default=-1) + 1
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                row.extend([None] * (width - len(row)))
+            lon, lat = parse_coordinates(row[coord_index]) if coord_index is not None else (None, None)
+            yield row_to_feature(row, columns, lon, lat)
+
+def read_csv_europe(stream, args, filter_args):
+    """
+    read-csv directly followed by filter-europe.
+
+    Rows are filtered by iter_european_batches before feature dicts are built,
+    as in extract_european_cities_csv.py, so rejected rows stay cheap.
+    """
+    # Upstream features and the rows below are tested against the same border
+    border = _load_boundary(filter_args)
+    yield from _european_features(stream, filter_args.point, border)
+    with open(args.input, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f, delimiter=';')
+        columns = resolve_columns(next(reader, []))
+        for _, features in iter_european_batches(reader, columns, border):
+            yield from features
+
+def read_geojson(stream, args):
+    """Yield upstream features, then the features of a GeoJSON file or city store."""
+    yield from stream
+    if is_store_file(args.input):
+        with CityStore(args.input) as store:
+            yield from store
+    else:
+        with open(args.input, 'rb') as f:
+            yield from iter_features(f)
+
+def _load_boundary(args):
+    """The prepared Europe border given with --boundary, or None for the built-in outline."""
+    return load_boundary(args.boundary) if args.boundary else None
+
+def filter_europe(stream, args):
+    """
+    Keep the features located in Europe.
+
+    Features are decided by country name and code when they have them
+    (country_name or cou_name_en, country_code), then by the known European
+    city names, and the rest by testing their representative point (see
+    --point) against the Europe polygon in batches. Representative points
+    come from the same shared cache as european_flags.
+    """
+    yield from _european_features(stream, args.point, _load_boundary(args))
+
+def _european_features(stream, method, border):
+    """The filter_europe loop, for a representative point method and a prepared border (or None)."""
+    cache = representative_cache(method)
+    stream = iter(stream)
+    while True:
+        batch = list(islice(stream, BATCH_SIZE))
+        if not batch:
+            break
+        flags = [False] * len(batch)
+        candidates = []
+        for i, feature in enumerate(batch):
+            properties = feature.get('properties') or {}
+            decision = classify_country(properties.get('country_name') or properties.get('cou_name_en'),
+                                        properties.get('country_code'))
+            if decision is not None:
+                flags[i] = decision
+                continue
+            if properties.get('NAME') in european_city_names:
+                flags[i] = True
+                continue
+            candidates.append(i)
+        points = cache.get_many([batch[i].get('geometry') for i in candidates])
+        located = [(i, point) for i, point in zip(candidates, points) if point is not None]
+        if located:
+            inside = are_in_europe(to_float_array(point[0] for _, point in located),
+                                   to_float_array(point[1] for _, point in located), border)
+            for (i, _), is_inside in zip(located, inside):
+                flags[i] = is_inside
+        for feature, flag in zip(batch, flags):
+            if flag:
+                yield feature
+
+def group_region(stream, args):
+    """Collect Point cities into one MultiPoint feature per European region, in region order."""
+    city_points = group_by_region({'features': stream})
+    for region in REGIONS:
+        if region in city_points:
+            yield {
+                'type': 'Feature',
+                'properties': {'name': region},
+                'geometry': {'type': 'MultiPoint', 'coordinates': city_points[region]}
+            }
+
+def hull_polygons(stream, args):
+    """Replace every MultiPoint feature by its convex or concave hull polygon; other features pass through."""
+    for feature in stream:
+        geometry = feature.get('geometry') or {}
+        if geometry.get('type') != 'MultiPoint':
+            yield feature
+            continue
+        points = geometry['coordinates']
+        ring = concave_hull(points, args.concavity) if args.kind == 'concave' else convex_hull(points)
+        # Point sets that do not span an area get no polygon
+        if ring is not None:
+            yield dict(feature, geometry={'type': 'Polygon', 'coordinates': [ring]})
+
+def simplify_polygons(stream, args):
+    """Simplify polygon rings (see simplify.py)."""
+    return simplify_features(stream, args.tolerance, args.method)
+
+def write(stream, args):
+    """Write the features to a GeoJSON file or a city store; always the last stage."""
+    # Written next to the output and moved into place only once every stage
+    # succeeded, so a failing run leaves an existing output untouched
+    tmp_file = args.output + '.tmp'
+    try:
+        if is_store_file(args.output):
+            count = export_store(stream, tmp_file)
+        else:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                with FeatureCollectionWriter(f, ensure_ascii=False, compact=args.compact) as writer:
+                    writer.write_all(stream)
+            count = writer.count
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    os.replace(tmp_file, args.output)
+    file_size = os.path.getsize(args.output) / (1024 * 1024)
+    print(f"Saved {count} features to {args.output} ({file_size:.2f} MB)")
+    return count
+
+def _input_arguments(parser):
+    parser.add_argument('--input', required=True, help="Input file")
+
+def _filter_arguments(parser):
+    parser.add_argument('--point', choices=REPRESENTATIVE_METHODS, default='centroid',
+                        help="Point polygons are located by (default: %(default)s)")
+    parser.add_argument('--boundary', help="GeoJSON file with a detailed Europe border to test against")
+
+def _hull_arguments(parser):
+    parser.add_argument('--kind', choices=['convex', 'concave'], default='convex', help="Hull to build")
+    parser.add_argument('--concavity', type=int, default=CONCAVE_K,
+                        help="Neighbours considered by the concave hull (smaller is tighter)")
+
+def _simplify_arguments(parser):
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Tolerance in degrees (default: %(default)s)")
+    parser.add_argument('--method', choices=sorted(SIMPLIFIERS), default='douglas-peucker',
+                        help="Simplification algorithm")
+
+def _write_arguments(parser):
+    parser.add_argument('--output', required=True, help="Output GeoJSON file, or a city store (.cities) file")
+    parser.add_argument('--compact', action='store_true', help="Write GeoJSON without whitespace")
+
+# Stage name -> (function(stream, args) returning a feature iterator, argument setup);
+# write consumes the stream instead and returns the number of features written
+STAGES = {
+    'read-csv': (read_csv, _input_arguments),
+    'read-geojson': (read_geojson, _input_arguments),
+    'filter-europe': (filter_europe, _filter_arguments),
+    'group-region': (group_region, None),
+    'hull': (hull_polygons, _hull_arguments),
+    'simplify': (simplify_polygons, _simplify_arguments),
+    'write': (write, _write_arguments)
+}
+
+def split_stages(argv):
+    """Split the command line at STAGE_SEPARATOR into (stage name, stage arguments) pairs."""
+    stages = [[]]
+    for arg in argv:
+        if arg == STAGE_SEPARATOR:
+            stages.append([])
+        else:
+            stages[-1].append(arg)
+    return [(words[0], words[1:]) for words in stages if words]
+
+def parse_stage(name, argv):
+    """Parse the arguments of one stage."""
+    if name not in STAGES:
+        print(f"Error: unknown stage '{name}'; choose from {', '.join(STAGES)}")
+        sys.exit(1)
+    function, add_arguments = STAGES[name]
+    parser = argparse.ArgumentParser(prog=f"pipeline.py {name}", description=function.__doc__.strip())
+    if add_arguments:
+        add_arguments(parser)
+    return parser.parse_args(argv)
+
+def build_pipeline(stages):
+    """
+    Chain parsed stages into one generator.
+
+    A read-csv stage directly followed by filter-europe is fused into one
+    stage that filters rows before building features.
+
+    Args:
+        stages: List of (stage name, parsed arguments)
+
+    Returns:
+        iterator: Features coming out of the last stage
+    """
+    stream = iter(())
+    i = 0
+    while i < len(stages):
+        name, args = stages[i]
+        if name == 'read-csv' and i + 1 < len(stages) and stages[i + 1][0] == 'filter-europe':
+            stream = read_csv_europe(stream, args, stages[i + 1][1])
+            i += 2
+            continue
+        stream = STAGES[name][0](stream, args)
+        i += 1
+    return stream
+
+def main():
+    argv = sys.argv[1:]
+    if not argv or argv[0] in ('-h', '--help'):
+        print(USAGE + '\n'.join(f"  {name:<14} {function.__doc__.strip().splitlines()[0]}"
+                                for name, (function, _) in STAGES.items()))
+        sys.exit(0 if argv else 1)
+
+    stages = [(name, parse_stage(name, args)) for name, args in split_stages(argv)]
+    if stages[-1][0] != 'write' or any(name == 'write' for name, _ in stages[:-1]):
+        print("Error: 'write' must be the last stage, and only the last")
+        sys.exit(1)
+    # Check every input up front: the stages only open theirs once features
+    # are pulled through the chain
+    for _, args in stages:
+        for path in (getattr(args, 'input', None), getattr(args, 'boundary', None)):
+            if path:
+                _check_input(path)
+
+    start = time.perf_counter()
+    # Nothing runs until write pulls features through the chain
+    write(build_pipeline(stages[:-1]), stages[-1][1])
+    print(f"Pipeline finished in {time.perf_counter() - start:.2f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,787 @@
+#!/usr/bin/env python3
+import heapq
+import math
+from array import array
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Number of points the extraction scripts test per batch
+BATCH_SIZE = 4096
+
+# Levels PreparedGeometry splits a geometry's bbox into; boundary cells end up
+# 1/1024 of the bbox wide and high
+QUADTREE_DEPTH = 10
+
+# Levels of the quadtree flattened into a lookup grid, so a point skips
+# straight to its node at this level instead of walking down from the root
+GRID_DEPTH = 6
+
+# States of PreparedGeometry quadtree cells
+OUTSIDE, INSIDE, BOUNDARY = 0, 1, 2
+
+# Cells are grown by this fraction of their size when looking for the edges
+# that touch them, so rounding never hides an edge from a cell
+CELL_PADDING = 1e-6
+
+# Ways of reducing a polygon to the one point it is classified by
+REPRESENTATIVE_METHODS = ('centroid', 'pole')
+
+# The pole of inaccessibility is refined until it is within this fraction of
+# the polygon's larger bbox side from the optimum
+POLE_PRECISION = 0.01
+
+# Geometries whose representative point RepresentativePoints keeps; the
+# oldest entries are dropped beyond this, so streamed inputs stay bounded
+REPRESENTATIVE_CACHE_SIZE = 1 << 17
+
+def point_in_polygon(point, polygon):
+    """
+    Determine if a point is inside a polygon using the ray casting algorithm.
+
+    Args:
+        point: A tuple of (longitude, latitude)
+        polygon: A list of (longitude, latitude) tuples forming a polygon
+
+    Returns:
+        bool: True if the point is inside the polygon, False otherwise
+    """
+    x, y = point
+    n = len(polygon)
+    inside = False
+
+    p1x, p1y = polygon[0]
+    for i in range(1, n + 1):
+        p2x, p2y = polygon[i % n]
+        if y > min(p1y, p2y):
+            if y <= max(p1y, p2y):
+                if x <= max(p1x, p2x):
+                    if p1y != p2y:
+                        xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+                    if p1x == p2x or x <= xinters:
+                        inside = not inside
+        p1x, p1y = p2x, p2y
+
+    return inside
+
+def to_float_array(values):
+    """
+    Convert a sequence of coordinate values to an array('d').
+
+    Values that cannot be converted become NaN, which is never inside any polygon.
+    """
+    result = array('d')
+    append = result.append
+    for value in values:
+        try:
+            append(float(value))
+        except (TypeError, ValueError):
+            append(float('nan'))
+    return result
+
+class CompiledPolygon:
+    """
+    A polygon prepared once for fast repeated point-in-polygon tests.
+
+    Stores the bounding box, so far-away points are rejected with four
+    comparisons, and an edge table where each non-horizontal edge is kept as
+    (y_low, y_high, intercept, slope) with x = intercept + slope * y. Edges
+    are also bucketed into latitude bands, so a test only walks the edges
+    whose latitude range overlaps the point's band.
+    """
+
+    def __init__(self, polygon, bands=None):
+        """
+        Args:
+            polygon: A list of (longitude, latitude) tuples forming a polygon
+            bands: Number of latitude bands (default: one per edge, at least 1)
+        """
+        self.polygon = [(float(x), float(y)) for x, y in polygon]
+        self._compile([self.polygon], bands)
+
+    def _compile(self, rings, bands):
+        """Build the bbox, edge table and latitude bands from rings of (x, y) float tuples."""
+        xs = [x for ring in rings for x, _ in ring]
+        ys = [y for ring in rings for _, y in ring]
+        self.min_x, self.max_x = min(xs), max(xs)
+        self.min_y, self.max_y = min(ys), max(ys)
+
+        # Horizontal edges can never be crossed by the ray, so they are dropped up front
+        self.edges = []
+        for ring in rings:
+            n = len(ring)
+            for i in range(n):
+                x1, y1 = ring[i]
+                x2, y2 = ring[(i + 1) % n]
+                if y1 != y2:
+                    slope = (x2 - x1) / (y2 - y1)
+                    self.edges.append((min(y1, y2), max(y1, y2), x1 - slope * y1, slope))
+
+        if bands is None:
+            bands = max(1, len(self.edges))
+        self.band_count = bands
+        height = self.max_y - self.min_y
+        self.band_scale = bands / height if height > 0 else 0.0
+        self.bands = [[] for _ in range(bands)]
+        for edge in self.edges:
+            first = self._band(edge[0])
+            last = self._band(edge[1])
+            for band in range(first, last + 1):
+                self.bands[band].append(edge)
+
+    def _band(self, y):
+        """Index of the latitude band containing y (clamped to the bbox)."""
+        band = int((y - self.min_y) * self.band_scale)
+        if band < 0:
+            return 0
+        if band >= self.band_count:
+            return self.band_count - 1
+        return band
+
+    def contains(self, x, y):
+        """Return True if the point (x, y) is inside the polygon."""
+        if not (self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y):
+            return False
+
+        inside = False
+        for y_low, y_high, intercept, slope in self.bands[self._band(y)]:
+            if y_low < y <= y_high and x <= intercept + slope * y:
+                inside = not inside
+        return inside
+
+    def contains_many(self, lons, lats):
+        """
+        Test a batch of points against the polygon.
+
+        Args:
+            lons: Sequence of longitudes (list, array('d') or NumPy array)
+            lats: Sequence of latitudes, same length as lons
+
+        Returns:
+            list: One bool per point, True if the point is inside the polygon
+        """
+        if np is not None:
+            x = np.asarray(lons, dtype=np.float64)
+            y = np.asarray(lats, dtype=np.float64)
+            inside = np.zeros(x.shape, dtype=bool)
+            # Only points within the bbox go through the edge table
+            candidates = np.flatnonzero((x >= self.min_x) & (x <= self.max_x) &
+                                        (y >= self.min_y) & (y <= self.max_y))
+            if candidates.size:
+                # Sort the candidates by latitude band, so each band's points
+                # are tested as one slice against that band's edges only
+                band = np.clip(((y[candidates] - self.min_y) * self.band_scale).astype(np.int64),
+                               0, self.band_count - 1)
+                order = np.argsort(band, kind='stable')
+                candidates = candidates[order]
+                band = band[order]
+                cx = x[candidates]
+                cy = y[candidates]
+                crossings = np.zeros(candidates.shape, dtype=bool)
+                bands, starts = np.unique(band, return_index=True)
+                ends = np.append(starts[1:], band.size)
+                for b, start, end in zip(bands.tolist(), starts.tolist(), ends.tolist()):
+                    bx = cx[start:end]
+                    by = cy[start:end]
+                    hits = crossings[start:end]
+                    for y_low, y_high, intercept, slope in self.bands[b]:
+                        hits ^= (y_low < by) & (by <= y_high) & (bx <= intercept + slope * by)
+                inside[candidates] = crossings
+            return inside.tolist()
+
+        contains = self.contains
+        return [contains(x, y) for x, y in zip(lons, lats)]
+
+def geometry_polygons(geometry):
+    """Return the polygons (lists of rings, outer ring first) of a Polygon/MultiPolygon geometry."""
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+def point_in_geometry(point, geometry):
+    """
+    Determine if a point is inside a Polygon or MultiPolygon, holes included.
+
+    Every ring of every polygon is crossed by the same ray (the even-odd
+    rule), so a point inside a hole crosses its outer ring and the hole and
+    ends up outside. For repeated tests prepare the geometry once with
+    CompiledGeometry instead.
+
+    Args:
+        point: A tuple of (longitude, latitude)
+        geometry: A GeoJSON Polygon or MultiPolygon geometry dict
+
+    Returns:
+        bool: True if the point is inside the geometry, False otherwise
+    """
+    inside = False
+    for polygon in geometry_polygons(geometry):
+        for ring in polygon:
+            if ring and point_in_polygon(point, [(p[0], p[1]) for p in ring]):
+                inside = not inside
+    return inside
+
+class CompiledGeometry(CompiledPolygon):
+    """
+    A Polygon or MultiPolygon prepared once for fast repeated containment tests.
+
+    The edges of all rings, outer rings and holes of every polygon alike, go
+    into one CompiledPolygon edge table, and a point is inside when a ray
+    from it crosses an odd number of them (the even-odd rule). For valid
+    GeoJSON, where holes lie inside their outer ring and polygons do not
+    overlap, this equals "inside an outer ring and outside its holes", at the
+    cost of a single banded test per point however many parts there are.
+
+    Usage:
+        prepared = CompiledGeometry(feature['geometry'])
+        prepared.contains(21.0122, 52.2297)
+    """
+
+    def __init__(self, geometry, bands=None):
+        """
+        Args:
+            geometry: A GeoJSON Polygon or MultiPolygon geometry dict, or a
+                list of rings (lists of [lon, lat] positions)
+            bands: Number of latitude bands (default: one per edge, at least 1)
+        """
+        if isinstance(geometry, dict):
+            rings = [ring for polygon in geometry_polygons(geometry) for ring in polygon]
+        else:
+            rings = geometry
+        self.rings = [[(float(p[0]), float(p[1])) for p in ring] for ring in rings if ring]
+        if not self.rings:
+            raise ValueError("Geometry has no polygon rings")
+        self.polygon = self.rings[0]
+        self._compile(self.rings, bands)
+
+# Geometries with fewer vertices are tested with CompiledGeometry alone: its
+# banded edge table beats the quadtree walk per point until the bands hold
+# many edges, and building the quadtree costs about a second at this size
+PREPARED_MIN_VERTICES = 1000
+
+def _segment_touches_box(x1, y1, x2, y2, min_x, min_y, max_x, max_y):
+    """Check if a segment touches a closed box."""
+    if max(x1, x2) < min_x or min(x1, x2) > max_x or max(y1, y2) < min_y or min(y1, y2) > max_y:
+        return False
+    # Past the bbox check, the segment misses only if all four corners lie strictly on one side of it
+    dx, dy = x2 - x1, y2 - y1
+    sides = [dx * (cy - y1) - dy * (cx - x1)
+             for cx, cy in ((min_x, min_y), (max_x, min_y), (max_x, max_y), (min_x, max_y))]
+    return not (all(side > 0 for side in sides) or all(side < 0 for side in sides))
+
+class PreparedGeometry:
+    """
+    A Polygon or MultiPolygon rasterized into a quadtree for containment tests
+    at nearly constant cost, however detailed its outline.
+
+    At build time the bbox is split into quadrants recursively. A cell that
+    no ring edge touches lies wholly inside or wholly outside the geometry,
+    which one exact test of its center decides, and is not split further;
+    cells touched by an edge are split down to max_depth, where they stay
+    boundary cells. A lookup walks down to the leaf holding the point, and
+    only points in boundary cells get the exact CompiledGeometry test. The
+    boundary cells halve in size with every level, so a border with
+    thousands of vertices leaves almost every point to the tree.
+
+    Nodes live in two flat lists: states[i] (OUTSIDE, INSIDE or BOUNDARY) and
+    children[i] (index of the first of four consecutive children, 0 for
+    leaves). Quadrant q of a node holds bit (q & 1) of the cell column and
+    bit (q >> 1) of the cell row. The top GRID_DEPTH levels are also
+    flattened into a grid of node indexes, so most lookups take a single
+    step.
+
+    Usage:
+        prepared = PreparedGeometry(europe_geometry)
+        prepared.contains(21.0122, 52.2297)
+    """
+
+    def __init__(self, geometry, max_depth=QUADTREE_DEPTH):
+        """
+        Args:
+            geometry: A GeoJSON Polygon or MultiPolygon geometry dict, or a
+                list of rings (lists of [lon, lat] positions)
+            max_depth: Levels below the root cell
+        """
+        self.compiled = CompiledGeometry(geometry)
+        compiled = self.compiled
+        self.min_x, self.max_x = compiled.min_x, compiled.max_x
+        self.min_y, self.max_y = compiled.min_y, compiled.max_y
+        width = self.max_x - self.min_x
+        height = self.max_y - self.min_y
+        # A geometry without area cannot be split; its root stays a boundary cell
+        self.depth = max_depth if width > 0 and height > 0 else 0
+        self.size = 1 << self.depth
+        self.scale_x = self.size / width if width > 0 else 0.0
+        self.scale_y = self.size / height if height > 0 else 0.0
+
+        self.states = [BOUNDARY]
+        self.children = [0]
+        self._arrays = None
+        if self.depth:
+            # Horizontal edges count here: points on them are settled by the exact test
+            segments = [(ring[i - 1][0], ring[i - 1][1], ring[i][0], ring[i][1])
+                        for ring in compiled.rings for i in range(len(ring))]
+            self._build(0, 0, 0, 0, segments)
+
+        # Node covering each cell of the top grid (a leaf when the tree stops above it)
+        self.grid_depth = min(GRID_DEPTH, self.depth)
+        self.grid_shift = self.depth - self.grid_depth
+        grid_size = 1 << self.grid_depth
+        self.grid = []
+        for row in range(grid_size):
+            for column in range(grid_size):
+                node = 0
+                shift = self.grid_depth - 1
+                while self.children[node] and shift >= 0:
+                    node = self.children[node] + (((column >> shift) & 1) | (((row >> shift) & 1) << 1))
+                    shift -= 1
+                self.grid.append(node)
+
+    def _build(self, node, level, ix, iy, segments):
+        """Classify the cell of node from the segments touching its parent, splitting it if needed."""
+        span = 1 << (self.depth - level)
+        min_x = self.min_x + ix / self.scale_x
+        max_x = self.min_x + (ix + span) / self.scale_x
+        min_y = self.min_y + iy / self.scale_y
+        max_y = self.min_y + (iy + span) / self.scale_y
+        pad_x = (max_x - min_x) * CELL_PADDING
+        pad_y = (max_y - min_y) * CELL_PADDING
+        touching = [segment for segment in segments
+                    if _segment_touches_box(*segment, min_x - pad_x, min_y - pad_y, max_x + pad_x, max_y + pad_y)]
+
+        if not touching:
+            inside = self.compiled.contains((min_x + max_x) / 2, (min_y + max_y) / 2)
+            self.states[node] = INSIDE if inside else OUTSIDE
+            return
+        if level == self.depth:
+            return
+
+        first = len(self.states)
+        self.children[node] = first
+        self.states.extend([BOUNDARY] * 4)
+        self.children.extend([0] * 4)
+        half = span >> 1
+        for quadrant in range(4):
+            self._build(first + quadrant, level + 1,
+                        ix + (quadrant & 1) * half, iy + (quadrant >> 1) * half, touching)
+
+    def __len__(self):
+        return len(self.states)
+
+    def cell_counts(self):
+        """Number of (outside, inside, boundary) leaf cells."""
+        counts = [0, 0, 0]
+        for state, child in zip(self.states, self.children):
+            if not child:
+                counts[state] += 1
+        return tuple(counts)
+
+    def contains(self, x, y):
+        """Return True if the point (x, y) is inside the geometry."""
+        if not (self.min_x <= x <= self.max_x and self.min_y <= y <= self.max_y):
+            return False
+
+        ix = min(int((x - self.min_x) * self.scale_x), self.size - 1)
+        iy = min(int((y - self.min_y) * self.scale_y), self.size - 1)
+        children = self.children
+        shift = self.grid_shift
+        node = self.grid[((iy >> shift) << self.grid_depth) + (ix >> shift)]
+        shift -= 1
+        while children[node]:
+            node = children[node] + (((ix >> shift) & 1) | (((iy >> shift) & 1) << 1))
+            shift -= 1
+        state = self.states[node]
+        if state == BOUNDARY:
+            return self.compiled.contains(x, y)
+        return state == INSIDE
+
+    def contains_many(self, lons, lats):
+        """
+        Test a batch of points against the geometry.
+
+        With NumPy the whole batch descends the tree below the top grid one
+        level per step, and
+        only the points left in boundary cells go through the exact test.
+
+        Args:
+            lons: Sequence of longitudes (list, array('d') or NumPy array)
+            lats: Sequence of latitudes, same length as lons
+
+        Returns:
+            list: One bool per point, True if the point is inside the geometry
+        """
+        if np is not None:
+            if self._arrays is None:
+                self._arrays = (np.array(self.states, dtype=np.int8), np.array(self.children, dtype=np.int64),
+                                np.array(self.grid, dtype=np.int64))
+            states, children, grid = self._arrays
+            x = np.asarray(lons, dtype=np.float64)
+            y = np.asarray(lats, dtype=np.float64)
+            in_box = (x >= self.min_x) & (x <= self.max_x) & (y >= self.min_y) & (y <= self.max_y)
+            ix = np.minimum((np.where(in_box, x - self.min_x, 0.0) * self.scale_x).astype(np.int64), self.size - 1)
+            iy = np.minimum((np.where(in_box, y - self.min_y, 0.0) * self.scale_y).astype(np.int64), self.size - 1)
+            node = grid[((iy >> self.grid_shift) << self.grid_depth) + (ix >> self.grid_shift)]
+            for shift in range(self.grid_shift - 1, -1, -1):
+                first = children[node]
+                quadrant = ((ix >> shift) & 1) | (((iy >> shift) & 1) << 1)
+                node = np.where(first > 0, first + quadrant, node)
+            state = np.where(in_box, states[node], OUTSIDE)
+            inside = state == INSIDE
+            boundary = np.flatnonzero(state == BOUNDARY)
+            if boundary.size:
+                inside[boundary] = self.compiled.contains_many(x[boundary], y[boundary])
+            return inside.tolist()
+
+        # Without NumPy every point takes the walk of contains, inlined to save the method calls
+        min_x, max_x, min_y, max_y = self.min_x, self.max_x, self.min_y, self.max_y
+        scale_x, scale_y, last = self.scale_x, self.scale_y, self.size - 1
+        grid, grid_depth, grid_shift = self.grid, self.grid_depth, self.grid_shift
+        states, children = self.states, self.children
+        exact = self.compiled.contains
+        result = []
+        append = result.append
+        for x, y in zip(lons, lats):
+            if not (min_x <= x <= max_x and min_y <= y <= max_y):
+                append(False)
+                continue
+            ix = min(int((x - min_x) * scale_x), last)
+            iy = min(int((y - min_y) * scale_y), last)
+            node = grid[((iy >> grid_shift) << grid_depth) + (ix >> grid_shift)]
+            shift = grid_shift - 1
+            while children[node]:
+                node = children[node] + (((ix >> shift) & 1) | (((iy >> shift) & 1) << 1))
+                shift -= 1
+            state = states[node]
+            append(exact(x, y) if state == BOUNDARY else state == INSIDE)
+        return result
+
+def prepare_geometry(geometry):
+    """
+    Prepare a Polygon/MultiPolygon for repeated containment tests.
+
+    Returns:
+        CompiledGeometry, or PreparedGeometry (a quadtree) when the geometry
+        has PREPARED_MIN_VERTICES or more vertices
+    """
+    vertices = sum(len(ring) for polygon in geometry_polygons(geometry) for ring in polygon)
+    if vertices < PREPARED_MIN_VERTICES:
+        return CompiledGeometry(geometry)
+    return PreparedGeometry(geometry)
+
+def _ring_sums(ring):
+    """Shoelace sums of a ring: twice the signed area and the two centroid numerators."""
+    area = sx = sy = 0.0
+    x1, y1 = ring[-1][0], ring[-1][1]
+    for point in ring:
+        x2, y2 = point[0], point[1]
+        cross = x1 * y2 - x2 * y1
+        area += cross
+        sx += (x1 + x2) * cross
+        sy += (y1 + y2) * cross
+        x1, y1 = x2, y2
+    return area, sx, sy
+
+def ring_centroids(rings):
+    """
+    Signed area and centroid of many rings with the shoelace formula.
+
+    When NumPy is installed all rings are flattened into one coordinate array
+    and summed per ring with np.add.reduceat, so a whole batch costs a few
+    array operations; otherwise each ring is summed in a plain loop. Rings
+    may be open or closed, and extra coordinates (altitude) are ignored.
+
+    Args:
+        rings: Sequence of non-empty rings, each a list of [lon, lat] positions
+
+    Returns:
+        list: One (area, lon, lat) per ring; the area is positive for
+            counter-clockwise rings, and rings without area get the mean of
+            their vertices as centroid
+    """
+    if np is not None and rings:
+        lengths = np.array([len(ring) for ring in rings])
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        x = np.array([point[0] for ring in rings for point in ring], dtype=np.float64)
+        y = np.array([point[1] for ring in rings for point in ring], dtype=np.float64)
+        # Index of each vertex's successor, wrapping around within its own ring
+        following = np.arange(1, len(x) + 1)
+        following[starts + lengths - 1] = starts
+        x2 = x[following]
+        y2 = y[following]
+        cross = x * y2 - x2 * y
+        area = np.add.reduceat(cross, starts)
+        sx = np.add.reduceat((x + x2) * cross, starts)
+        sy = np.add.reduceat((y + y2) * cross, starts)
+        mean_x = np.add.reduceat(x, starts) / lengths
+        mean_y = np.add.reduceat(y, starts) / lengths
+        flat = area == 0
+        divisor = np.where(flat, 1.0, 3 * area)
+        lon = np.where(flat, mean_x, sx / divisor)
+        lat = np.where(flat, mean_y, sy / divisor)
+        return list(zip((area / 2).tolist(), lon.tolist(), lat.tolist()))
+
+    result = []
+    for ring in rings:
+        area, sx, sy = _ring_sums(ring)
+        if area == 0:
+            n = len(ring)
+            result.append((0.0, sum(p[0] for p in ring) / n, sum(p[1] for p in ring) / n))
+        else:
+            result.append((area / 2, sx / (3 * area), sy / (3 * area)))
+    return result
+
+def _combine_rings(ring_results):
+    """Area and centroid of a polygon from its rings' results (outer ring first, holes subtracted)."""
+    outer_area, lon, lat = ring_results[0]
+    area = abs(outer_area)
+    sum_lon = area * lon
+    sum_lat = area * lat
+    for hole_area, hole_lon, hole_lat in ring_results[1:]:
+        hole_area = abs(hole_area)
+        area -= hole_area
+        sum_lon -= hole_area * hole_lon
+        sum_lat -= hole_area * hole_lat
+    if area <= 0:
+        return abs(outer_area), lon, lat
+    return area, sum_lon / area, sum_lat / area
+
+# Geometry types representative_points locates, by lowercased type name
+_LOCATED_TYPES = {'point': 'Point', 'polygon': 'Polygon', 'multipolygon': 'MultiPolygon'}
+
+def _located_geometry(geometry):
+    """
+    Geometry type and coordinates checked for representative_points.
+
+    Type names are matched case-insensitively and positions are converted to
+    floats. Returns (type, [lon, lat]) for points and (type, polygons) for
+    polygons, or None for geometries that cannot be located: other or
+    missing types, and malformed or missing coordinates.
+    """
+    if not isinstance(geometry, dict):
+        return None
+    geom_type = _LOCATED_TYPES.get(str(geometry.get('type')).lower())
+    coords = geometry.get('coordinates')
+    if geom_type is None or not coords:
+        return None
+    try:
+        if geom_type == 'Point':
+            return geom_type, [float(coords[0]), float(coords[1])]
+        polygons = []
+        for polygon in ([coords] if geom_type == 'Polygon' else coords):
+            if not polygon or not polygon[0]:
+                continue
+            polygons.append([[(float(p[0]), float(p[1])) for p in ring] for ring in polygon if ring])
+    except (TypeError, ValueError, IndexError, KeyError):
+        return None
+    return (geom_type, polygons) if polygons else None
+
+def _signed_distance(x, y, rings):
+    """Distance from a point to the nearest ring edge, negative outside the polygon (even-odd rule)."""
+    inside = False
+    best = math.inf
+    for ring in rings:
+        ax, ay = ring[-1]
+        for bx, by in ring:
+            if (ay > y) != (by > y) and x < (bx - ax) * (y - ay) / (by - ay) + ax:
+                inside = not inside
+            dx, dy = bx - ax, by - ay
+            px, py = ax, ay
+            length = dx * dx + dy * dy
+            if length > 0:
+                t = ((x - ax) * dx + (y - ay) * dy) / length
+                if t > 1:
+                    px, py = bx, by
+                elif t > 0:
+                    px, py = ax + dx * t, ay + dy * t
+            best = min(best, (x - px) ** 2 + (y - py) ** 2)
+            ax, ay = bx, by
+    return math.sqrt(best) if inside else -math.sqrt(best)
+
+def pole_of_inaccessibility(polygon, precision=None):
+    """
+    Interior point of a polygon farthest from its outline (the polylabel algorithm).
+
+    Unlike the centroid, the pole always lies inside the polygon, also for
+    concave shapes and polygons with holes. The bbox is covered with square
+    cells, and the cells that can still hold a better point than the best
+    found so far are split into quarters, most promising first.
+
+    Args:
+        polygon: List of rings (outer ring first, then holes)
+        precision: Stop refining cells that cannot improve the result by more
+            than this many degrees (default: POLE_PRECISION of the bbox size)
+
+    Returns:
+        list: [lon, lat] of the pole
+    """
+    rings = [[(point[0], point[1]) for point in ring] for ring in polygon if ring]
+    xs = [x for x, _ in rings[0]]
+    ys = [y for _, y in rings[0]]
+    min_x, min_y, max_x, max_y = min(xs), min(ys), max(xs), max(ys)
+    width, height = max_x - min_x, max_y - min_y
+    cell_size = min(width, height)
+    if cell_size == 0:
+        return [min_x, min_y]
+    if precision is None:
+        precision = max(width, height) * POLE_PRECISION
+
+    # Heap entries: (-upper bound of any point in the cell, tie breaker, x, y, half size, distance)
+    heap = []
+    counter = 0
+
+    def push(x, y, half):
+        nonlocal counter
+        distance = _signed_distance(x, y, rings)
+        counter += 1
+        heapq.heappush(heap, (-(distance + half * math.sqrt(2)), counter, x, y, half, distance))
+
+    half = cell_size / 2
+    x = min_x
+    while x < max_x:
+        y = min_y
+        while y < max_y:
+            push(x + half, y + half, half)
+            y += cell_size
+        x += cell_size
+
+    _, cx, cy = _combine_rings(ring_centroids(rings))
+    best = (_signed_distance(cx, cy, rings), cx, cy)
+    center = (min_x + width / 2, min_y + height / 2)
+    best = max(best, (_signed_distance(*center, rings),) + center)
+
+    while heap:
+        bound, _, x, y, half, distance = heapq.heappop(heap)
+        if distance > best[0]:
+            best = (distance, x, y)
+        if -bound - best[0] <= precision:
+            continue
+        half /= 2
+        push(x - half, y - half, half)
+        push(x + half, y - half, half)
+        push(x - half, y + half, half)
+        push(x + half, y + half, half)
+    return [best[1], best[2]]
+
+def representative_points(geometries, method='centroid'):
+    """
+    Reduce geometries to the single point they are located by.
+
+    Points are their own representative. Polygons use their area centroid
+    (holes subtracted) or, with method 'pole', their pole of inaccessibility;
+    MultiPolygons use their largest polygon. The rings of the whole batch go
+    through one ring_centroids call. Type names are matched regardless of
+    case, and malformed geometries get None instead of raising.
+
+    Args:
+        geometries: Sequence of GeoJSON geometry dicts (or None)
+        method: One of REPRESENTATIVE_METHODS
+
+    Returns:
+        list: One [lon, lat] per geometry, or None for geometries without
+            usable coordinates
+    """
+    if method not in REPRESENTATIVE_METHODS:
+        raise ValueError(f"Unknown method '{method}'; choose from {', '.join(REPRESENTATIVE_METHODS)}")
+
+    results = [None] * len(geometries)
+    rings = []
+    # (geometry index, polygons, [(first ring, ring count) per polygon])
+    pending = []
+    for g, geometry in enumerate(geometries):
+        located = _located_geometry(geometry)
+        if located is None:
+            continue
+        geom_type, coords = located
+        if geom_type == 'Point':
+            results[g] = coords
+            continue
+        polygons = coords
+        spans = []
+        for polygon in polygons:
+            spans.append((len(rings), len(polygon)))
+            rings.extend(polygon)
+        pending.append((g, polygons, spans))
+
+    centroids = ring_centroids(rings)
+    for g, polygons, spans in pending:
+        combined = [_combine_rings(centroids[first:first + count]) for first, count in spans]
+        largest = max(range(len(polygons)), key=lambda i: combined[i][0])
+        if method == 'pole':
+            results[g] = pole_of_inaccessibility(polygons[largest])
+        else:
+            results[g] = [combined[largest][1], combined[largest][2]]
+    return results
+
+class RepresentativePoints:
+    """
+    Representative points of polygon geometries, computed once per geometry.
+
+    Entries are keyed by geometry identity and hold on to the geometry, so a
+    feature list that stays loaded is only located once however often it is
+    filtered. At most REPRESENTATIVE_CACHE_SIZE geometries are kept, oldest
+    dropped first. Points and malformed geometries are cheap to locate and
+    are not cached.
+
+    Usage:
+        points = representative_cache('pole')
+        lon, lat = points.get_many([feature['geometry']])[0]
+    """
+
+    def __init__(self, method='centroid', max_size=REPRESENTATIVE_CACHE_SIZE):
+        """
+        Args:
+            method: One of REPRESENTATIVE_METHODS
+            max_size: Most geometries kept
+        """
+        if method not in REPRESENTATIVE_METHODS:
+            raise ValueError(f"Unknown method '{method}'; choose from {', '.join(REPRESENTATIVE_METHODS)}")
+        self.method = method
+        self.max_size = max_size
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.cache)
+
+    def get_many(self, geometries):
+        """One [lon, lat] or None per geometry (see representative_points); uncached ones are located in one batch."""
+        results = [None] * len(geometries)
+        missing = []
+        for i, geometry in enumerate(geometries):
+            entry = self.cache.get(id(geometry))
+            if entry is not None:
+                results[i] = entry[1]
+            else:
+                missing.append(i)
+        if not missing:
+            return results
+
+        points = representative_points([geometries[i] for i in missing], self.method)
+        for i, point in zip(missing, points):
+            results[i] = point
+            geometry = geometries[i]
+            located = _located_geometry(geometry)
+            if located is not None and located[0] != 'Point':
+                self.cache[id(geometry)] = (geometry, point)
+        # Dicts keep insertion order, so the first keys are the oldest entries
+        for key in list(islice(self.cache, max(0, len(self.cache) - self.max_size))):
+            del self.cache[key]
+        return results
+
+# Process-wide caches, one per method (see representative_cache)
+_representative_caches = {}
+
+def representative_cache(method='centroid'):
+    """
+    The process-wide RepresentativePoints cache for a method.
+
+    european_flags and the filter-europe pipeline stage share it, so
+    filtering the same loaded features again reuses their points.
+    """
+    if method not in _representative_caches:
+        _representative_caches[method] = RepresentativePoints(method)
+    return _representative_caches[method]
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+import json_codec
+from city_store import CityStore, is_store_file
+from polygon_engine import representative_points
+from spatial_index import SpatialIndex, feature_name
+
+class ReverseGeocoder:
+    """
+    Map points to the city polygon that contains them, or the nearest city.
+
+    An STR R-tree over the polygons' bounding boxes narrows each lookup to a
+    few candidates, which are tested exactly against the polygons the index
+    prepared when it was built (holes are honoured). Points outside every
+    polygon fall back to the feature with the nearest centroid, found in a
+    second R-tree over the centroids.
+
+    Usage:
+        geocoder = ReverseGeocoder(features)
+        distance_km, feature = geocoder.reverse_geocode(21.0122, 52.2297)
+    """
+
+    def __init__(self, features, max_distance_km=None, index=None):
+        """
+        Args:
+            features: Sequence of GeoJSON Feature dicts (a CityStore works too)
+            max_distance_km: Ignore nearest-centroid matches farther than this
+            index: An existing SpatialIndex over the same features, to share
+        """
+        self.features = features
+        self.max_distance_km = max_distance_km
+        self.index = index if index is not None else SpatialIndex(features)
+
+        ids = sorted(self.index.geometries)
+        centroids = []
+        self.centroid_ids = []
+        for i, centroid in zip(ids, representative_points([self.index.geometries[i] for i in ids])):
+            if centroid is not None:
+                centroids.append({'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': centroid}})
+                self.centroid_ids.append(i)
+        self.centroids = SpatialIndex(centroids)
+
+    def _contains(self, i, lon, lat):
+        prepared = self.index.prepared.get(i)
+        return prepared is not None and prepared.contains(lon, lat)
+
+    def _nearest(self, lon, lat):
+        found = self.centroids.nearest_ids(lon, lat, 1)
+        if not found:
+            return None
+        distance, c = found[0]
+        if self.max_distance_km is not None and distance > self.max_distance_km:
+            return None
+        return distance, self.centroid_ids[c]
+
+    def lookup_id(self, lon, lat):
+        """
+        Return (distance_km, index) of the feature for a point, or None.
+
+        distance_km is 0.0 when a polygon contains the point, otherwise the
+        distance to the nearest centroid.
+        """
+        for i in self.index.query_point_ids(lon, lat):
+            if self._contains(i, lon, lat):
+                return 0.0, i
+        return self._nearest(lon, lat)
+
+    def reverse_geocode(self, lon, lat):
+        """Return (distance_km, feature) for a point, or None (see lookup_id)."""
+        found = self.lookup_id(lon, lat)
+        if found is None:
+            return None
+        return found[0], self.features[found[1]]
+
+    def reverse_geocode_many(self, points):
+        """
+        Reverse geocode a batch of points.
+
+        Candidates are gathered per polygon first, so each polygon tests all
+        of its points in one contains_many call (vectorized when NumPy is
+        installed) instead of once per point.
+
+        Args:
+            points: Sequence of (lon, lat) pairs
+
+        Returns:
+            list: One (distance_km, feature) or None per point, in input order
+        """
+        points = list(points)
+        by_feature = defaultdict(list)
+        for p, (lon, lat) in enumerate(points):
+            for i in self.index.query_point_ids(lon, lat):
+                by_feature[i].append(p)
+
+        # Smallest feature index wins, as in lookup_id
+        matches = {}
+        for i in sorted(by_feature):
+            pending = [p for p in by_feature[i] if p not in matches]
+            if not pending:
+                continue
+            prepared = self._prepare(i)
+            if prepared is None:
+                continue
+            inside = prepared.contains_many([points[p][0] for p in pending], [points[p][1] for p in pending])
+            for p, hit in zip(pending, inside):
+                if hit:
+                    matches[p] = i
+
+        results = []
+        for p, (lon, lat) in enumerate(points):
+            if p in matches:
+                results.append((0.0, self.features[matches[p]]))
+                continue
+            found = self._nearest(lon, lat)
+            results.append(None if found is None else (found[0], self.features[found[1]]))
+        return results
+
+def load_geocoder(path, max_distance_km=None):
+    """Build a ReverseGeocoder from a GeoJSON FeatureCollection or a city store file."""
+    if is_store_file(path):
+        features = CityStore(path)
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            features = json_codec.load(f)['features']
+    return ReverseGeocoder(features, max_distance_km)
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the city containing, or nearest to, a point.")
+    parser.add_argument('input', help="GeoJSON FeatureCollection or city store file, e.g. polish_cities.json")
+    parser.add_argument('points', nargs='*', metavar='LON,LAT',
+                        help="Points to look up; read one per line from stdin if none are given")
+    parser.add_argument('--max-distance', type=float,
+                        help="Report no match when the nearest city is farther than this many km")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: Input file '{args.input}' not found.")
+        sys.exit(1)
+
+    geocoder = load_geocoder(args.input, args.max_distance)
+    lines = args.points or (line.strip() for line in sys.stdin)
+    points = []
+    for line in lines:
+        if not line:
+            continue
+        try:
+            lon, lat = (float(value) for value in line.split(','))
+        except ValueError:
+            print(f"Error: expected LON,LAT but got '{line}'")
+            sys.exit(1)
+        points.append((lon, lat))
+
+    for (lon, lat), result in zip(points, geocoder.reverse_geocode_many(points)):
+        if result is None:
+            print(f"{lon},{lat}\t-")
+        elif result[0] == 0.0:
+            print(f"{lon},{lat}\t{feature_name(result[1])}")
+        else:
+            print(f"{lon},{lat}\t{feature_name(result[1])}\t{result[0]:.2f} km")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import math
+import os
+import sys
+import traceback
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import json_codec
+from city_store import CityStore, is_store_file
+from create_europe_regional_map_enhanced import create_region_features
+from geojson_stream import FeatureCollectionWriter
+from polygon_engine import CompiledGeometry, representative_points
+from reverse_geocode import ReverseGeocoder
+from spatial_index import SpatialIndex, geometry_bbox
+
+# Responses are sent in chunks of about this many bytes
+STREAM_CHUNK_SIZE = 1 << 16
+
+# Largest request head (request line and headers) accepted, in bytes
+MAX_REQUEST_HEAD = 1 << 14
+
+# Upper limit for the k parameter of /nearest
+MAX_NEAREST = 1000
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error'}
+
+class QueryError(Exception):
+    """A request that cannot be answered; carries the HTTP status to send."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def _with_distance(feature, distance_km):
+    """Copy of a feature with its distance in km added to the properties."""
+    properties = dict(feature.get('properties') or {}, distance_km=round(distance_km, 3))
+    return dict(feature, properties=properties)
+
+class QueryService:
+    """
+    City datasets and their indexes, loaded once and queried from memory.
+
+    Every query returns an iterable of GeoJSON features; nothing is read from
+    disk after construction.
+    """
+
+    def __init__(self, cities, regions):
+        """
+        Args:
+            cities: Sequence of city Feature dicts (a CityStore works too)
+            regions: Region Feature dicts with a "name" property
+        """
+        self.cities = cities
+        self.index = SpatialIndex(cities)
+        self.geocoder = ReverseGeocoder(cities, index=self.index)
+
+        self.regions = {}
+        self.region_members = {}
+        for feature in regions:
+            name = (feature.get('properties') or {}).get('name')
+            geometry = feature.get('geometry')
+            if not name or not geometry or geometry['type'] not in ('Polygon', 'MultiPolygon'):
+                continue
+            self.regions[name.lower()] = (feature, geometry_bbox(geometry), CompiledGeometry(geometry))
+
+    def bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """Cities intersecting a box."""
+        return self.index.query_bbox(min_lon, min_lat, max_lon, max_lat)
+
+    def nearest(self, lon, lat, k):
+        """The k cities closest to a point, nearest first, with distance_km."""
+        return [_with_distance(feature, distance) for distance, feature in self.index.nearest(lon, lat, k)]
+
+    def reverse(self, lon, lat):
+        """The city containing a point, or else the nearest one, with distance_km."""
+        found = self.geocoder.reverse_geocode(lon, lat)
+        return [] if found is None else [_with_distance(found[1], found[0])]
+
+    def _region_member_ids(self, key):
+        """Indexes of the cities whose centroid lies inside a region, computed once per region."""
+        members = self.region_members.get(key)
+        if members is None:
+            _, bbox, prepared = self.regions[key]
+            members = []
+            ids = self.index.query_bbox_ids(*bbox)
+            for i, centroid in zip(ids, representative_points([self.index.geometries[i] for i in ids])):
+                if centroid is not None and prepared.contains(*centroid):
+                    members.append(i)
+            self.region_members[key] = members
+        return members
+
+    def region(self, name):
+        """The region polygon followed by the cities whose centroid lies inside it."""
+        key = name.lower()
+        if key not in self.regions:
+            raise QueryError(404, f"Unknown region '{name}'")
+        yield self.regions[key][0]
+        for i in self._region_member_ids(key):
+            yield self.cities[i]
+
+def _float_params(query, *names):
+    try:
+        values = [float(query[name][0]) for name in names]
+    except KeyError as e:
+        raise QueryError(400, f"Missing parameter {e.args[0]}")
+    except ValueError:
+        values = None
+    # float() also accepts 'nan' and 'inf', which no coordinate can be
+    if values is None or not all(math.isfinite(value) for value in values):
+        raise QueryError(400, f"Parameters {', '.join(names)} must be finite numbers")
+    return values
+
+def route(service, path, query):
+    """
+    Map a request path and query to the features to send.
+
+    Routes:
+        /bbox?bbox=MIN_LON,MIN_LAT,MAX_LON,MAX_LAT
+        /nearest?lon=LON&lat=LAT[&k=K]
+        /reverse?lon=LON&lat=LAT
+        /region/{name}
+    """
+    if path == '/bbox':
+        try:
+            bounds = [float(value) for value in query['bbox'][0].split(',')]
+        except (KeyError, ValueError):
+            raise QueryError(400, "Expected bbox=MIN_LON,MIN_LAT,MAX_LON,MAX_LAT")
+        if len(bounds) != 4 or not all(math.isfinite(value) for value in bounds):
+            raise QueryError(400, "Expected bbox=MIN_LON,MIN_LAT,MAX_LON,MAX_LAT")
+        return service.bbox(*bounds)
+    if path == '/nearest':
+        lon, lat = _float_params(query, 'lon', 'lat')
+        try:
+            k = int(query.get('k', ['1'])[0])
+        except ValueError:
+            raise QueryError(400, "Parameter k must be an integer")
+        return service.nearest(lon, lat, max(1, min(k, MAX_NEAREST)))
+    if path == '/reverse':
+        lon, lat = _float_params(query, 'lon', 'lat')
+        return service.reverse(lon, lat)
+    if path.startswith('/region/'):
+        return service.region(unquote(path[len('/region/'):]))
+    raise QueryError(404, f"No route for {path}")
+
+class _ChunkBuffer:
+    """Text sink for FeatureCollectionWriter that collects output until it is sent."""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+
+    def take(self):
+        data = ''.join(self.parts).encode('utf-8')
+        self.parts = []
+        self.size = 0
+        return data
+
+async def _send_chunk(writer, data):
+    if data:
+        writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+        await writer.drain()
+
+def _head(status, headers):
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}"]
+    lines += [f"{name}: {value}" for name, value in headers]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('ascii')
+
+async def _send_error(writer, status, message):
+    body = json_codec.dumps({'error': message}).encode('utf-8')
+    writer.write(_head(status, [('Content-Type', 'application/json'),
+                                ('Content-Length', len(body)),
+                                ('Connection', 'close')]) + body)
+    await writer.drain()
+
+def _start_query(service, path, query):
+    """Route a request and pull its first feature; returns (features iterator, first feature or None)."""
+    features = iter(route(service, path, query))
+    return features, next(features, None)
+
+def _fill_chunk(collection, buffer, features):
+    """
+    Write features to the collection until a chunk's worth is buffered.
+
+    Returns:
+        bool: True once the features are exhausted
+    """
+    for feature in features:
+        collection.write(feature)
+        if buffer.size >= STREAM_CHUNK_SIZE:
+            return False
+    return True
+
+async def _stream_features(writer, first, features, send_body=True):
+    """
+    Send features as a FeatureCollection with chunked transfer encoding.
+
+    The first feature (None when there are none) is pulled by the caller
+    before the status line goes out, so lookup errors still become error
+    responses; the rest come from the features iterator. Each chunk is
+    produced in the loop's default executor, as queries such as /region
+    compute their features lazily.
+    """
+    writer.write(_head(200, [('Content-Type', 'application/geo+json; charset=utf-8'),
+                             ('Transfer-Encoding', 'chunked'),
+                             ('Connection', 'close')]))
+    if not send_body:
+        await writer.drain()
+        return
+
+    loop = asyncio.get_running_loop()
+    buffer = _ChunkBuffer()
+    with FeatureCollectionWriter(buffer, ensure_ascii=False) as collection:
+        if first is not None:
+            collection.write(first)
+        done = False
+        while not done:
+            done = await loop.run_in_executor(None, _fill_chunk, collection, buffer, features)
+            if buffer.size >= STREAM_CHUNK_SIZE:
+                await _send_chunk(writer, buffer.take())
+    await _send_chunk(writer, buffer.take())
+    writer.write(b'0\r\n\r\n')
+    await writer.drain()
+
+def make_handler(service):
+    """Build the asyncio connection handler for a QueryService."""
+
+    async def handle(reader, writer):
+        try:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except asyncio.LimitOverrunError:
+                await _send_error(writer, 400, "Request head too large")
+                return
+            except asyncio.IncompleteReadError:
+                return
+            request_line = head.split(b'\r\n', 1)[0].decode('latin-1')
+            parts = request_line.split()
+            if len(parts) != 3:
+                await _send_error(writer, 400, "Malformed request line")
+                return
+            method, target, _ = parts
+            if method not in ('GET', 'HEAD'):
+                await _send_error(writer, 405, f"Method {method} not allowed")
+                return
+
+            url = urlsplit(target)
+            try:
+                # Queries are CPU-bound, so they run off the event loop
+                features, first = await asyncio.get_running_loop().run_in_executor(
+                    None, _start_query, service, url.path, parse_qs(url.query))
+            except QueryError as e:
+                await _send_error(writer, e.status, str(e))
+                return
+            except Exception:
+                # Nothing has been sent yet, so the client can still get a response
+                traceback.print_exc()
+                await _send_error(writer, 500, "Internal server error")
+                return
+            await _stream_features(writer, first, features, send_body=method == 'GET')
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    return handle
+
+def load_features(path):
+    """Load the features of a GeoJSON FeatureCollection, or memory-map a city store file."""
+    if is_store_file(path):
+        return CityStore(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json_codec.load(f)['features']
+
+async def serve(service, host, port):
+    server = await asyncio.start_server(make_handler(service), host, port, limit=MAX_REQUEST_HEAD)
+    print(f"Serving on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve city queries over HTTP from indexes kept in memory.")
+    parser.add_argument('--cities', default='european_cities.json',
+                        help="City features, GeoJSON or a city store file (default: %(default)s)")
+    parser.add_argument('--regions',
+                        help="Region polygons with a 'name' property (default: the predefined regions)")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=8080, help="Port to listen on (default: %(default)s)")
+    args = parser.parse_args()
+
+    for path in (args.cities, args.regions):
+        if path and not os.path.exists(path):
+            print(f"Error: Input file '{path}' not found.")
+            sys.exit(1)
+
+    print(f"Loading {args.cities}...")
+    cities = load_features(args.cities)
+    regions = load_features(args.regions) if args.regions else create_region_features()
+    service = QueryService(cities, regions)
+    print(f"Indexed {len(service.index)} cities and {len(service.regions)} regions")
+
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
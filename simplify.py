@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+import argparse
+import heapq
+import os
+import sys
+
+from geojson_stream import FeatureCollectionWriter, iter_features
+from spatial_index import segments_intersect
+
+# Default tolerance in coordinate units (degrees); about 500 m of latitude
+DEFAULT_TOLERANCE = 0.005
+
+# How many times a ring is retried with half the tolerance before it is kept as is
+MAX_RETRIES = 4
+
+def _segment_distance_sq(p, a, b):
+    """Squared distance from point p to segment ab."""
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    length = dx * dx + dy * dy
+    if length == 0:
+        ex, ey = p[0] - a[0], p[1] - a[1]
+        return ex * ex + ey * ey
+    t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length))
+    ex, ey = p[0] - (a[0] + t * dx), p[1] - (a[1] + t * dy)
+    return ex * ex + ey * ey
+
+def douglas_peucker(line, tolerance):
+    """
+    Simplify an open polyline with the Douglas-Peucker algorithm.
+
+    Keeps the endpoints and, recursively, every point farther than tolerance
+    from the chord of its span. Uses an explicit stack instead of recursion.
+    """
+    if len(line) < 3:
+        return list(line)
+    keep = [False] * len(line)
+    keep[0] = keep[-1] = True
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, len(line) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, farthest_sq = None, tolerance_sq
+        for i in range(first + 1, last):
+            distance_sq = _segment_distance_sq(line[i], line[first], line[last])
+            if distance_sq > farthest_sq:
+                farthest, farthest_sq = i, distance_sq
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [point for point, kept in zip(line, keep) if kept]
+
+def _triangle_area(a, b, c):
+    return abs((b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1])) / 2.0
+
+def visvalingam(line, tolerance):
+    """
+    Simplify an open polyline with the Visvalingam-Whyatt algorithm.
+
+    Repeatedly drops the interior point whose triangle with its neighbours has
+    the smallest area, until every remaining triangle is at least
+    tolerance ** 2 (so the same tolerance gives similar results to
+    douglas_peucker). Endpoints are always kept.
+    """
+    n = len(line)
+    if n < 3:
+        return list(line)
+    threshold = tolerance * tolerance
+    previous = list(range(-1, n - 1))
+    following = list(range(1, n + 1))
+    removed = [False] * n
+    heap = [(_triangle_area(line[i - 1], line[i], line[i + 1]), i) for i in range(1, n - 1)]
+    heapq.heapify(heap)
+    areas = {i: area for area, i in heap}
+
+    while heap:
+        area, i = heapq.heappop(heap)
+        if removed[i] or areas.get(i) != area:
+            continue  # Stale heap entry
+        if area >= threshold:
+            break
+        removed[i] = True
+        before, after = previous[i], following[i]
+        following[before] = after
+        previous[after] = before
+        for j in (before, after):
+            if 0 < j < n - 1:
+                # A neighbour's area never drops below the area just removed,
+                # so points are always eliminated in increasing order
+                new_area = max(area, _triangle_area(line[previous[j]], line[j], line[following[j]]))
+                areas[j] = new_area
+                heapq.heappush(heap, (new_area, j))
+
+    return [point for point, gone in zip(line, removed) if not gone]
+
+SIMPLIFIERS = {
+    'douglas-peucker': douglas_peucker,
+    'visvalingam': visvalingam
+}
+
+def ring_is_simple(ring):
+    """
+    Check that a closed ring does not cross or touch itself.
+
+    Edges are swept in order of their minimum longitude, so only edges whose
+    longitude ranges overlap are compared.
+    """
+    n = len(ring) - 1
+    edges = []
+    for i in range(n):
+        a, b = ring[i], ring[i + 1]
+        edges.append((min(a[0], b[0]), max(a[0], b[0]), i))
+    edges.sort()
+    for position, (min_x, max_x, i) in enumerate(edges):
+        a, b = ring[i], ring[i + 1]
+        for other_min_x, _, j in edges[position + 1:]:
+            if other_min_x > max_x:
+                break
+            # Neighbouring edges share a vertex by construction
+            if abs(i - j) == 1 or abs(i - j) == n - 1:
+                continue
+            c, d = ring[j], ring[j + 1]
+            if segments_intersect(a[0], a[1], b[0], b[1], c[0], c[1], d[0], d[1]):
+                return False
+    return True
+
+def simplify_ring(ring, tolerance, method='douglas-peucker'):
+    """
+    Simplify one closed ring while keeping it a valid ring.
+
+    The ring is split at its first vertex and the vertex farthest from it, and
+    both halves are simplified, so the result stays closed. If the result has
+    fewer than 4 positions or crosses itself, the tolerance is halved and the
+    ring retried; after MAX_RETRIES the original ring is kept.
+    """
+    if len(ring) < 5:
+        return ring
+    simplifier = SIMPLIFIERS[method]
+    closed = ring[0] == ring[-1]
+    points = ring[:-1] if closed else ring
+    start = points[0]
+    split = max(range(len(points)),
+                key=lambda i: (points[i][0] - start[0]) ** 2 + (points[i][1] - start[1]) ** 2)
+    if split == 0:
+        return ring
+
+    for _ in range(MAX_RETRIES + 1):
+        first_half = simplifier(points[:split + 1], tolerance)
+        second_half = simplifier(points[split:] + [start], tolerance)
+        result = first_half[:-1] + second_half
+        if len(result) >= 4 and ring_is_simple(result):
+            return result
+        tolerance /= 2.0
+    return ring
+
+def count_vertices(geometry):
+    """Number of positions in a geometry."""
+    if not geometry:
+        return 0
+    geom_type = geometry.get('type')
+    coords = geometry.get('coordinates') or []
+    if geom_type == 'Point':
+        return 1
+    if geom_type in ('LineString', 'MultiPoint'):
+        return len(coords)
+    if geom_type in ('Polygon', 'MultiLineString'):
+        return sum(len(ring) for ring in coords)
+    if geom_type == 'MultiPolygon':
+        return sum(len(ring) for polygon in coords for ring in polygon)
+    return 0
+
+def simplify_geometry(geometry, tolerance, method='douglas-peucker'):
+    """
+    Return a simplified copy of a geometry; only polygon rings are simplified.
+
+    Each ring (outer ring or hole) is simplified on its own with simplify_ring.
+    Other geometry types are returned unchanged.
+    """
+    if not geometry:
+        return geometry
+    geom_type = geometry.get('type')
+    if geom_type == 'Polygon':
+        rings = [simplify_ring(ring, tolerance, method) for ring in geometry['coordinates']]
+        return {'type': 'Polygon', 'coordinates': rings}
+    if geom_type == 'MultiPolygon':
+        polygons = [[simplify_ring(ring, tolerance, method) for ring in polygon]
+                    for polygon in geometry['coordinates']]
+        return {'type': 'MultiPolygon', 'coordinates': polygons}
+    return geometry
+
+def simplify_features(features, tolerance, method='douglas-peucker', stats=None):
+    """
+    Pipeline stage: yield features with simplified geometries.
+
+    Args:
+        features: Iterable of GeoJSON Feature dicts
+        tolerance: Simplification tolerance in coordinate units
+        method: 'douglas-peucker' or 'visvalingam'
+        stats: Optional dict; 'before' and 'after' vertex counts are added to it
+    """
+    if stats is not None:
+        stats.setdefault('before', 0)
+        stats.setdefault('after', 0)
+    for feature in features:
+        geometry = feature.get('geometry')
+        simplified = simplify_geometry(geometry, tolerance, method)
+        if stats is not None:
+            stats['before'] += count_vertices(geometry)
+            stats['after'] += count_vertices(simplified)
+        if simplified is not geometry:
+            feature = dict(feature, geometry=simplified)
+        yield feature
+
+def main():
+    parser = argparse.ArgumentParser(description="Simplify polygon geometries of a GeoJSON FeatureCollection.")
+    parser.add_argument('input', help="Input FeatureCollection, e.g. polish_cities.json")
+    parser.add_argument('output', help="Output FeatureCollection")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Tolerance in degrees (default: %(default)s)")
+    parser.add_argument('--method', choices=sorted(SIMPLIFIERS), default='douglas-peucker',
+                        help="Simplification algorithm")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: Input file '{args.input}' not found.")
+        sys.exit(1)
+
+    print(f"Simplifying {args.input} with {args.method} (tolerance {args.tolerance})...")
+    stats = {}
+    with open(args.input, 'rb') as f, open(args.output, 'w', encoding='utf-8') as out:
+        with FeatureCollectionWriter(out, ensure_ascii=False) as writer:
+            writer.write_all(simplify_features(iter_features(f), args.tolerance, args.method, stats))
+
+    before, after = stats['before'], stats['after']
+    reduction = 100.0 * (1 - after / before) if before else 0.0
+    input_size = os.path.getsize(args.input) / (1024 * 1024)
+    output_size = os.path.getsize(args.output) / (1024 * 1024)
+    print(f"Vertices: {before} -> {after} ({reduction:.1f}% fewer)")
+    print(f"Saved {writer.count} features to {args.output} ({input_size:.2f} MB -> {output_size:.2f} MB)")
+
+if __name__ == "__main__":
+    main()
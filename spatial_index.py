@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+import argparse
+import heapq
+import math
+import os
+import sys
+
+import json_codec
+from city_store import CityStore, is_store_file
+from polygon_engine import prepare_geometry
+
+# Mean Earth radius in kilometers
+EARTH_RADIUS_KM = 6371.0088
+
+# Maximum number of entries per tree node
+NODE_CAPACITY = 16
+
+def haversine_km(lon1, lat1, lon2, lat2):
+    """Great-circle distance between two (lon, lat) points in kilometers."""
+    lon1, lat1, lon2, lat2 = map(math.radians, (lon1, lat1, lon2, lat2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def geometry_rings(geometry):
+    """Return the rings of a Polygon/MultiPolygon as a list of polygons (lists of rings)."""
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+def geometry_bbox(geometry):
+    """Return (min_lon, min_lat, max_lon, max_lat) of a geometry, or None if it has no coordinates."""
+    if not geometry or not geometry.get('coordinates'):
+        return None
+    if geometry['type'] == 'Point':
+        lon, lat = geometry['coordinates'][:2]
+        if lon is None or lat is None:
+            return None
+        return lon, lat, lon, lat
+    points = [point for polygon in geometry_rings(geometry) for ring in polygon for point in ring]
+    if not points:
+        return None
+    lons = [point[0] for point in points]
+    lats = [point[1] for point in points]
+    return min(lons), min(lats), max(lons), max(lats)
+
+def segments_intersect(ax, ay, bx, by, cx, cy, dx, dy):
+    """Check if segment AB intersects segment CD (touching counts)."""
+    def orientation(px, py, qx, qy, rx, ry):
+        value = (qy - py) * (rx - qx) - (qx - px) * (ry - qy)
+        return (value > 0) - (value < 0)
+
+    def on_segment(px, py, qx, qy, rx, ry):
+        return min(px, rx) <= qx <= max(px, rx) and min(py, ry) <= qy <= max(py, ry)
+
+    o1 = orientation(ax, ay, bx, by, cx, cy)
+    o2 = orientation(ax, ay, bx, by, dx, dy)
+    o3 = orientation(cx, cy, dx, dy, ax, ay)
+    o4 = orientation(cx, cy, dx, dy, bx, by)
+    if o1 != o2 and o3 != o4:
+        return True
+    return ((o1 == 0 and on_segment(ax, ay, cx, cy, bx, by)) or
+            (o2 == 0 and on_segment(ax, ay, dx, dy, bx, by)) or
+            (o3 == 0 and on_segment(cx, cy, ax, ay, dx, dy)) or
+            (o4 == 0 and on_segment(cx, cy, bx, by, dx, dy)))
+
+def geometry_intersects_bbox(geometry, bbox, prepared, min_lon, min_lat, max_lon, max_lat):
+    """
+    Exact test whether a geometry intersects a query box.
+
+    Args:
+        geometry: GeoJSON Point, Polygon or MultiPolygon geometry dict
+        bbox: Precomputed bounding box of the geometry
+        prepared: Polygons prepared with prepare_geometry (None for Points)
+    """
+    if bbox[0] > max_lon or bbox[2] < min_lon or bbox[1] > max_lat or bbox[3] < min_lat:
+        return False
+    if geometry['type'] == 'Point':
+        return True
+    # Entirely inside the query box
+    if bbox[0] >= min_lon and bbox[2] <= max_lon and bbox[1] >= min_lat and bbox[3] <= max_lat:
+        return True
+    # The query box lies inside the geometry
+    if prepared.contains(min_lon, min_lat):
+        return True
+    corners = [(min_lon, min_lat), (max_lon, min_lat), (max_lon, max_lat), (min_lon, max_lat)]
+    for polygon in geometry_rings(geometry):
+        for ring in polygon:
+            for i in range(len(ring)):
+                ax, ay = ring[i][:2]
+                if min_lon <= ax <= max_lon and min_lat <= ay <= max_lat:
+                    return True
+                bx, by = ring[(i + 1) % len(ring)][:2]
+                for j in range(4):
+                    cx, cy = corners[j]
+                    dx, dy = corners[(j + 1) % 4]
+                    if segments_intersect(ax, ay, bx, by, cx, cy, dx, dy):
+                        return True
+    return False
+
+def _closest_on_segment(lon, lat, ax, ay, bx, by):
+    """Closest point to (lon, lat) on segment AB, measured in a local equirectangular projection."""
+    scale = math.cos(math.radians(lat))
+    px, pax, pbx = lon * scale, ax * scale, bx * scale
+    dx, dy = pbx - pax, by - ay
+    length = dx * dx + dy * dy
+    if length == 0:
+        return ax, ay
+    t = max(0.0, min(1.0, ((px - pax) * dx + (lat - ay) * dy) / length))
+    return ax + t * (bx - ax), ay + t * (by - ay)
+
+def geometry_distance_km(geometry, prepared, lon, lat):
+    """Distance from a point to a geometry in kilometers (0 inside polygons, tested with prepared)."""
+    if geometry['type'] == 'Point':
+        glon, glat = geometry['coordinates'][:2]
+        return haversine_km(lon, lat, glon, glat)
+    if prepared.contains(lon, lat):
+        return 0.0
+    best = math.inf
+    for polygon in geometry_rings(geometry):
+        for ring in polygon:
+            for i in range(len(ring)):
+                ax, ay = ring[i][:2]
+                bx, by = ring[(i + 1) % len(ring)][:2]
+                clon, clat = _closest_on_segment(lon, lat, ax, ay, bx, by)
+                best = min(best, haversine_km(lon, lat, clon, clat))
+    return best
+
+def _meridian_distance_km(lon, lat, meridian, min_lat, max_lat):
+    """Shortest great-circle distance from a point to a meridian segment."""
+    delta = math.radians((meridian - lon + 180.0) % 360.0 - 180.0)
+    phi = math.radians(lat)
+    # Latitude of the closest point on the whole meridian, clamped to the segment
+    closest = math.degrees(math.atan2(math.sin(phi), math.cos(phi) * math.cos(delta)))
+    closest = max(min_lat, min(max_lat, max(-90.0, min(90.0, closest))))
+    return haversine_km(lon, lat, meridian, closest)
+
+def bbox_distance_km(lon, lat, min_lon, min_lat, max_lon, max_lat):
+    """
+    Shortest distance from a point to a lon/lat box in kilometers.
+
+    This is a true lower bound for everything inside the box, which keeps
+    radius and nearest-neighbour searches exact.
+    """
+    if min_lon <= lon <= max_lon:
+        return haversine_km(lon, lat, lon, max(min_lat, min(max_lat, lat)))
+    # At every latitude the distance grows with the longitude difference, so
+    # the edge meridian closer in longitude is always the closer one
+    west = (lon - min_lon) % 360.0
+    east = (max_lon - lon) % 360.0
+    west = min(west, 360.0 - west)
+    east = min(east, 360.0 - east)
+    return _meridian_distance_km(lon, lat, min_lon if west <= east else max_lon, min_lat, max_lat)
+
+class SpatialIndex:
+    """
+    Static R-tree over feature bounding boxes, bulk-loaded with
+    Sort-Tile-Recursive (STR) packing.
+
+    Entries are sorted into vertical slices by center longitude, each slice
+    is sorted by center latitude and cut into full nodes, and the same is
+    repeated level by level. Queries descend only into nodes whose box can
+    contain a match, then check each candidate against its real geometry.
+    Polygons are prepared for containment tests once, while the index is
+    built (see prepare_geometry), and kept in the prepared dict.
+
+    Nodes are tuples (min_lon, min_lat, max_lon, max_lat, children, is_leaf);
+    leaf children are feature indexes.
+    """
+
+    def __init__(self, features, node_capacity=NODE_CAPACITY):
+        """
+        Args:
+            features: Sequence of GeoJSON Feature dicts (a CityStore works too)
+            node_capacity: Maximum number of entries per node
+        """
+        self.features = features
+        self.node_capacity = node_capacity
+        self.geometries = {}
+        self.bboxes = {}
+        self.prepared = {}
+
+        entries = []
+        for i, feature in enumerate(features):
+            geometry = feature.get('geometry')
+            bbox = geometry_bbox(geometry)
+            if bbox is None:
+                continue
+            self.geometries[i] = geometry
+            self.bboxes[i] = bbox
+            if geometry['type'] != 'Point':
+                self.prepared[i] = prepare_geometry(geometry)
+            entries.append(bbox + (i, True))
+
+        self.size = len(entries)
+        level = self._pack(entries, leaf=True)
+        while len(level) > 1:
+            level = self._pack(level, leaf=False)
+        self.root = level[0] if level else None
+
+    def _pack(self, entries, leaf):
+        """Group one level of entries into parent nodes with STR."""
+        capacity = self.node_capacity
+        node_count = math.ceil(len(entries) / capacity)
+        slice_count = math.ceil(math.sqrt(node_count))
+        slice_size = slice_count * capacity
+
+        entries = sorted(entries, key=lambda e: e[0] + e[2])
+        nodes = []
+        for start in range(0, len(entries), slice_size):
+            vertical_slice = sorted(entries[start:start + slice_size], key=lambda e: e[1] + e[3])
+            for offset in range(0, len(vertical_slice), capacity):
+                group = vertical_slice[offset:offset + capacity]
+                children = [e[4] for e in group] if leaf else group
+                nodes.append((min(e[0] for e in group), min(e[1] for e in group),
+                              max(e[2] for e in group), max(e[3] for e in group),
+                              children, leaf))
+        return nodes
+
+    def __len__(self):
+        return self.size
+
+    def query_bbox_ids(self, min_lon, min_lat, max_lon, max_lat):
+        """Indexes of the features whose geometry intersects the box."""
+        result = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            if node[0] > max_lon or node[2] < min_lon or node[1] > max_lat or node[3] < min_lat:
+                continue
+            if not node[5]:
+                stack.extend(node[4])
+                continue
+            for i in node[4]:
+                if geometry_intersects_bbox(self.geometries[i], self.bboxes[i], self.prepared.get(i),
+                                            min_lon, min_lat, max_lon, max_lat):
+                    result.append(i)
+        result.sort()
+        return result
+
+    def query_point_ids(self, lon, lat):
+        """
+        Indexes of the features whose bounding box contains the point.
+
+        Only boxes are tested; callers check the candidates against the real
+        geometry, typically with prepared polygons.
+        """
+        result = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            if node[0] > lon or node[2] < lon or node[1] > lat or node[3] < lat:
+                continue
+            if not node[5]:
+                stack.extend(node[4])
+                continue
+            for i in node[4]:
+                bbox = self.bboxes[i]
+                if bbox[0] <= lon <= bbox[2] and bbox[1] <= lat <= bbox[3]:
+                    result.append(i)
+        result.sort()
+        return result
+
+    def query_bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """Features whose geometry intersects the box, in input order."""
+        return [self.features[i] for i in self.query_bbox_ids(min_lon, min_lat, max_lon, max_lat)]
+
+    def query_radius_ids(self, lon, lat, radius_km):
+        """(distance_km, index) for features within radius_km of the point, nearest first."""
+        result = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            if bbox_distance_km(lon, lat, *node[:4]) > radius_km:
+                continue
+            if not node[5]:
+                stack.extend(node[4])
+                continue
+            for i in node[4]:
+                if bbox_distance_km(lon, lat, *self.bboxes[i]) > radius_km:
+                    continue
+                distance = geometry_distance_km(self.geometries[i], self.prepared.get(i), lon, lat)
+                if distance <= radius_km:
+                    result.append((distance, i))
+        result.sort()
+        return result
+
+    def query_radius(self, lon, lat, radius_km):
+        """(distance_km, feature) for features within radius_km of the point, nearest first."""
+        return [(distance, self.features[i]) for distance, i in self.query_radius_ids(lon, lat, radius_km)]
+
+    def nearest_ids(self, lon, lat, k=1):
+        """(distance_km, index) of the k features closest to the point, nearest first."""
+        result = []
+        if not self.root or k <= 0:
+            return result
+
+        # Best-first search: nodes are keyed by a lower bound, features by their
+        # exact distance, so a feature popped from the heap is the next nearest
+        counter = 0
+        heap = [(0.0, counter, self.root, None)]
+        while heap and len(result) < k:
+            distance, _, node, index = heapq.heappop(heap)
+            if index is not None:
+                result.append((distance, index))
+            elif node[5]:
+                for i in node[4]:
+                    counter += 1
+                    distance = geometry_distance_km(self.geometries[i], self.prepared.get(i), lon, lat)
+                    heapq.heappush(heap, (distance, counter, None, i))
+            else:
+                for child in node[4]:
+                    counter += 1
+                    heapq.heappush(heap, (bbox_distance_km(lon, lat, *child[:4]), counter, child, None))
+        return result
+
+    def nearest(self, lon, lat, k=1):
+        """(distance_km, feature) of the k features closest to the point, nearest first."""
+        return [(distance, self.features[i]) for distance, i in self.nearest_ids(lon, lat, k)]
+
+def feature_name(feature):
+    """Best-effort display name of a city feature."""
+    properties = feature.get('properties') or {}
+    return properties.get('NAME') or properties.get('name') or '?'
+
+def main():
+    parser = argparse.ArgumentParser(description="Query city features through an STR R-tree.")
+    parser.add_argument('input', help="GeoJSON FeatureCollection or city store file")
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('MIN_LON', 'MIN_LAT', 'MAX_LON', 'MAX_LAT'),
+                        help="List features intersecting a box")
+    parser.add_argument('--near', type=float, nargs=2, metavar=('LON', 'LAT'),
+                        help="Point for --radius / --nearest queries")
+    parser.add_argument('--radius', type=float, help="List features within this many km of --near")
+    parser.add_argument('--nearest', type=int, help="List the k features closest to --near")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: Input file '{args.input}' not found.")
+        sys.exit(1)
+
+    if is_store_file(args.input):
+        features = CityStore(args.input)
+    else:
+        with open(args.input, 'r') as f:
+            features = json_codec.load(f)['features']
+
+    index = SpatialIndex(features)
+    print(f"Indexed {len(index)} features")
+
+    if args.bbox:
+        for feature in index.query_bbox(*args.bbox):
+            print(feature_name(feature))
+    if args.near and args.radius is not None:
+        for distance, feature in index.query_radius(args.near[0], args.near[1], args.radius):
+            print(f"{feature_name(feature)}\t{distance:.2f} km")
+    if args.near and args.nearest:
+        for distance, feature in index.nearest(args.near[0], args.near[1], args.nearest):
+            print(f"{feature_name(feature)}\t{distance:.2f} km")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+import argparse
+import math
+import os
+import sqlite3
+import sys
+from collections import defaultdict
+
+import json_codec
+from city_store import CityStore, is_store_file
+from compact_geojson import quantize_geometry
+from geojson_stream import iter_features
+from simplify import simplify_ring
+
+# Web Mercator stops at this latitude, which makes the world a square
+MAX_LATITUDE = 85.0511287798066
+
+# Resolution tiles are simplified for: one unit is one pixel of a 256 px tile
+TILE_EXTENT = 256
+
+# Extra margin around each tile, in pixels, so clipped polygons overlap
+# slightly and no seams show between neighbouring tiles
+TILE_BUFFER = 4
+
+def lon_to_tile_x(lon, zoom):
+    """Fractional tile column of a longitude at a zoom level."""
+    return (lon + 180.0) / 360.0 * (1 << zoom)
+
+def lat_to_tile_y(lat, zoom):
+    """Fractional tile row (counted from the north) of a latitude at a zoom level."""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    phi = math.radians(lat)
+    return (1.0 - math.log(math.tan(phi) + 1.0 / math.cos(phi)) / math.pi) / 2.0 * (1 << zoom)
+
+def tile_x_to_lon(x, zoom):
+    return x / (1 << zoom) * 360.0 - 180.0
+
+def tile_y_to_lat(y, zoom):
+    return math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y / (1 << zoom)))))
+
+def tile_bounds(zoom, x, y, buffer=0.0):
+    """
+    Return (min_lon, min_lat, max_lon, max_lat) of a tile.
+
+    Args:
+        buffer: Margin added on every side, as a fraction of the tile size
+    """
+    return (tile_x_to_lon(x - buffer, zoom), tile_y_to_lat(y + 1 + buffer, zoom),
+            tile_x_to_lon(x + 1 + buffer, zoom), tile_y_to_lat(y - buffer, zoom))
+
+def _clip_edge(points, inside, intersect):
+    """One Sutherland-Hodgman pass of a ring against a single clip edge."""
+    clipped = []
+    if not points:
+        return clipped
+    previous = points[-1]
+    for point in points:
+        if inside(point):
+            if not inside(previous):
+                clipped.append(intersect(previous, point))
+            clipped.append(point)
+        elif inside(previous):
+            clipped.append(intersect(previous, point))
+        previous = point
+    return clipped
+
+def clip_ring(ring, min_lon, min_lat, max_lon, max_lat):
+    """
+    Clip a ring to a box with the Sutherland-Hodgman algorithm.
+
+    Tile edges are meridians and parallels, which stay straight lines in
+    lon/lat, so the clip is exact without projecting first.
+
+    Returns:
+        list: The clipped ring, closed, or None if nothing is left of it
+    """
+    points = [(p[0], p[1]) for p in ring]
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+
+    def at_lon(lon):
+        def intersect(a, b):
+            t = (lon - a[0]) / (b[0] - a[0])
+            return (lon, a[1] + t * (b[1] - a[1]))
+        return intersect
+
+    def at_lat(lat):
+        def intersect(a, b):
+            t = (lat - a[1]) / (b[1] - a[1])
+            return (a[0] + t * (b[0] - a[0]), lat)
+        return intersect
+
+    points = _clip_edge(points, lambda p: p[0] >= min_lon, at_lon(min_lon))
+    points = _clip_edge(points, lambda p: p[0] <= max_lon, at_lon(max_lon))
+    points = _clip_edge(points, lambda p: p[1] >= min_lat, at_lat(min_lat))
+    points = _clip_edge(points, lambda p: p[1] <= max_lat, at_lat(max_lat))
+    if len(points) < 3:
+        return None
+    return [list(p) for p in points] + [list(points[0])]
+
+def _polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    return geometry['coordinates']
+
+def _bbox(geometry):
+    if geometry['type'] == 'Point':
+        lon, lat = geometry['coordinates'][:2]
+        return lon, lat, lon, lat
+    points = [p for polygon in _polygons(geometry) for ring in polygon for p in ring]
+    lons = [p[0] for p in points]
+    lats = [p[1] for p in points]
+    return min(lons), min(lats), max(lons), max(lats)
+
+def zoom_precision(zoom):
+    """Decimal places needed to tell pixels apart at a zoom level, plus one."""
+    return math.ceil(math.log10(TILE_EXTENT * (1 << zoom) / 360.0)) + 1
+
+def simplify_for_zoom(geometry, zoom):
+    """Simplify polygon rings to about one pixel and round coordinates to match a zoom level."""
+    if geometry['type'] != 'Point':
+        tolerance = 360.0 / (1 << zoom) / TILE_EXTENT
+        polygons = [[simplify_ring(ring, tolerance) for ring in polygon] for polygon in _polygons(geometry)]
+        if geometry['type'] == 'Polygon':
+            geometry = {'type': 'Polygon', 'coordinates': polygons[0]}
+        else:
+            geometry = {'type': 'MultiPolygon', 'coordinates': polygons}
+    return quantize_geometry(geometry, zoom_precision(zoom))
+
+def clip_geometry(geometry, bounds):
+    """Clip a Point/Polygon/MultiPolygon to a box; returns None if nothing is left."""
+    min_lon, min_lat, max_lon, max_lat = bounds
+    if geometry['type'] == 'Point':
+        lon, lat = geometry['coordinates'][:2]
+        return geometry if min_lon <= lon <= max_lon and min_lat <= lat <= max_lat else None
+
+    polygons = []
+    for polygon in _polygons(geometry):
+        outer = clip_ring(polygon[0], *bounds)
+        if outer is None:
+            continue
+        holes = [clip_ring(hole, *bounds) for hole in polygon[1:]]
+        polygons.append([outer] + [hole for hole in holes if hole is not None])
+    if not polygons:
+        return None
+    if len(polygons) == 1:
+        return {'type': 'Polygon', 'coordinates': polygons[0]}
+    return {'type': 'MultiPolygon', 'coordinates': polygons}
+
+def _tiled_geometry(geometry):
+    """
+    Return the geometry if it can be tiled (has coordinates), otherwise None.
+
+    Empty rings are dropped from polygons, and polygons whose outer ring is
+    empty go with them; a geometry with nothing left is not tiled.
+    """
+    if not geometry or geometry.get('type') not in ('Point', 'Polygon', 'MultiPolygon'):
+        return None
+    coords = geometry.get('coordinates')
+    if not coords:
+        return None
+    if geometry['type'] == 'Point':
+        return None if coords[0] is None or coords[1] is None else geometry
+    polygons = [[ring for ring in polygon if ring] for polygon in _polygons(geometry) if polygon and polygon[0]]
+    if not polygons:
+        return None
+    if geometry['type'] == 'Polygon':
+        return {'type': 'Polygon', 'coordinates': polygons[0]}
+    return {'type': 'MultiPolygon', 'coordinates': polygons}
+
+def tile_zoom(features, zoom):
+    """
+    Cut features into the tiles of one zoom level.
+
+    Polygons are first simplified to about one pixel and coordinates rounded
+    to that resolution, then clipped to every tile (plus a small buffer)
+    their bounding box touches. Polygons smaller than a pixel are drawn as a
+    point at their center instead, so low zoom levels stay small. Points, and
+    the points drawn for tiny polygons, go only to the tile that contains
+    them, without the buffer.
+
+    Args:
+        features: Iterable of GeoJSON Feature dicts
+        zoom: Zoom level
+
+    Returns:
+        dict: (x, y) -> list of Feature dicts clipped to that tile
+    """
+    tiles = defaultdict(list)
+    buffer = TILE_BUFFER / TILE_EXTENT
+    limit = (1 << zoom) - 1
+    pixel = 360.0 / (1 << zoom) / TILE_EXTENT
+    for feature in features:
+        geometry = _tiled_geometry(feature.get('geometry'))
+        if geometry is None:
+            continue
+        properties = feature.get('properties') or {}
+        min_lon, min_lat, max_lon, max_lat = _bbox(geometry)
+
+        if geometry['type'] != 'Point' and max_lon - min_lon < pixel and max_lat - min_lat < pixel:
+            center = [(min_lon + max_lon) / 2, (min_lat + max_lat) / 2]
+            zoomed = quantize_geometry({'type': 'Point', 'coordinates': center}, zoom_precision(zoom))
+        else:
+            zoomed = simplify_for_zoom(geometry, zoom)
+        if zoomed['type'] == 'Point':
+            # Points are not buffered: each one goes to a single tile
+            lon, lat = zoomed['coordinates'][:2]
+            x = min(limit, max(0, int(lon_to_tile_x(lon, zoom))))
+            y = min(limit, max(0, int(lat_to_tile_y(lat, zoom))))
+            tiles[(x, y)].append({'type': 'Feature', 'geometry': zoomed, 'properties': properties})
+            continue
+        first_x = max(0, int(lon_to_tile_x(min_lon, zoom) - buffer))
+        last_x = min(limit, int(lon_to_tile_x(max_lon, zoom) + buffer))
+        first_y = max(0, int(lat_to_tile_y(max_lat, zoom) - buffer))
+        last_y = min(limit, int(lat_to_tile_y(min_lat, zoom) + buffer))
+        single = first_x == last_x and first_y == last_y
+
+        for x in range(first_x, last_x + 1):
+            for y in range(first_y, last_y + 1):
+                if single:
+                    # Entirely inside one tile, nothing to clip
+                    clipped = zoomed
+                else:
+                    clipped = clip_geometry(zoomed, tile_bounds(zoom, x, y, buffer))
+                if clipped is not None:
+                    tiles[(x, y)].append({'type': 'Feature', 'geometry': clipped, 'properties': properties})
+    return tiles
+
+def tile_levels(features, min_zoom=0, max_zoom=8):
+    """
+    Cut features into a z/x/y tile pyramid, one zoom level at a time.
+
+    Only the tiles of the level being yielded are held in memory, so the
+    pyramid can be written out level by level (see write_tile_directory and
+    write_mbtiles).
+
+    Args:
+        features: Iterable of GeoJSON Feature dicts that can be iterated once
+            per zoom level, such as a list, a CityStore or a FeatureFile
+        min_zoom: Lowest zoom level generated
+        max_zoom: Highest zoom level generated
+
+    Yields:
+        tuple: (zoom, dict of (x, y) -> list of Feature dicts)
+    """
+    for zoom in range(min_zoom, max_zoom + 1):
+        yield zoom, tile_zoom(features, zoom)
+
+def encode_tile(features):
+    """Serialize the features of one tile as a compact GeoJSON FeatureCollection."""
+    data = {'type': 'FeatureCollection', 'features': features}
+    return json_codec.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def write_tile_directory(levels, output_dir):
+    """
+    Write tiles as output_dir/{z}/{x}/{y}.geojson files.
+
+    Args:
+        levels: (zoom, tiles) pairs as yielded by tile_levels
+
+    Returns:
+        dict: Zoom level -> number of tiles written
+    """
+    counts = {}
+    for zoom, tiles in levels:
+        for (x, y), features in tiles.items():
+            tile_dir = os.path.join(output_dir, str(zoom), str(x))
+            os.makedirs(tile_dir, exist_ok=True)
+            with open(os.path.join(tile_dir, f"{y}.geojson"), 'wb') as f:
+                f.write(encode_tile(features))
+        counts[zoom] = len(tiles)
+    return counts
+
+def write_mbtiles(levels, output_file, name):
+    """
+    Write tiles into a single SQLite file laid out like MBTiles.
+
+    Uses the MBTiles "metadata" and "tiles" tables. As the spec requires, rows
+    are counted from the south (TMS), so tile_row = 2^zoom - 1 - y. Tile data
+    is GeoJSON, recorded as format "geojson" in the metadata. Each zoom level
+    is inserted and committed as it arrives; the metadata, whose bounds come
+    from the tiles of the highest level, is written last.
+
+    Args:
+        levels: (zoom, tiles) pairs as yielded by tile_levels
+        output_file: Path of the SQLite file (replaced if it exists)
+        name: Tileset name for the metadata
+
+    Returns:
+        dict: Zoom level -> number of tiles written
+    """
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    connection = sqlite3.connect(output_file)
+    counts = {}
+    try:
+        connection.execute('CREATE TABLE metadata (name TEXT, value TEXT)')
+        connection.execute('CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, '
+                           'tile_row INTEGER, tile_data BLOB)')
+        connection.execute('CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)')
+        bounds = None
+        for zoom, tiles in levels:
+            connection.executemany(
+                'INSERT INTO tiles VALUES (?, ?, ?, ?)',
+                ((zoom, x, (1 << zoom) - 1 - y, encode_tile(features)) for (x, y), features in tiles.items()))
+            connection.commit()
+            counts[zoom] = len(tiles)
+            if tiles:
+                corners = [tile_bounds(zoom, x, y) for x, y in tiles]
+                bounds = (min(c[0] for c in corners), min(c[1] for c in corners),
+                          max(c[2] for c in corners), max(c[3] for c in corners))
+        metadata = {
+            'name': name,
+            'format': 'geojson',
+            'minzoom': str(min(counts)) if counts else '',
+            'maxzoom': str(max(counts)) if counts else ''
+        }
+        if bounds:
+            metadata['bounds'] = ','.join(str(value) for value in bounds)
+        connection.executemany('INSERT INTO metadata VALUES (?, ?)', metadata.items())
+        connection.commit()
+    finally:
+        connection.close()
+    return counts
+
+def read_mbtiles_tile(path, zoom, x, y):
+    """Return the decoded FeatureCollection of tile z/x/y (XYZ numbering) from an MBTiles file, or None."""
+    connection = sqlite3.connect(path)
+    try:
+        row = connection.execute(
+            'SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?',
+            (zoom, x, (1 << zoom) - 1 - y)).fetchone()
+    finally:
+        connection.close()
+    return json_codec.loads(row[0]) if row else None
+
+class FeatureFile:
+    """The features of a GeoJSON file or a city store file, read afresh on every iteration."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        if is_store_file(self.path):
+            with CityStore(self.path) as store:
+                yield from store
+        else:
+            with open(self.path, 'rb') as f:
+                yield from iter_features(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Cut city features into a z/x/y tile pyramid.")
+    parser.add_argument('input', help="GeoJSON FeatureCollection or city store file")
+    parser.add_argument('output', help="Output directory, or a .mbtiles file")
+    parser.add_argument('--min-zoom', type=int, default=0, help="Lowest zoom level (default: %(default)s)")
+    parser.add_argument('--max-zoom', type=int, default=8, help="Highest zoom level (default: %(default)s)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: Input file '{args.input}' not found.")
+        sys.exit(1)
+    if not 0 <= args.min_zoom <= args.max_zoom:
+        print("Error: zoom levels must satisfy 0 <= --min-zoom <= --max-zoom.")
+        sys.exit(1)
+
+    print(f"Tiling {args.input} at zoom {args.min_zoom}-{args.max_zoom}...")
+    # The input is read once per zoom level, so only one level's tiles are in memory
+    levels = tile_levels(FeatureFile(args.input), args.min_zoom, args.max_zoom)
+    if args.output.endswith('.mbtiles'):
+        name = os.path.splitext(os.path.basename(args.input))[0]
+        counts = write_mbtiles(levels, args.output, name)
+    else:
+        counts = write_tile_directory(levels, args.output)
+
+    if not any(counts.values()):
+        print("No features with coordinates to tile.")
+        sys.exit(1)
+    for zoom, count in counts.items():
+        print(f"Zoom {zoom}: {count} tiles")
+    print(f"Saved {sum(counts.values())} tiles to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+import json_codec
+from compact_geojson import features_bbox, make_transform
+from geojson_stream import iter_features
+
+# Positions a closed ring needs to enclose an area (a triangle plus the closing repeat)
+MIN_RING_POSITIONS = 4
+
+def _ring_positions(ring, quantize):
+    """Ring as a list of position tuples, quantized if a function is given, without repeated positions."""
+    positions = []
+    for p in ring:
+        point = quantize(p) if quantize else (p[0], p[1])
+        if not positions or positions[-1] != point:
+            positions.append(point)
+    return positions
+
+def _find_junctions(rings):
+    """
+    Positions where rings meet or part ways.
+
+    A position is a junction when it is seen with a different pair of
+    neighbours than the first time (in either direction), which is exactly
+    where a shared border starts or ends.
+    """
+    neighbours = {}
+    junctions = set()
+    for ring in rings:
+        n = len(ring) - 1  # Rings are closed, the last position repeats the first
+        for i in range(n):
+            point = ring[i]
+            pair = frozenset((ring[i - 1] if i else ring[n - 1], ring[i + 1]))
+            seen = neighbours.get(point)
+            if seen is None:
+                neighbours[point] = pair
+            elif seen != pair:
+                junctions.add(point)
+    return junctions
+
+def _cut_ring(ring, junctions):
+    """Split a closed ring into arcs that start and end at junctions."""
+    n = len(ring) - 1
+    cuts = [i for i in range(n) if ring[i] in junctions]
+    if not cuts:
+        # Start rings without junctions at their smallest position, so that
+        # identical rings produce identical arcs
+        start = min(range(n), key=lambda i: ring[i])
+        return [ring[start:n] + ring[:start + 1]]
+    rotated = ring[cuts[0]:n] + ring[:cuts[0] + 1]
+    offsets = [i - cuts[0] for i in cuts] + [n]
+    return [rotated[a:b + 1] for a, b in zip(offsets, offsets[1:])]
+
+class TopologyBuilder:
+    """
+    Build a TopoJSON topology whose polygons share their common borders.
+
+    Every ring is cut into arcs at junctions, the positions where rings meet
+    or part ways, and each arc is stored once. A border shared by two regions
+    becomes one arc that the second polygon references reversed (as ~index),
+    so it is transferred and parsed only once.
+    """
+
+    def __init__(self, precision=None, bbox=None):
+        """
+        Args:
+            precision: Decimal places kept. When given, positions are
+                quantized to integers under a transform and arcs are
+                delta-encoded, as the TopoJSON spec describes. Near-equal
+                positions on both sides of a border then also merge.
+            bbox: Bounding box for the transform (default: from the features)
+        """
+        self.precision = precision
+        self.bbox = bbox
+        self.transform = None
+
+    def _quantizer(self, features):
+        if self.precision is None:
+            return None
+        bbox = self.bbox or features_bbox(features)
+        self.transform = make_transform(bbox, self.precision)
+        (sx, sy), (tx, ty) = self.transform['scale'], self.transform['translate']
+        return lambda p: (round((p[0] - tx) / sx), round((p[1] - ty) / sy))
+
+    def build(self, features, object_name='features'):
+        """
+        Encode a sequence of GeoJSON features as a topology.
+
+        Args:
+            features: Sequence of Feature dicts (read twice when quantizing)
+            object_name: Name of the GeometryCollection in "objects"
+
+        Returns:
+            dict: TopoJSON Topology
+        """
+        features = list(features)
+        quantize = self._quantizer(features)
+
+        # Collect every ring first, since junctions depend on all of them
+        rings = []
+        shapes = []
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            geom_type = geometry.get('type')
+            coords = geometry.get('coordinates')
+            if geom_type == 'Polygon' and coords:
+                polygons = [coords]
+            elif geom_type == 'MultiPolygon' and coords:
+                polygons = coords
+            else:
+                shapes.append(None)
+                continue
+            shape = []
+            for polygon in polygons:
+                indexes = []
+                for i, ring in enumerate(polygon):
+                    positions = _ring_positions(ring, quantize)
+                    if len(positions) < MIN_RING_POSITIONS:
+                        # Quantization collapsed the ring; without its outer
+                        # ring the whole polygon goes
+                        if i == 0:
+                            break
+                        continue
+                    indexes.append(len(rings))
+                    rings.append(positions)
+                if indexes:
+                    shape.append(indexes)
+            # An empty shape marks a geometry that collapsed entirely
+            shapes.append(shape)
+
+        junctions = _find_junctions(rings)
+        arcs = []
+        arc_index = {}
+
+        def arc_id(arc):
+            key = tuple(arc)
+            if key in arc_index:
+                return arc_index[key]
+            reverse = key[::-1]
+            if reverse in arc_index:
+                return ~arc_index[reverse]
+            arc_index[key] = len(arcs)
+            arcs.append(arc)
+            return arc_index[key]
+
+        ring_arcs = [[arc_id(arc) for arc in _cut_ring(ring, junctions)] for ring in rings]
+
+        geometries = []
+        for feature, shape in zip(features, shapes):
+            geometry = feature.get('geometry') or {}
+            if shape:
+                polygons = [[ring_arcs[r] for r in polygon] for polygon in shape]
+                if geometry['type'] == 'Polygon':
+                    encoded = {'type': 'Polygon', 'arcs': polygons[0]}
+                else:
+                    encoded = {'type': 'MultiPolygon', 'arcs': polygons}
+            elif shape is not None:
+                encoded = {'type': None}
+            elif geometry.get('type') == 'Point' and geometry.get('coordinates'):
+                position = geometry['coordinates']
+                if quantize and position[0] is not None:
+                    position = list(quantize(position))
+                encoded = {'type': 'Point', 'coordinates': position}
+            elif geometry.get('type'):
+                # Other geometry types are carried along unencoded
+                encoded = dict(geometry)
+            else:
+                encoded = {'type': None}
+            if feature.get('properties'):
+                encoded['properties'] = feature['properties']
+            geometries.append(encoded)
+
+        topology = {'type': 'Topology'}
+        if self.transform:
+            topology['transform'] = self.transform
+        topology['objects'] = {object_name: {'type': 'GeometryCollection', 'geometries': geometries}}
+        topology['arcs'] = [self._encode_arc(arc) for arc in arcs]
+        return topology
+
+    def _encode_arc(self, arc):
+        if not self.transform:
+            return [list(p) for p in arc]
+        encoded = [list(arc[0])]
+        for (x0, y0), (x1, y1) in zip(arc, arc[1:]):
+            encoded.append([x1 - x0, y1 - y0])
+        return encoded
+
+def to_topology(features, precision=None, object_name='features'):
+    """Encode GeoJSON features as a TopoJSON topology with shared arcs (see TopologyBuilder)."""
+    return TopologyBuilder(precision).build(features, object_name)
+
+def _decoded_arcs(topology):
+    """Arcs as lists of [longitude, latitude], undoing delta encoding and the transform."""
+    transform = topology.get('transform')
+    if not transform:
+        return topology['arcs']
+    (sx, sy), (tx, ty) = transform['scale'], transform['translate']
+    decoded = []
+    for arc in topology['arcs']:
+        x = y = 0
+        positions = []
+        for dx, dy in arc:
+            x += dx
+            y += dy
+            positions.append([x * sx + tx, y * sy + ty])
+        decoded.append(positions)
+    return decoded
+
+def to_features(topology, object_name=None):
+    """
+    Decode one object of a topology back into GeoJSON features.
+
+    Args:
+        topology: TopoJSON Topology dict
+        object_name: Object to decode (default: the first one)
+
+    Returns:
+        list: GeoJSON Feature dicts
+    """
+    arcs = _decoded_arcs(topology)
+    transform = topology.get('transform')
+    if object_name is None:
+        object_name = next(iter(topology['objects']))
+
+    def ring(indexes):
+        positions = []
+        for index in indexes:
+            arc = arcs[index] if index >= 0 else arcs[~index][::-1]
+            # Consecutive arcs share their joining position
+            positions.extend(arc if not positions else arc[1:])
+        return positions
+
+    features = []
+    for encoded in topology['objects'][object_name]['geometries']:
+        geom_type = encoded.get('type')
+        if geom_type == 'Polygon':
+            geometry = {'type': 'Polygon', 'coordinates': [ring(r) for r in encoded['arcs']]}
+        elif geom_type == 'MultiPolygon':
+            geometry = {'type': 'MultiPolygon',
+                        'coordinates': [[ring(r) for r in polygon] for polygon in encoded['arcs']]}
+        elif geom_type == 'Point':
+            position = encoded['coordinates']
+            if transform and position and position[0] is not None:
+                (sx, sy), (tx, ty) = transform['scale'], transform['translate']
+                position = [position[0] * sx + tx, position[1] * sy + ty]
+            geometry = {'type': 'Point', 'coordinates': position}
+        elif geom_type is None:
+            geometry = None
+        else:
+            geometry = {key: value for key, value in encoded.items() if key != 'properties'}
+        features.append({'type': 'Feature', 'geometry': geometry,
+                         'properties': encoded.get('properties', {})})
+    return features
+
+def write_topology(features, output_file, precision=None, object_name='features'):
+    """
+    Encode features as TopoJSON and write them compactly to output_file.
+
+    Returns:
+        dict: The topology that was written
+    """
+    topology = to_topology(features, precision, object_name)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json_codec.dump(topology, f, ensure_ascii=False, separators=(',', ':'))
+    return topology
+
+def _polygon_rings(geometry):
+    if not geometry or not geometry.get('coordinates'):
+        return []
+    if geometry.get('type') == 'Polygon':
+        return geometry['coordinates']
+    if geometry.get('type') == 'MultiPolygon':
+        return [ring for polygon in geometry['coordinates'] for ring in polygon]
+    return []
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a GeoJSON FeatureCollection to TopoJSON with shared arcs.")
+    parser.add_argument('input', help="Input FeatureCollection")
+    parser.add_argument('output', help="Output TopoJSON file")
+    parser.add_argument('--precision', type=int,
+                        help="Quantize to this many decimal places and delta-encode arcs")
+    parser.add_argument('--object', default='features', help="Name of the object in the topology")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        print(f"Error: Input file '{args.input}' not found.")
+        sys.exit(1)
+
+    with open(args.input, 'rb') as f:
+        features = list(iter_features(f))
+    topology = write_topology(features, args.output, args.precision, args.object)
+
+    ring_edges = sum(len(ring) - 1 for feature in features
+                     for ring in (_polygon_rings(feature.get('geometry'))))
+    arc_edges = sum(len(arc) - 1 for arc in topology['arcs'])
+    input_size = os.path.getsize(args.input) / (1024 * 1024)
+    output_size = os.path.getsize(args.output) / (1024 * 1024)
+    print(f"{len(topology['arcs'])} arcs with {arc_edges} edges for {ring_edges} ring edges")
+    print(f"Saved {len(features)} features to {args.output} ({input_size:.2f} MB -> {output_size:.2f} MB)")
+
+if __name__ == "__main__":
+    main()